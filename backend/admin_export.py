@@ -0,0 +1,79 @@
+import json
+from datetime import datetime
+from typing import Any, AsyncIterator, Dict, List, Optional, Tuple
+
+from fastapi import HTTPException
+
+# Documents per Motor batch and per streamed chunk
+EXPORT_BATCH_SIZE = 500
+
+# Collections that can be exported, with the fields they can be filtered on.
+# Sessions and payments are deliberately not exportable.
+EXPORTS: Dict[str, Dict[str, type]] = {
+    "users": {"user_id": str, "email": str, "role": str, "subscription_tier": str, "profile_completed": bool},
+    "profiles": {"user_id": str},
+    "swipes": {"swiper_id": str, "swiped_id": str, "direction": str},
+    "matches": {"match_id": str, "user1_id": str, "user2_id": str}
+}
+
+
+def _parse_value(field: str, value: str, value_type: type) -> Any:
+    if value_type is bool:
+        if value.lower() not in ("true", "false"):
+            raise HTTPException(status_code=400, detail=f"{field} must be true or false")
+        return value.lower() == "true"
+    return value
+
+
+def build_export_query(collection: str, params: Dict[str, str],
+                       fields: Optional[str]) -> Tuple[Dict[str, Any], Dict[str, int]]:
+    """Validate export parameters into a Mongo (filter, projection)
+
+    Args:
+        collection: Name of an EXPORTS collection
+        params: Equality filters, field -> query string value
+        fields: Comma-separated fields to include (all fields when omitted)
+    """
+    allowed = EXPORTS.get(collection)
+    if allowed is None:
+        raise HTTPException(status_code=404, detail=f"Unknown export {collection}")
+
+    query = {}
+    for field, value in params.items():
+        if field not in allowed:
+            raise HTTPException(status_code=400, detail=f"Cannot filter {collection} on {field}")
+        query[field] = _parse_value(field, value, allowed[field])
+
+    projection: Dict[str, int] = {"_id": 0}
+    for field in (fields or "").split(","):
+        field = field.strip()
+        if not field:
+            continue
+        if field.startswith("$"):
+            raise HTTPException(status_code=400, detail=f"Invalid field {field}")
+        projection[field] = 1
+
+    return query, projection
+
+
+def _json_default(value: Any) -> Any:
+    if isinstance(value, datetime):
+        return value.isoformat()
+    raise TypeError(f"Object of type {type(value).__name__} is not JSON serializable")
+
+
+async def stream_ndjson(cursor, batch_size: int = EXPORT_BATCH_SIZE) -> AsyncIterator[str]:
+    """Encode a Motor cursor as newline-delimited JSON, one chunk per batch
+
+    Only one batch of documents is held at a time, so memory stays constant
+    however many documents the cursor returns.
+    """
+    lines: List[str] = []
+    async for doc in cursor.batch_size(batch_size):
+        lines.append(json.dumps(doc, default=_json_default))
+        if len(lines) >= batch_size:
+            yield "\n".join(lines) + "\n"
+            lines = []
+
+    if lines:
+        yield "\n".join(lines) + "\n"
@@ -0,0 +1,191 @@
+import hashlib
+import math
+import time
+from collections import OrderedDict
+from typing import Any, Dict, List, Optional
+import logging
+
+logger = logging.getLogger(__name__)
+
+# Swiped ids per exact-verification query
+VERIFY_BATCH_SIZE = 1000
+
+
+class BloomFilter:
+    """Fixed-size Bloom filter over string ids
+
+    No false negatives; false positives at about error_rate once capacity ids
+    have been added. count is the number of distinct ids added (adding an id that
+    is already present, or a false positive, leaves it unchanged).
+    """
+
+    def __init__(self, capacity: int, error_rate: float = 0.01):
+        self.capacity = capacity
+        self.num_bits = max(8, math.ceil(-capacity * math.log(error_rate) / math.log(2) ** 2))
+        self.num_hashes = max(1, round(self.num_bits / capacity * math.log(2)))
+        self.bits = bytearray((self.num_bits + 7) // 8)
+        self.count = 0
+
+    def _positions(self, item: str):
+        # Double hashing: k positions from two 64-bit halves of one digest
+        digest = hashlib.blake2b(item.encode(), digest_size=16).digest()
+        h1 = int.from_bytes(digest[:8], "little")
+        h2 = int.from_bytes(digest[8:], "little") | 1
+        return ((h1 + i * h2) % self.num_bits for i in range(self.num_hashes))
+
+    def add(self, item: str):
+        added = False
+        for pos in self._positions(item):
+            mask = 1 << (pos & 7)
+            if not self.bits[pos >> 3] & mask:
+                self.bits[pos >> 3] |= mask
+                added = True
+        if added:
+            self.count += 1
+
+    def __contains__(self, item: str) -> bool:
+        return all(self.bits[pos >> 3] & (1 << (pos & 7)) for pos in self._positions(item))
+
+
+class SwipeExclusions:
+    """Per-user Bloom filters of swiped ids, used to skip already-swiped candidates
+
+    Each worker keeps filters for up to max_users users (LRU). A filter is built
+    from the user's full swipe history once, then caught up on every request with
+    only the swipes at or after its created_at watermark, so swipes handled by
+    other workers are picked up without reloading. /swipe also records new swipes
+    directly. Catch-up re-reads the swipes at the watermark and /swipe's records
+    are read again by catch-up, but re-adding an id does not grow the filter's
+    count, so a filter is only rebuilt (at twice the size) once the user has
+    actually swiped on more than its capacity.
+
+    A filter hit may be a false positive, so filter_unswiped() verifies hits
+    against the swipes collection whenever too few candidates pass the filter.
+    """
+
+    def __init__(self, max_users: int = 10000, capacity: int = 1024, error_rate: float = 0.01):
+        self.max_users = max_users
+        self.capacity = capacity
+        self.error_rate = error_rate
+        self._entries: "OrderedDict[str, Dict[str, Any]]" = OrderedDict()
+
+    async def _build(self, db, user_id: str, capacity: int) -> Dict[str, Any]:
+        entry = {"bloom": BloomFilter(capacity, self.error_rate), "watermark": None}
+        cursor = db.swipes.find({"swiper_id": user_id}, {"_id": 0, "swiped_id": 1, "created_at": 1})
+        async for swipe in cursor:
+            self._add(entry, swipe["swiped_id"], swipe.get("created_at"))
+        return entry
+
+    @staticmethod
+    def _add(entry: Dict[str, Any], swiped_id: str, created_at: Any):
+        entry["bloom"].add(swiped_id)
+        if created_at is not None and (entry["watermark"] is None or created_at > entry["watermark"]):
+            entry["watermark"] = created_at
+
+    async def get(self, db, user_id: str) -> BloomFilter:
+        """Up-to-date filter of the ids a user has swiped on"""
+        entry = self._entries.get(user_id)
+
+        if entry is None:
+            entry = await self._build(db, user_id, self.capacity)
+        else:
+            query = {"swiper_id": user_id}
+            if entry["watermark"] is not None:
+                # $gte rather than $gt: swipes sharing the watermark timestamp may be new
+                query["created_at"] = {"$gte": entry["watermark"]}
+
+            cursor = db.swipes.find(query, {"_id": 0, "swiped_id": 1, "created_at": 1})
+            async for swipe in cursor:
+                self._add(entry, swipe["swiped_id"], swipe.get("created_at"))
+
+        bloom = entry["bloom"]
+        if bloom.count > bloom.capacity:
+            entry = await self._build(db, user_id, max(bloom.count, bloom.capacity) * 2)
+
+        self._entries[user_id] = entry
+        self._entries.move_to_end(user_id)
+        while len(self._entries) > self.max_users:
+            self._entries.popitem(last=False)
+
+        return entry["bloom"]
+
+    def record(self, user_id: str, swiped_id: str):
+        """Add a swipe handled by this worker to the user's cached filter
+
+        The watermark is left alone: it only advances from stored swipes, whose
+        created_at has the database's (millisecond) precision.
+        """
+        entry = self._entries.get(user_id)
+        if entry is not None:
+            self._add(entry, swiped_id, None)
+
+    async def filter_unswiped(self, db, user_id: str, candidate_ids: List[str], limit: Optional[int] = None,
+                              min_results: int = 1) -> List[str]:
+        """Candidates the user has not swiped on, in their original order
+
+        Args:
+            db: Database
+            user_id: Swiping user
+            candidate_ids: Candidate pool to scan
+            limit: Stop after this many candidates (None scans the whole pool)
+            min_results: If fewer candidates pass the filter, filter hits are checked
+                against the swipes collection so false positives are not lost
+
+        Returns:
+            Up to limit candidate ids
+        """
+        bloom = await self.get(db, user_id)
+
+        passed = []
+        hits = []
+        for position, candidate_id in enumerate(candidate_ids):
+            if candidate_id in bloom:
+                hits.append(position)
+                continue
+            passed.append(position)
+            if limit is not None and len(passed) >= limit:
+                break
+
+        if len(passed) < min_results and hits:
+            # Exact fallback for filter hits, in bounded $in batches
+            hit_ids = [candidate_ids[position] for position in hits]
+            swiped = set()
+            for i in range(0, len(hit_ids), VERIFY_BATCH_SIZE):
+                cursor = db.swipes.find(
+                    {"swiper_id": user_id, "swiped_id": {"$in": hit_ids[i:i + VERIFY_BATCH_SIZE]}},
+                    {"_id": 0, "swiped_id": 1}
+                )
+                swiped.update([s["swiped_id"] async for s in cursor])
+
+            passed = sorted(passed + [position for position in hits if candidate_ids[position] not in swiped])
+
+        positions = passed[:limit] if limit is not None else passed
+        return [candidate_ids[position] for position in positions]
+
+
+class CandidatePool:
+    """Per-role list of discoverable user ids (profile completed), cached for ttl seconds
+
+    Discovery scans this pool in memory instead of sending exclusion lists to Mongo.
+    Role and profile changes handled by this worker call invalidate(); other workers
+    pick them up when their copy expires.
+    """
+
+    def __init__(self, ttl: float = 60.0):
+        self.ttl = ttl
+        self._pools: Dict[str, Dict[str, Any]] = {}
+
+    async def get(self, db, role: str) -> List[str]:
+        """Ids of users with the given role and a completed profile"""
+        pool = self._pools.get(role)
+        if pool is not None and pool["expires"] > time.monotonic():
+            return pool["user_ids"]
+
+        users = await db.users.find({"role": role, "profile_completed": True}, {"_id": 0, "user_id": 1}).to_list(None)
+        user_ids = [u["user_id"] for u in users]
+        self._pools[role] = {"user_ids": user_ids, "expires": time.monotonic() + self.ttl}
+        return user_ids
+
+    def invalidate(self):
+        """Drop every cached pool"""
+        self._pools.clear()
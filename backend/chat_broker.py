@@ -0,0 +1,155 @@
+import asyncio
+import logging
+from collections import OrderedDict
+from datetime import datetime, timedelta, timezone
+from typing import Any, Dict, Optional, Set
+
+logger = logging.getLogger(__name__)
+
+# Chat brokers (CHAT_BROKER):
+#   memory - fan-out within this worker only (single-worker deployments)
+#   mongo  - memory fan-out plus a per-worker poll of chat_messages, so messages
+#            sent through other workers reach this worker's sockets too
+CHAT_BROKERS = ("memory", "mongo")
+
+
+class Subscription:
+    """Queue of messages for one WebSocket connection
+
+    A subscriber that falls max_queue messages behind is marked overflowed and
+    receives None, so its connection can close and the client can catch up over
+    HTTP instead of the broker buffering without bound.
+    """
+
+    def __init__(self, match_id: str, max_queue: int):
+        self.match_id = match_id
+        self.overflowed = False
+        self._queue: asyncio.Queue = asyncio.Queue(max_queue)
+
+    def offer(self, message: Dict[str, Any]):
+        if self.overflowed:
+            return
+        try:
+            self._queue.put_nowait(message)
+        except asyncio.QueueFull:
+            self.overflowed = True
+
+    async def get(self) -> Optional[Dict[str, Any]]:
+        """Next message, or None once the subscriber has overflowed"""
+        if self.overflowed:
+            return None
+        return await self._queue.get()
+
+
+class InProcessBroker:
+    """Delivers messages published in this worker to this worker's subscribers"""
+
+    def __init__(self, max_queue: int = 100):
+        self.max_queue = max_queue
+        self._subscribers: Dict[str, Set[Subscription]] = {}
+
+    def subscribe(self, match_id: str) -> Subscription:
+        subscription = Subscription(match_id, self.max_queue)
+        self._subscribers.setdefault(match_id, set()).add(subscription)
+        return subscription
+
+    def unsubscribe(self, subscription: Subscription):
+        subscribers = self._subscribers.get(subscription.match_id)
+        if subscribers is not None:
+            subscribers.discard(subscription)
+            if not subscribers:
+                del self._subscribers[subscription.match_id]
+
+    def _deliver(self, message: Dict[str, Any]):
+        for subscription in list(self._subscribers.get(message["match_id"], ())):
+            subscription.offer(message)
+
+    async def publish(self, message: Dict[str, Any]):
+        """Fan a stored chat message out to the subscribers of its match"""
+        self._deliver(message)
+
+    async def start(self):
+        pass
+
+    async def stop(self):
+        pass
+
+
+class MongoPollingBroker(InProcessBroker):
+    """InProcessBroker that also picks up messages stored by other workers
+
+    A single background task per worker polls chat_messages for the matches that
+    have subscribers here, every poll_interval seconds, so cross-worker latency is
+    about poll_interval and the query count does not grow with open sockets. Each
+    poll re-reads the last `overlap` seconds, so messages inserted slightly out of
+    created_at order are not skipped; ids already delivered are remembered and
+    not sent twice. This stands in for an external pub/sub service.
+    """
+
+    def __init__(self, db, poll_interval: float = 0.05, overlap: float = 2.0, max_queue: int = 100,
+                 max_seen: int = 10000):
+        super().__init__(max_queue)
+        self.db = db
+        self.poll_interval = poll_interval
+        self.overlap = overlap
+        self.max_seen = max_seen
+        self._seen: "OrderedDict[str, None]" = OrderedDict()
+        self._task: Optional[asyncio.Task] = None
+
+    def _mark_seen(self, message_id: str) -> bool:
+        """Remember a delivered message id; False if it was delivered already"""
+        if message_id in self._seen:
+            return False
+        self._seen[message_id] = None
+        while len(self._seen) > self.max_seen:
+            self._seen.popitem(last=False)
+        return True
+
+    async def publish(self, message: Dict[str, Any]):
+        if self._mark_seen(message["message_id"]):
+            self._deliver(message)
+
+    async def poll(self):
+        """Deliver recent messages for subscribed matches that this worker has not sent yet"""
+        if not self._subscribers:
+            return
+
+        since = datetime.now(timezone.utc) - timedelta(seconds=self.overlap)
+        cursor = self.db.chat_messages.find(
+            {"match_id": {"$in": list(self._subscribers)}, "created_at": {"$gte": since}},
+            {"_id": 0}
+        ).sort([("created_at", 1), ("message_id", 1)])
+
+        async for message in cursor:
+            if self._mark_seen(message["message_id"]):
+                self._deliver(message)
+
+    async def _run(self):
+        while True:
+            try:
+                await self.poll()
+            except Exception as e:
+                logger.warning(f"Chat broker poll failed: {e}")
+            await asyncio.sleep(self.poll_interval)
+
+    async def start(self):
+        if self._task is None:
+            self._task = asyncio.create_task(self._run())
+
+    async def stop(self):
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+
+
+def create_broker(kind: str, db) -> InProcessBroker:
+    """Build the chat broker named by CHAT_BROKER"""
+    if kind not in CHAT_BROKERS:
+        raise ValueError(f"Unknown chat broker {kind!r}, expected one of {CHAT_BROKERS}")
+    if kind == "mongo":
+        return MongoPollingBroker(db)
+    return InProcessBroker()
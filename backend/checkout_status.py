@@ -0,0 +1,62 @@
+import asyncio
+import time
+from collections import OrderedDict
+from typing import Any, Awaitable, Callable, Dict, Tuple
+
+
+class CheckoutStatusCache:
+    """Short-lived cache of Stripe checkout statuses, one upstream call per session at a time
+
+    Meant for sessions that are still open: polls within ttl seconds share one
+    answer, and polls that arrive while a Stripe call is in flight wait on it.
+    Sessions in a terminal state should be answered from payment_transactions
+    instead of reaching this cache.
+    """
+
+    def __init__(self, fetch: Callable[[str], Awaitable[Any]], ttl: float = 2.0, max_size: int = 10000):
+        self.fetch = fetch
+        self.ttl = ttl
+        self.max_size = max_size
+        self._entries: "OrderedDict[str, Tuple[float, Any]]" = OrderedDict()
+        self._inflight: Dict[str, asyncio.Task] = {}
+
+        # Metrics
+        self.hits = 0
+        self.misses = 0
+        self.joined = 0
+
+    async def get(self, session_id: str) -> Any:
+        """Checkout status for a session, from Stripe at most once per ttl"""
+        entry = self._entries.get(session_id)
+        if entry is not None and time.monotonic() - entry[0] < self.ttl:
+            self.hits += 1
+            return entry[1]
+
+        task = self._inflight.get(session_id)
+        if task is not None:
+            self.joined += 1
+            return await asyncio.shield(task)
+
+        self.misses += 1
+        task = asyncio.create_task(self._fetch(session_id))
+        self._inflight[session_id] = task
+        task.add_done_callback(lambda _: self._inflight.pop(session_id, None))
+        # Shielded so a disconnecting poller does not cancel the call for the others
+        return await asyncio.shield(task)
+
+    async def _fetch(self, session_id: str) -> Any:
+        status = await self.fetch(session_id)
+        self._entries[session_id] = (time.monotonic(), status)
+        self._entries.move_to_end(session_id)
+        while len(self._entries) > self.max_size:
+            self._entries.popitem(last=False)
+        return status
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "hits": self.hits,
+            "misses": self.misses,
+            "joined": self.joined,
+            "cached": len(self._entries),
+            "in_flight": len(self._inflight)
+        }
@@ -0,0 +1,155 @@
+import logging
+from datetime import datetime, timezone
+from typing import Dict, List
+
+from pymongo import ASCENDING, DESCENDING, IndexModel, UpdateOne
+from pymongo.errors import OperationFailure
+
+logger = logging.getLogger(__name__)
+
+# Indexes created at startup; create_indexes is a no-op for ones that already exist
+INDEXES: Dict[str, List[IndexModel]] = {
+    "users": [
+        IndexModel([("user_id", ASCENDING)], unique=True),
+        IndexModel([("email", ASCENDING)], unique=True),
+        IndexModel([("role", ASCENDING), ("profile_completed", ASCENDING)])
+    ],
+    "user_sessions": [
+        IndexModel([("session_token", ASCENDING)], unique=True),
+        IndexModel([("user_id", ASCENDING)]),
+        # Mongo deletes sessions once expires_at has passed
+        IndexModel([("expires_at", ASCENDING)], expireAfterSeconds=0)
+    ],
+    "profiles": [
+        IndexModel([("user_id", ASCENDING)], unique=True)
+    ],
+    "swipes": [
+        IndexModel([("swiper_id", ASCENDING), ("swiped_id", ASCENDING)]),
+        IndexModel([("swiper_id", ASCENDING), ("created_at", ASCENDING)]),
+        IndexModel([("created_at", ASCENDING)])
+    ],
+    "matches": [
+        IndexModel([("match_id", ASCENDING)], unique=True),
+        IndexModel([("user1_id", ASCENDING), ("created_at", DESCENDING), ("match_id", DESCENDING)]),
+        IndexModel([("user2_id", ASCENDING), ("created_at", DESCENDING), ("match_id", DESCENDING)])
+    ],
+    "chat_messages": [
+        IndexModel([("match_id", ASCENDING), ("created_at", ASCENDING), ("message_id", ASCENDING)])
+    ],
+    "payment_transactions": [
+        IndexModel([("session_id", ASCENDING)], unique=True),
+        IndexModel([("user_id", ASCENDING)])
+    ],
+    "stripe_events": [
+        IndexModel([("status", ASCENDING), ("claimed_at", ASCENDING)]),
+        # Recorded webhook events are kept for 30 days to deduplicate retries
+        IndexModel([("created_at", ASCENDING)], expireAfterSeconds=30 * 24 * 3600)
+    ],
+    "ai_pitches": [
+        # Cached pitches expire after 30 days
+        IndexModel([("created_at", ASCENDING)], expireAfterSeconds=30 * 24 * 3600)
+    ],
+    "recommendation_index": [
+        IndexModel([("user_id", ASCENDING), ("model_version", ASCENDING)], unique=True),
+        IndexModel([("model_version", ASCENDING)])
+    ],
+    "training_jobs": [
+        # Job records expire after 7 days; the lock document has no created_at and stays
+        IndexModel([("created_at", ASCENDING)], expireAfterSeconds=7 * 24 * 3600)
+    ]
+}
+
+# Timestamp fields that were stored as ISO strings before they became BSON datetimes
+TIMESTAMP_FIELDS: Dict[str, List[str]] = {
+    "users": ["created_at", "swipes_reset_at"],
+    "user_sessions": ["expires_at", "created_at"],
+    "profiles": ["created_at", "updated_at"],
+    "swipes": ["created_at"],
+    "matches": ["created_at", "last_message_at"],
+    "chat_messages": ["created_at"],
+    "payment_transactions": ["created_at", "updated_at"],
+    "recommendation_index": ["created_at"]
+}
+
+TIMESTAMP_MIGRATION = "iso_timestamps_to_datetime"
+MIGRATION_BATCH_SIZE = 500
+
+
+async def ensure_indexes(db):
+    """Create the indexes in INDEXES
+
+    A failure (e.g. duplicates blocking a unique index) is logged and the remaining
+    collections are still indexed, so a bad index never keeps the API from starting.
+    """
+    for collection, indexes in INDEXES.items():
+        try:
+            await db[collection].create_indexes(indexes)
+        except OperationFailure as e:
+            logger.error(f"Failed to create indexes on {collection}: {e}")
+
+
+def parse_iso_timestamp(value: str):
+    """Parse a stored ISO timestamp into an aware UTC datetime, or None if malformed"""
+    try:
+        parsed = datetime.fromisoformat(value)
+    except ValueError:
+        return None
+    if parsed.tzinfo is None:
+        parsed = parsed.replace(tzinfo=timezone.utc)
+    return parsed
+
+
+async def migrate_timestamps(db) -> Dict[str, int]:
+    """Convert ISO string timestamps to BSON datetimes in every collection
+
+    One-off, run by scripts/migrate_timestamps.py rather than at startup:
+    completion is recorded in the migrations collection and later calls return
+    immediately. Safe to run concurrently, since only fields that are still
+    strings are rewritten.
+
+    Returns:
+        Number of documents converted per collection
+    """
+    if await db.migrations.find_one({"_id": TIMESTAMP_MIGRATION}):
+        return {}
+
+    converted = {}
+
+    for collection, fields in TIMESTAMP_FIELDS.items():
+        cursor = db[collection].find(
+            {"$or": [{field: {"$type": "string"}} for field in fields]},
+            {field: 1 for field in fields}
+        )
+        operations = []
+        converted[collection] = 0
+
+        async for doc in cursor:
+            updates = {}
+            for field in fields:
+                if not isinstance(doc.get(field), str):
+                    continue
+                parsed = parse_iso_timestamp(doc[field])
+                if parsed is None:
+                    logger.warning(f"Unparseable {collection}.{field} {doc[field]!r} on {doc['_id']}, leaving as is")
+                    continue
+                updates[field] = parsed
+
+            if updates:
+                operations.append(UpdateOne({"_id": doc["_id"]}, {"$set": updates}))
+
+            if len(operations) >= MIGRATION_BATCH_SIZE:
+                await db[collection].bulk_write(operations, ordered=False)
+                converted[collection] += len(operations)
+                operations = []
+
+        if operations:
+            await db[collection].bulk_write(operations, ordered=False)
+            converted[collection] += len(operations)
+
+    await db.migrations.update_one(
+        {"_id": TIMESTAMP_MIGRATION},
+        {"$set": {"completed_at": datetime.now(timezone.utc), "converted": converted}},
+        upsert=True
+    )
+    logger.info(f"Timestamp migration converted {converted}")
+    return converted
@@ -0,0 +1,40 @@
+from typing import Optional
+
+import aiohttp
+
+
+class HttpClient:
+    """One connection-pooled aiohttp session for all outbound requests
+
+    Created in a startup hook and closed on shutdown, so requests to the same
+    host reuse open keep-alive connections instead of paying TCP and TLS setup
+    each time.
+    """
+
+    def __init__(self, timeout: float = 10.0, connect_timeout: float = 5.0,
+                 keepalive_timeout: float = 30.0, pool_size: int = 100):
+        self.timeout = timeout
+        self.connect_timeout = connect_timeout
+        self.keepalive_timeout = keepalive_timeout
+        self.pool_size = pool_size
+        self._session: Optional[aiohttp.ClientSession] = None
+
+    @property
+    def session(self) -> aiohttp.ClientSession:
+        if self._session is None:
+            raise RuntimeError("HTTP client is not started")
+        return self._session
+
+    async def start(self):
+        """Open the pooled session; must run inside the event loop"""
+        if self._session is None:
+            self._session = aiohttp.ClientSession(
+                connector=aiohttp.TCPConnector(limit=self.pool_size, keepalive_timeout=self.keepalive_timeout),
+                timeout=aiohttp.ClientTimeout(total=self.timeout, connect=self.connect_timeout)
+            )
+
+    async def stop(self):
+        """Close the session and its pooled connections"""
+        if self._session is not None:
+            await self._session.close()
+            self._session = None
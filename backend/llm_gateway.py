@@ -0,0 +1,182 @@
+import asyncio
+import json
+import logging
+import time
+from typing import Any, AsyncIterator, Callable, Dict, List, Optional
+
+import aiohttp
+
+logger = logging.getLogger(__name__)
+
+
+class LlmUnavailable(Exception):
+    """An LLM call was rejected by the limiter or failed upstream; served as a 503"""
+
+
+class CircuitBreaker:
+    """Fails LLM calls fast while the provider looks degraded
+
+    After failure_threshold consecutive failures the breaker opens and rejects
+    calls for reset_timeout seconds. It then lets calls through again: the first
+    success closes it, the first failure opens it for another reset_timeout.
+    """
+
+    def __init__(self, failure_threshold: int = 5, reset_timeout: float = 30.0,
+                 clock: Callable[[], float] = time.monotonic):
+        self.failure_threshold = failure_threshold
+        self.reset_timeout = reset_timeout
+        self._clock = clock
+        self._failures = 0
+        self._opened_at: Optional[float] = None
+
+    @property
+    def state(self) -> str:
+        if self._opened_at is None:
+            return "closed"
+        if self._clock() - self._opened_at < self.reset_timeout:
+            return "open"
+        return "half_open"
+
+    def allow(self) -> bool:
+        return self.state != "open"
+
+    def record_success(self):
+        self._failures = 0
+        self._opened_at = None
+
+    def record_failure(self):
+        self._failures += 1
+        state = self.state
+        if state == "half_open" or (state == "closed" and self._failures >= self.failure_threshold):
+            logger.warning(f"LLM circuit breaker opened after {self._failures} consecutive failures")
+            self._opened_at = self._clock()
+
+
+class LlmLimiter:
+    """Shared gate for every LLM call
+
+    At most max_concurrency calls run at once and at most max_queue more wait for
+    a slot; anything beyond that, or anything arriving while the circuit breaker
+    is open, is rejected immediately with LlmUnavailable instead of piling up
+    sockets. A call (including its wait for a slot) is abandoned after timeout
+    seconds. Once a stream has sent its first chunk, it is also abandoned after
+    idle_timeout seconds without another; the first chunk (which, for providers
+    that do not stream, is the whole completion) only has to beat timeout.
+    """
+
+    def __init__(self, max_concurrency: int = 8, max_queue: int = 32, timeout: float = 30.0,
+                 idle_timeout: float = 10.0, breaker: Optional[CircuitBreaker] = None):
+        self.max_concurrency = max_concurrency
+        self.max_queue = max_queue
+        self.timeout = timeout
+        self.idle_timeout = idle_timeout
+        self.breaker = breaker or CircuitBreaker()
+        self._slots = asyncio.Semaphore(max_concurrency)
+        self._waiting = 0
+        self._running = 0
+
+        # Metrics
+        self.rejected = 0
+        self.timeouts = 0
+        self.failures = 0
+
+    def check(self):
+        """Raise LlmUnavailable if a call made now would be rejected"""
+        if not self.breaker.allow():
+            self.rejected += 1
+            raise LlmUnavailable("AI provider is unavailable, try again shortly")
+        if self._running + self._waiting >= self.max_concurrency + self.max_queue:
+            self.rejected += 1
+            raise LlmUnavailable("AI is busy, try again shortly")
+
+    async def _acquire(self, deadline: float):
+        self.check()
+        self._waiting += 1
+        try:
+            await asyncio.wait_for(self._slots.acquire(), deadline - time.monotonic())
+        except asyncio.TimeoutError:
+            self.timeouts += 1
+            raise LlmUnavailable("Timed out waiting for the AI provider")
+        finally:
+            self._waiting -= 1
+        self._running += 1
+
+    def _release(self):
+        self._running -= 1
+        self._slots.release()
+
+    def _failed(self, error: Exception) -> LlmUnavailable:
+        if isinstance(error, asyncio.TimeoutError):
+            self.timeouts += 1
+            message = "Timed out waiting for the AI provider"
+        else:
+            self.failures += 1
+            message = "AI provider request failed"
+        logger.warning(f"LLM call failed: {error!r}")
+        self.breaker.record_failure()
+        return LlmUnavailable(message)
+
+    async def stream(self, chunks: AsyncIterator[str]) -> AsyncIterator[str]:
+        """Relay an async iterator of completion chunks under the limiter
+
+        The slot is held until the stream ends, so concurrency counts open streams.
+        """
+        deadline = time.monotonic() + self.timeout
+        await self._acquire(deadline)
+        try:
+            iterator = chunks.__aiter__()
+            started = False
+            while True:
+                wait = deadline - time.monotonic()
+                if started:
+                    wait = min(self.idle_timeout, wait)
+                try:
+                    chunk = await asyncio.wait_for(iterator.__anext__(), wait)
+                except StopAsyncIteration:
+                    break
+                except Exception as e:
+                    raise self._failed(e) from e
+                started = True
+                yield chunk
+            self.breaker.record_success()
+        finally:
+            aclose = getattr(chunks, "aclose", None)
+            if aclose is not None:
+                await aclose()
+            self._release()
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "running": self._running,
+            "queued": self._waiting,
+            "rejected": self.rejected,
+            "timeouts": self.timeouts,
+            "failures": self.failures,
+            "breaker": self.breaker.state
+        }
+
+
+async def stream_chat_completion(session: aiohttp.ClientSession, api_base: str, api_key: Optional[str],
+                                 model: str, messages: List[Dict[str, str]]) -> AsyncIterator[str]:
+    """Stream content deltas from an OpenAI-compatible /chat/completions endpoint
+
+    The session's own timeout is lifted, since streams are bounded by LlmLimiter.
+    """
+    async with session.post(
+        f"{api_base.rstrip('/')}/chat/completions",
+        json={"model": model, "messages": messages, "stream": True},
+        headers={"Authorization": f"Bearer {api_key}"} if api_key else {},
+        timeout=aiohttp.ClientTimeout(total=None)
+    ) as response:
+        response.raise_for_status()
+        async for line in response.content:
+            line = line.decode().strip()
+            if not line.startswith("data:"):
+                continue
+            data = line[len("data:"):].strip()
+            if data == "[DONE]":
+                break
+            choices = json.loads(data).get("choices") or [{}]
+            delta = choices[0].get("delta", {}).get("content")
+            if delta:
+                yield delta
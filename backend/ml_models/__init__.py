@@ -1,3 +1,24 @@
-from .collaborative_filter import PodcastRecommender, recommender
+import importlib
 
-__all__ = ['PodcastRecommender', 'recommender']
\ No newline at end of file
+from .serving import ServingRecommender, recommender
+from .recommendation_index import rebuild_recommendation_index, get_indexed_recommendations
+from .training_jobs import TrainingJobManager
+from .model_watcher import ModelWatcher
+from .inference_batcher import InferenceBatcher
+
+# Torch-backed names are imported on first access, so API workers never load torch
+_TORCH_EXPORTS = {
+    'PodcastRecommender': '.collaborative_filter',
+    'export_inference_model': '.inference'
+}
+
+
+def __getattr__(name):
+    if name in _TORCH_EXPORTS:
+        return getattr(importlib.import_module(_TORCH_EXPORTS[name], __name__), name)
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
+
+
+__all__ = ['PodcastRecommender', 'ServingRecommender', 'recommender', 'rebuild_recommendation_index',
+           'get_indexed_recommendations', 'TrainingJobManager', 'ModelWatcher', 'InferenceBatcher',
+           'export_inference_model']
\ No newline at end of file
@@ -4,57 +4,141 @@ import torch.optim as optim
 import numpy as np
 from pathlib import Path
 import pickle
-from typing import List, Dict, Tuple
+from typing import List, Dict, Tuple, Optional, Any, Callable
+from datetime import datetime, timezone
 import logging
+import copy
+
+from .serving import MODEL_MODES, BaseRecommender, write_atomic, write_atomic_dir
 
 logger = logging.getLogger(__name__)
 
+# Columnar training set: (user indices int64, item indices int64, labels float32)
+TrainingTensors = Tuple[torch.Tensor, torch.Tensor, torch.Tensor]
+
+# Called as (epoch, epochs, loss) after every training epoch
+ProgressCallback = Callable[[int, int, float], None]
+
+# Serving-time execution of a trained model (see ml_models.inference)
+INFERENCE_MODES = ("eager", "optimized", "quantized")
+
+
+def build_mlp_layers(input_dim: int, hidden_dims: List[int]) -> Tuple[List[nn.Module], int]:
+    """Build the Linear -> ReLU -> BatchNorm -> Dropout stack shared by both model modes
+    
+    Returns:
+        Tuple of (layers, output dimension)
+    """
+    layers = []
+    
+    for hidden_dim in hidden_dims:
+        layers.append(nn.Linear(input_dim, hidden_dim))
+        layers.append(nn.ReLU())
+        layers.append(nn.BatchNorm1d(hidden_dim))
+        layers.append(nn.Dropout(0.2))
+        input_dim = hidden_dim
+    
+    return layers, input_dim
+
+
+def parse_timestamp(value: Any) -> Optional[datetime]:
+    """Parse a stored created_at (ISO string or datetime) into an aware UTC datetime"""
+    if value is None:
+        return None
+    if isinstance(value, str):
+        value = datetime.fromisoformat(value)
+    if value.tzinfo is None:
+        value = value.replace(tzinfo=timezone.utc)
+    return value
+
+
 class NeuralCollaborativeFiltering(nn.Module):
     """Neural Collaborative Filtering model for podcast matching"""
     
-    def __init__(self, num_users: int, num_items: int, embedding_dim: int = 32, hidden_dims: List[int] = [64, 32, 16]):
+    def __init__(self, num_users: int, num_items: int, embedding_dim: int = 32, hidden_dims: List[int] = [64, 32, 16],
+                 mode: str = "mlp"):
         super(NeuralCollaborativeFiltering, self).__init__()
         
+        if mode not in MODEL_MODES:
+            raise ValueError(f"Unknown model mode: {mode}")
+        
         self.num_users = num_users
         self.num_items = num_items
         self.embedding_dim = embedding_dim
+        self.hidden_dims = list(hidden_dims)
+        self.mode = mode
         
         # User and item embeddings
         self.user_embedding = nn.Embedding(num_users, embedding_dim)
         self.item_embedding = nn.Embedding(num_items, embedding_dim)
         
-        # MLP layers
-        layers = []
-        input_dim = embedding_dim * 2
-        
-        for hidden_dim in hidden_dims:
-            layers.append(nn.Linear(input_dim, hidden_dim))
-            layers.append(nn.ReLU())
-            layers.append(nn.BatchNorm1d(hidden_dim))
-            layers.append(nn.Dropout(0.2))
-            input_dim = hidden_dim
-        
-        # Output layer
-        layers.append(nn.Linear(input_dim, 1))
-        layers.append(nn.Sigmoid())
-        
-        self.mlp = nn.Sequential(*layers)
+        if mode == "mlp":
+            # MLP layers over the concatenated embeddings
+            layers, input_dim = build_mlp_layers(embedding_dim * 2, hidden_dims)
+            
+            # Output layer
+            layers.append(nn.Linear(input_dim, 1))
+            layers.append(nn.Sigmoid())
+            
+            self.mlp = nn.Sequential(*layers)
+        else:
+            self.user_tower = self._build_tower(embedding_dim, hidden_dims)
+            self.item_tower = self._build_tower(embedding_dim, hidden_dims)
         
         # Initialize weights
         self._init_weights()
     
+    @staticmethod
+    def _build_tower(embedding_dim: int, hidden_dims: List[int]) -> nn.Sequential:
+        """Build one tower; it ends in a plain Linear so dot products can take any sign"""
+        layers, input_dim = build_mlp_layers(embedding_dim, hidden_dims[:-1])
+        layers.append(nn.Linear(input_dim, hidden_dims[-1]))
+        return nn.Sequential(*layers)
+    
     def _init_weights(self):
         """Initialize model weights"""
         nn.init.normal_(self.user_embedding.weight, std=0.01)
         nn.init.normal_(self.item_embedding.weight, std=0.01)
         
-        for layer in self.mlp:
+        for layer in self.modules():
             if isinstance(layer, nn.Linear):
                 nn.init.xavier_uniform_(layer.weight)
                 nn.init.zeros_(layer.bias)
     
+    @staticmethod
+    def _grow_embedding(embedding: nn.Embedding, num_rows: int) -> nn.Embedding:
+        """Copy an embedding table into a larger one, initialising only the new rows"""
+        if num_rows <= embedding.num_embeddings:
+            return embedding
+        
+        grown = nn.Embedding(num_rows, embedding.embedding_dim).to(embedding.weight.device)
+        nn.init.normal_(grown.weight, std=0.01)
+        with torch.no_grad():
+            grown.weight[:embedding.num_embeddings] = embedding.weight
+        
+        return grown
+    
+    def grow(self, num_users: int, num_items: int):
+        """Append embedding rows for newly seen users/items, keeping existing rows untouched"""
+        self.user_embedding = self._grow_embedding(self.user_embedding, num_users)
+        self.item_embedding = self._grow_embedding(self.item_embedding, num_items)
+        self.num_users = self.user_embedding.num_embeddings
+        self.num_items = self.item_embedding.num_embeddings
+    
+    def encode_users(self, user_ids: torch.Tensor) -> torch.Tensor:
+        """Map user indices to user tower vectors (two_tower mode only)"""
+        return self.user_tower(self.user_embedding(user_ids))
+    
+    def encode_items(self, item_ids: torch.Tensor) -> torch.Tensor:
+        """Map item indices to item tower vectors (two_tower mode only)"""
+        return self.item_tower(self.item_embedding(item_ids))
+    
     def forward(self, user_ids: torch.Tensor, item_ids: torch.Tensor) -> torch.Tensor:
         """Forward pass"""
+        if self.mode == "two_tower":
+            scores = (self.encode_users(user_ids) * self.encode_items(item_ids)).sum(dim=1)
+            return torch.sigmoid(scores).squeeze()
+        
         user_emb = self.user_embedding(user_ids)
         item_emb = self.item_embedding(item_ids)
         
@@ -84,234 +168,432 @@ class CollaborativeFilterTrainer:
         self.device = torch.device('cuda' if torch.cuda.is_available() else 'cpu')
         self.model.to(self.device)
     
-    def train_epoch(self, train_data: List[Tuple[int, int, float]], batch_size: int = 128) -> float:
-        """Train for one epoch"""
+    def train_epoch(self, train_data: TrainingTensors, batch_size: int = 128) -> float:
+        """Train for one epoch
+        
+        Shuffles a permutation index once per epoch and slices contiguous batches,
+        so there is no per-row Python work inside the loop.
+        """
         self.model.train()
-        total_loss = 0.0
-        num_batches = 0
+        user_ids, item_ids, labels = train_data
+        num_samples = len(labels)
+        
+        if num_samples == 0:
+            return 0.0
         
         # Shuffle data
-        np.random.shuffle(train_data)
+        permutation = torch.randperm(num_samples, device=user_ids.device)
+        user_ids, item_ids, labels = user_ids[permutation], item_ids[permutation], labels[permutation]
         
-        for i in range(0, len(train_data), batch_size):
-            batch = train_data[i:i+batch_size]
-            
-            user_ids = torch.tensor([x[0] for x in batch], dtype=torch.long).to(self.device)
-            item_ids = torch.tensor([x[1] for x in batch], dtype=torch.long).to(self.device)
-            labels = torch.tensor([x[2] for x in batch], dtype=torch.float32).to(self.device)
+        total_loss = torch.zeros((), device=self.device)
+        num_batches = 0
+        
+        for i in range(0, num_samples, batch_size):
+            # BatchNorm needs at least two samples per batch in train mode
+            if min(batch_size, num_samples - i) < 2:
+                break
             
             # Forward pass
-            predictions = self.model(user_ids, item_ids)
-            loss = self.criterion(predictions, labels)
+            predictions = self.model(user_ids[i:i+batch_size], item_ids[i:i+batch_size])
+            loss = self.criterion(predictions, labels[i:i+batch_size])
             
             # Backward pass
             self.optimizer.zero_grad()
             loss.backward()
             self.optimizer.step()
             
-            total_loss += loss.item()
+            # Accumulate on-device to avoid a sync per batch
+            total_loss += loss.detach()
             num_batches += 1
         
-        return total_loss / num_batches if num_batches > 0 else 0.0
+        return total_loss.item() / num_batches if num_batches > 0 else 0.0
     
-    def train(self, train_data: List[Tuple[int, int, float]], epochs: int = 10, batch_size: int = 128):
+    def train(self, train_data: TrainingTensors, epochs: int = 10, batch_size: int = 128,
+              progress_callback: Optional[ProgressCallback] = None):
         """Train the model"""
         logger.info(f"Training collaborative filtering model for {epochs} epochs...")
         
+        # Move the whole dataset to the device once instead of per batch
+        train_data = tuple(column.to(self.device) for column in train_data)
+        
         for epoch in range(epochs):
             loss = self.train_epoch(train_data, batch_size)
             logger.info(f"Epoch {epoch+1}/{epochs}, Loss: {loss:.4f}")
+            
+            if progress_callback:
+                progress_callback(epoch + 1, epochs, loss)
         
         logger.info("Training completed!")
 
 
-class PodcastRecommender:
-    """Podcast recommendation system using collaborative filtering"""
-    
-    def __init__(self, model_path: str = "/app/backend/ml_models/cf_model.pt"):
-        self.model_path = Path(model_path)
-        self.model = None
-        self.user_id_map = {}  # user_id -> index
-        self.item_id_map = {}  # item_id -> index
-        self.reverse_item_map = {}  # index -> item_id
-        self.device = torch.device('cuda' if torch.cuda.is_available() else 'cpu')
-        
-        # Load model if exists
-        if self.model_path.exists():
-            self.load_model()
+class ModelState:
+    """One trained model version together with its id mappings
+    
+    PodcastRecommender publishes a new state with a single attribute assignment, so a
+    reader that grabs the current state once never mixes weights and mappings from
+    different versions or sees a half-trained or half-loaded model.
+    """
+    
+    def __init__(self, model: Optional[NeuralCollaborativeFiltering] = None, user_id_map: Optional[Dict[str, int]] = None,
+                 item_id_map: Optional[Dict[str, int]] = None, model_version: Optional[str] = None,
+                 trained_until: Optional[str] = None):
+        self.model = model
+        self.user_id_map = user_id_map if user_id_map is not None else {}  # user_id -> index
+        self.item_id_map = item_id_map if item_id_map is not None else {}  # item_id -> index
+        self.reverse_item_map = {idx: iid for iid, idx in self.item_id_map.items()}  # index -> item_id
+        self.model_version = model_version
+        self.trained_until = trained_until  # ISO created_at of the newest swipe the model has seen
+        self.scorer = None  # Module used for inference: the model itself or an optimized export
+        self.item_vectors = None  # Precomputed item tower outputs (two_tower mode)
+        self.device = None  # Device the scorer runs on
+    
+    def copy_for_training(self) -> "ModelState":
+        """Copy the model and mappings so fine-tuning never touches the published state"""
+        return ModelState(
+            model=copy.deepcopy(self.model),
+            user_id_map=dict(self.user_id_map),
+            item_id_map=dict(self.item_id_map),
+            model_version=self.model_version,
+            trained_until=self.trained_until
+        )
+    
+    def lookup_users(self, user_ids: List[str]) -> np.ndarray:
+        """Row of each user id, -1 for users the model has not seen"""
+        return np.fromiter((self.user_id_map.get(uid, -1) for uid in user_ids), dtype=np.int64, count=len(user_ids))
     
-    def build_id_mappings(self, user_ids: List[str], item_ids: List[str]):
-        """Build mappings between user/item IDs and indices"""
-        self.user_id_map = {uid: idx for idx, uid in enumerate(set(user_ids))}
-        self.item_id_map = {iid: idx for idx, iid in enumerate(set(item_ids))}
-        self.reverse_item_map = {idx: iid for iid, idx in self.item_id_map.items()}
+    def lookup_items(self, item_ids: List[str]) -> np.ndarray:
+        """Row of each item id, -1 for items the model has not seen"""
+        return np.fromiter((self.item_id_map.get(iid, -1) for iid in item_ids), dtype=np.int64, count=len(item_ids))
     
-    def prepare_training_data(self, swipes: List[Dict]) -> List[Tuple[int, int, float]]:
+    def extend_id_mappings(self, user_ids: List[str], item_ids: List[str]):
+        """Append indices for unseen IDs (in first-seen order), keeping existing assignments stable"""
+        for uid in dict.fromkeys(user_ids):
+            if uid not in self.user_id_map:
+                self.user_id_map[uid] = len(self.user_id_map)
+        
+        for iid in dict.fromkeys(item_ids):
+            if iid not in self.item_id_map:
+                idx = len(self.item_id_map)
+                self.item_id_map[iid] = idx
+                self.reverse_item_map[idx] = iid
+    
+    def prepare_training_data(self, swipes: List[Dict]) -> TrainingTensors:
         """Prepare training data from swipes
         
         Args:
             swipes: List of swipe records with swiper_id, swiped_id, direction
         
         Returns:
-            List of (user_idx, item_idx, label) tuples
+            Columnar (user_idx, item_idx, label) tensors, built once for the whole run
         """
-        training_data = []
+        # Map to indices
+        rows = [
+            (self.user_id_map[s['swiper_id']], self.item_id_map[s['swiped_id']], s['direction'] == 'right')
+            for s in swipes
+            if s['swiper_id'] in self.user_id_map and s['swiped_id'] in self.item_id_map
+        ]
+        
+        if not rows:
+            return (
+                torch.empty(0, dtype=torch.long),
+                torch.empty(0, dtype=torch.long),
+                torch.empty(0, dtype=torch.float32)
+            )
+        
+        columns = np.array(rows, dtype=np.int64)
+        
+        return (
+            torch.from_numpy(columns[:, 0].copy()),
+            torch.from_numpy(columns[:, 1].copy()),
+            torch.from_numpy(columns[:, 2].astype(np.float32))
+        )
+    
+    def prepare_for_serving(self, device: torch.device, inference_mode: str = "eager"):
+        """Build the inference scorer and precompute the two_tower item matrix"""
+        self.scorer = None
+        self.item_vectors = None
+        self.device = device
+        if self.model is None:
+            return
+        
+        self.model.to(device)
+        self.model.eval()
+        self.scorer = self.model
+        
+        if inference_mode != "eager":
+            if device.type == "cpu":
+                from .inference import export_inference_model
+                self.scorer = export_inference_model(self.model, quantize=inference_mode == "quantized")
+            else:
+                logger.warning(f"Inference mode {inference_mode} is CPU only, using the eager model on {device}")
+        
+        if self.model.mode == "two_tower":
+            with torch.no_grad():
+                all_items = torch.arange(self.model.num_items, dtype=torch.long, device=device)
+                self.item_vectors = self.scorer.encode_items(all_items)
+    
+    def score_matrix(self, user_indices: np.ndarray, item_indices: np.ndarray) -> np.ndarray:
+        """Score every user against every item, returning a (num_users, num_items) matrix"""
+        user_indices = torch.from_numpy(user_indices).to(self.device)
+        item_indices = torch.from_numpy(item_indices).to(self.device)
+        
+        with torch.no_grad():
+            if self.item_vectors is not None:
+                user_vectors = self.scorer.encode_users(user_indices)
+                scores = torch.sigmoid(user_vectors @ self.item_vectors[item_indices].T)
+            else:
+                num_users, num_items = len(user_indices), len(item_indices)
+                scores = self.scorer(
+                    user_indices.repeat_interleave(num_items),
+                    item_indices.repeat(num_users)
+                ).reshape(num_users, num_items)
+        
+        return scores.cpu().numpy()
+    
+    def score_pairs(self, user_indices: np.ndarray, item_indices: np.ndarray) -> np.ndarray:
+        """Score aligned (user, item) pairs, returning a 1-D array"""
+        user_indices = torch.from_numpy(user_indices).to(self.device)
+        item_indices = torch.from_numpy(item_indices).to(self.device)
+        
+        with torch.no_grad():
+            if self.item_vectors is not None:
+                # Encode each distinct user once, however many pairs it appears in
+                unique_users, inverse = torch.unique(user_indices, return_inverse=True)
+                user_vectors = self.scorer.encode_users(unique_users)[inverse]
+                scores = torch.sigmoid((user_vectors * self.item_vectors[item_indices]).sum(dim=1))
+            else:
+                scores = self.scorer(user_indices, item_indices).reshape(-1)
+        
+        return scores.cpu().numpy()
+
+
+def load_checkpoint(path: Path, device: torch.device) -> ModelState:
+    """Rebuild the model and mappings saved in a checkpoint file"""
+    checkpoint = torch.load(path, map_location=device)
+    
+    # Recreate model
+    model = NeuralCollaborativeFiltering(
+        num_users=checkpoint['num_users'],
+        num_items=checkpoint['num_items'],
+        embedding_dim=checkpoint['embedding_dim'],
+        hidden_dims=checkpoint.get('hidden_dims', [64, 32, 16]),
+        mode=checkpoint.get('model_mode', 'mlp')
+    )
+    model.load_state_dict(checkpoint['model_state_dict'])
+    
+    # Restore mappings
+    return ModelState(
+        model=model,
+        user_id_map=checkpoint['user_id_map'],
+        item_id_map=checkpoint['item_id_map'],
+        model_version=checkpoint.get('model_version') or 'legacy',
+        trained_until=checkpoint.get('trained_until')
+    )
+
+
+def export_checkpoint_for_serving(checkpoint_path: Path, serving_path: Path):
+    """Write the NumPy serving export for an existing checkpoint"""
+    from .inference import export_serving_weights
+    
+    state = load_checkpoint(checkpoint_path, torch.device('cpu'))
+    write_atomic_dir(serving_path, lambda path: export_serving_weights(state, path))
+
+
+class PodcastRecommender(BaseRecommender):
+    """Podcast recommendation system using collaborative filtering
+    
+    Trains, saves and (with torch) serves models. Next to every versioned checkpoint it
+    writes a NumPy export that serving.ServingRecommender loads without torch.
+    """
+    
+    def __init__(self, model_path: str = "/app/backend/ml_models/cf_model.pt", model_mode: str = "mlp",
+                 inference_mode: str = "eager"):
+        super().__init__(model_path, model_mode)
+        if inference_mode not in INFERENCE_MODES:
+            raise ValueError(f"Unknown inference mode: {inference_mode}")
+        
+        self.inference_mode = inference_mode
+        self.device = torch.device('cuda' if torch.cuda.is_available() else 'cpu')
+        self._state = ModelState()
+        
+        # Load model if exists
+        if self.manifest_path.exists() or self.model_path.exists():
+            self.load_model()
+        self._loaded = True
+    
+    # Id mappings of the published state (the serving format stores them as IdIndex arrays)
+    @property
+    def user_id_map(self) -> Dict[str, int]:
+        return self._state.user_id_map
+    
+    @property
+    def item_id_map(self) -> Dict[str, int]:
+        return self._state.item_id_map
+    
+    @property
+    def reverse_item_map(self) -> Dict[int, str]:
+        return self._state.reverse_item_map
+    
+    def train_model(self, swipes: List[Dict], epochs: int = 10, incremental: bool = False,
+                    progress_callback: Optional[ProgressCallback] = None):
+        """Train the collaborative filtering model
+        
+        Training happens on a private copy; the result is published atomically and saved.
+        
+        Args:
+            swipes: List of swipe records with swiper_id, swiped_id, direction, created_at
+            epochs: Number of passes over the training swipes
+            incremental: Warm-start from the loaded model and fine-tune only on swipes
+                newer than the training watermark, instead of training from scratch
+            progress_callback: Called as (epoch, epochs, loss) after every epoch
+        """
+        if incremental and self.model is not None:
+            self._train_incremental(swipes, epochs, progress_callback)
+            return
         
-        for swipe in swipes:
-            user_id = swipe['swiper_id']
-            item_id = swipe['swiped_id']
-            direction = swipe['direction']
-            
-            # Map to indices
-            if user_id in self.user_id_map and item_id in self.item_id_map:
-                user_idx = self.user_id_map[user_id]
-                item_idx = self.item_id_map[item_id]
-                label = 1.0 if direction == 'right' else 0.0
-                
-                training_data.append((user_idx, item_idx, label))
-        
-        return training_data
-    
-    def train_model(self, swipes: List[Dict], epochs: int = 10):
-        """Train the collaborative filtering model"""
         if len(swipes) < 10:
             logger.warning("Not enough swipe data to train model (need at least 10 swipes)")
             return
         
-        # Extract user and item IDs
-        user_ids = [s['swiper_id'] for s in swipes]
-        item_ids = [s['swiped_id'] for s in swipes]
-        
         # Build mappings
-        self.build_id_mappings(user_ids, item_ids)
+        state = ModelState()
+        state.extend_id_mappings([s['swiper_id'] for s in swipes], [s['swiped_id'] for s in swipes])
         
         # Prepare training data
-        training_data = self.prepare_training_data(swipes)
+        training_data = state.prepare_training_data(swipes)
         
-        if len(training_data) < 10:
+        if len(training_data[2]) < 10:
             logger.warning("Not enough training data after filtering")
             return
         
         # Initialize model
-        num_users = len(self.user_id_map)
-        num_items = len(self.item_id_map)
+        num_users = len(state.user_id_map)
+        num_items = len(state.item_id_map)
         
-        self.model = NeuralCollaborativeFiltering(
+        state.model = NeuralCollaborativeFiltering(
             num_users=num_users,
             num_items=num_items,
             embedding_dim=32,
-            hidden_dims=[64, 32, 16]
+            hidden_dims=[64, 32, 16],
+            mode=self.model_mode
         )
         
         # Train
-        trainer = CollaborativeFilterTrainer(self.model)
-        trainer.train(training_data, epochs=epochs)
+        trainer = CollaborativeFilterTrainer(state.model)
+        trainer.train(training_data, epochs=epochs, progress_callback=progress_callback)
+        self._finish_training(state, swipes)
         
-        # Save model
-        self.save_model()
-        
-        logger.info(f"Model trained with {num_users} users and {num_items} items")
+        logger.info(f"Model trained with {num_users} users and {num_items} items ({self.model_mode} mode)")
     
-    def recommend(self, user_id: str, candidate_ids: List[str], top_k: int = 10) -> List[Tuple[str, float]]:
-        """Get recommendations for a user
-        
-        Args:
-            user_id: User ID to get recommendations for
-            candidate_ids: List of candidate item IDs
-            top_k: Number of top recommendations to return
-        
-        Returns:
-            List of (item_id, score) tuples sorted by score
-        """
-        if self.model is None:
-            # Model not trained yet, return candidates in original order with neutral scores
-            return [(cid, 0.5) for cid in candidate_ids[:top_k]]
-        
-        # Check if user exists in mapping
-        if user_id not in self.user_id_map:
-            # New user, return candidates with neutral scores
-            return [(cid, 0.5) for cid in candidate_ids[:top_k]]
-        
-        user_idx = self.user_id_map[user_id]
-        
-        # Filter candidates that exist in item mapping
-        valid_candidates = [(cid, self.item_id_map[cid]) for cid in candidate_ids if cid in self.item_id_map]
-        
-        if not valid_candidates:
-            # No valid candidates, return originals
-            return [(cid, 0.5) for cid in candidate_ids[:top_k]]
-        
-        # Predict scores
-        self.model.eval()
-        self.model.to(self.device)
+    def _train_incremental(self, swipes: List[Dict], epochs: int, progress_callback: Optional[ProgressCallback]):
+        """Fine-tune the loaded model on swipes newer than the watermark"""
+        watermark = parse_timestamp(self.trained_until)
+        if watermark is not None:
+            # Swipes without a timestamp can't be placed relative to the watermark, keep them
+            swipes = [
+                s for s in swipes
+                if s.get('created_at') is None or parse_timestamp(s['created_at']) > watermark
+            ]
+        
+        if not swipes:
+            logger.info("No swipes newer than the training watermark, model is up to date")
+            return
         
-        candidate_item_ids = [c[1] for c in valid_candidates]
-        user_indices = torch.tensor([user_idx] * len(candidate_item_ids), dtype=torch.long).to(self.device)
-        item_indices = torch.tensor(candidate_item_ids, dtype=torch.long).to(self.device)
+        # Existing users/items keep their rows, new ones get appended
+        state = self._state.copy_for_training()
+        state.extend_id_mappings([s['swiper_id'] for s in swipes], [s['swiped_id'] for s in swipes])
+        state.model.grow(len(state.user_id_map), len(state.item_id_map))
         
-        with torch.no_grad():
-            scores = self.model(user_indices, item_indices).cpu().numpy()
+        training_data = state.prepare_training_data(swipes)
         
-        # Combine with original IDs and sort
-        recommendations = [(valid_candidates[i][0], float(scores[i])) for i in range(len(scores))]
-        recommendations.sort(key=lambda x: x[1], reverse=True)
+        trainer = CollaborativeFilterTrainer(state.model)
+        trainer.train(training_data, epochs=epochs, progress_callback=progress_callback)
+        self._finish_training(state, swipes)
         
-        # Add candidates that weren't in the model with neutral scores
-        unseen_candidates = [cid for cid in candidate_ids if cid not in self.item_id_map]
-        recommendations.extend([(cid, 0.5) for cid in unseen_candidates])
+        logger.info(f"Model fine-tuned on {len(swipes)} new swipes "
+                    f"({state.model.num_users} users, {state.model.num_items} items)")
+    
+    def _finish_training(self, state: ModelState, swipes: List[Dict]):
+        """Stamp a new version and watermark on a trained state, publish it and save it"""
+        timestamps = [parse_timestamp(s['created_at']) for s in swipes if s.get('created_at') is not None]
+        if timestamps:
+            newest = max(timestamps)
+            current = parse_timestamp(state.trained_until)
+            if current is None or newest > current:
+                state.trained_until = newest.isoformat()
+        
+        state.model_version = datetime.now(timezone.utc).strftime("%Y%m%d%H%M%S%f")
+        state.prepare_for_serving(self.device, self.inference_mode)
+        self._state = state
         
-        return recommendations[:top_k]
+        # Save model
+        self.save_model()
     
     def save_model(self):
-        """Save model and mappings"""
-        if self.model is None:
+        """Save model and mappings as a new checkpoint version and make it current"""
+        state = self._state
+        if state.model is None:
             return
         
-        self.model_path.parent.mkdir(parents=True, exist_ok=True)
-        
         checkpoint = {
-            'model_state_dict': self.model.state_dict(),
-            'user_id_map': self.user_id_map,
-            'item_id_map': self.item_id_map,
-            'reverse_item_map': self.reverse_item_map,
-            'num_users': self.model.num_users,
-            'num_items': self.model.num_items,
-            'embedding_dim': self.model.embedding_dim
+            'model_state_dict': state.model.state_dict(),
+            'user_id_map': state.user_id_map,
+            'item_id_map': state.item_id_map,
+            'num_users': state.model.num_users,
+            'num_items': state.model.num_items,
+            'embedding_dim': state.model.embedding_dim,
+            'hidden_dims': state.model.hidden_dims,
+            'model_mode': state.model.mode,
+            'model_version': state.model_version,
+            'trained_until': state.trained_until
         }
         
-        torch.save(checkpoint, self.model_path)
-        logger.info(f"Model saved to {self.model_path}")
+        version_path = self.version_path(state.model_version)
+        write_atomic(version_path, lambda path: torch.save(checkpoint, path))
+        
+        # Torch-free copy of the weights for API workers (serving.ServingRecommender)
+        from .inference import export_serving_weights
+        write_atomic_dir(self.serving_path(state.model_version), lambda path: export_serving_weights(state, path))
+        
+        # Publish the version only once its checkpoint and export are complete on disk
+        def publish(manifest: Dict[str, Any]):
+            manifest["versions"].append({
+                "version": state.model_version,
+                "file": version_path.name,
+                "model_mode": state.model.mode,
+                "num_users": state.model.num_users,
+                "num_items": state.model.num_items,
+                "trained_until": state.trained_until,
+                "created_at": datetime.now(timezone.utc).isoformat()
+            })
+            manifest["current"] = state.model_version
+        
+        self.update_manifest(publish)
+        
+        logger.info(f"Model saved to {version_path}")
     
-    def load_model(self):
-        """Load model and mappings"""
-        if not self.model_path.exists():
-            logger.warning(f"Model file not found at {self.model_path}")
-            return
+    def load_model(self, version: Optional[str] = None):
+        """Load model and mappings
         
+        Loads the given version, or the manifest's current version (falling back to
+        the legacy checkpoint at model_path). The new state is fully built before it
+        is published, so concurrent readers keep using the previous model until the
+        swap. On failure the previous model stays.
+        """
         try:
-            checkpoint = torch.load(self.model_path, map_location=self.device)
+            manifest_stamp = self._read_manifest_stamp()
+            version = version or self.read_manifest().get("current")
+            path = self.version_path(version) if version else self.model_path
             
-            # Restore mappings
-            self.user_id_map = checkpoint['user_id_map']
-            self.item_id_map = checkpoint['item_id_map']
-            self.reverse_item_map = checkpoint['reverse_item_map']
+            if not path.exists():
+                logger.warning(f"Model file not found at {path}")
+                return
             
-            # Recreate model
-            self.model = NeuralCollaborativeFiltering(
-                num_users=checkpoint['num_users'],
-                num_items=checkpoint['num_items'],
-                embedding_dim=checkpoint['embedding_dim']
-            )
+            state = load_checkpoint(path, self.device)
+            state.prepare_for_serving(self.device, self.inference_mode)
             
-            self.model.load_state_dict(checkpoint['model_state_dict'])
-            self.model.to(self.device)
-            self.model.eval()
-            
-            logger.info(f"Model loaded from {self.model_path}")
+            self._state = state
+            self._manifest_stamp = manifest_stamp
+            logger.info(f"Model {state.model_version} loaded from {path}")
         except Exception as e:
             logger.error(f"Error loading model: {e}")
-            self.model = None
-
-
-# Global recommender instance
-recommender = PodcastRecommender()
\ No newline at end of file
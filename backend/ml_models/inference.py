@@ -0,0 +1,168 @@
+import copy
+import json
+from pathlib import Path
+from typing import Optional, Tuple
+
+import numpy as np
+import torch
+import torch.nn as nn
+
+from .collaborative_filter import ModelState, NeuralCollaborativeFiltering
+from .serving import SERVING_LAYERS, sorted_id_arrays
+
+# Inference modes (PodcastRecommender inference_mode):
+#   eager     - the training module as-is (BatchNorm, Dropout, eager PyTorch)
+#   optimized - BatchNorm folded into Linear, Dropout removed, scripted and frozen
+#   quantized - optimized plus dynamic int8 quantization of the Linear layers
+
+
+def _batchnorm_affine(bn: nn.BatchNorm1d) -> Tuple[torch.Tensor, torch.Tensor]:
+    """Express an eval-mode BatchNorm as y = x * scale + shift"""
+    scale = bn.weight / torch.sqrt(bn.running_var + bn.eps)
+    shift = bn.bias - bn.running_mean * scale
+    return scale, shift
+
+
+def fold_batchnorm(layers: nn.Sequential) -> nn.Sequential:
+    """Return an inference-only copy of a Linear/ReLU/BatchNorm/Dropout stack
+
+    The model applies BatchNorm after the ReLU, so it cannot be folded into the
+    preceding Linear. Instead each BatchNorm is folded into the Linear that follows
+    it: W' = W * scale (per input column), b' = b + W @ shift. Dropout is an identity
+    in eval mode and is dropped.
+    """
+    folded = []
+    pending: Optional[Tuple[torch.Tensor, torch.Tensor]] = None
+
+    with torch.no_grad():
+        for layer in layers:
+            if isinstance(layer, nn.Dropout):
+                continue
+
+            if isinstance(layer, nn.BatchNorm1d):
+                if pending is not None:
+                    raise ValueError("Consecutive BatchNorm layers are not supported")
+                pending = _batchnorm_affine(layer)
+                continue
+
+            if isinstance(layer, nn.Linear):
+                linear = nn.Linear(layer.in_features, layer.out_features)
+                weight, bias = layer.weight, layer.bias
+                if pending is not None:
+                    scale, shift = pending
+                    bias = bias + weight @ shift
+                    weight = weight * scale
+                    pending = None
+                linear.weight.copy_(weight)
+                linear.bias.copy_(bias)
+                folded.append(linear)
+                continue
+
+            folded.append(copy.deepcopy(layer))
+
+    if pending is not None:
+        raise ValueError("BatchNorm must be followed by a Linear layer to be folded")
+
+    return nn.Sequential(*folded)
+
+
+class FoldedNCF(nn.Module):
+    """Inference-only MLP-mode model"""
+
+    def __init__(self, model: NeuralCollaborativeFiltering):
+        super().__init__()
+        self.user_embedding = copy.deepcopy(model.user_embedding)
+        self.item_embedding = copy.deepcopy(model.item_embedding)
+        self.mlp = fold_batchnorm(model.mlp)
+
+    def forward(self, user_ids: torch.Tensor, item_ids: torch.Tensor) -> torch.Tensor:
+        x = torch.cat([self.user_embedding(user_ids), self.item_embedding(item_ids)], dim=1)
+        return self.mlp(x).reshape(-1)
+
+
+class FoldedTwoTower(nn.Module):
+    """Inference-only two_tower-mode model"""
+
+    def __init__(self, model: NeuralCollaborativeFiltering):
+        super().__init__()
+        self.user_embedding = copy.deepcopy(model.user_embedding)
+        self.item_embedding = copy.deepcopy(model.item_embedding)
+        self.user_tower = fold_batchnorm(model.user_tower)
+        self.item_tower = fold_batchnorm(model.item_tower)
+
+    @torch.jit.export
+    def encode_users(self, user_ids: torch.Tensor) -> torch.Tensor:
+        return self.user_tower(self.user_embedding(user_ids))
+
+    @torch.jit.export
+    def encode_items(self, item_ids: torch.Tensor) -> torch.Tensor:
+        return self.item_tower(self.item_embedding(item_ids))
+
+    def forward(self, user_ids: torch.Tensor, item_ids: torch.Tensor) -> torch.Tensor:
+        return torch.sigmoid((self.encode_users(user_ids) * self.encode_items(item_ids)).sum(dim=1))
+
+
+def export_inference_model(model: NeuralCollaborativeFiltering, quantize: bool = False) -> torch.jit.ScriptModule:
+    """Build a frozen TorchScript inference model from a trained (CPU) model
+
+    Args:
+        model: Trained model
+        quantize: Apply dynamic int8 quantization to the Linear layers
+
+    Returns:
+        Scripted module with the same forward() (and encode_users/encode_items in
+        two_tower mode) as the eager model
+    """
+    model = model.cpu().eval()
+    folded = FoldedTwoTower(model) if model.mode == "two_tower" else FoldedNCF(model)
+    folded.eval()
+
+    if quantize:
+        folded = torch.ao.quantization.quantize_dynamic(folded, {nn.Linear}, dtype=torch.qint8)
+
+    scripted = torch.jit.script(folded)
+    preserved = ["encode_users", "encode_items"] if model.mode == "two_tower" else []
+    return torch.jit.freeze(scripted, preserved_attrs=preserved)
+
+
+def export_serving_weights(state: ModelState, directory: Path):
+    """Write a model and its id mappings as a serving export for serving.ServingRecommender
+
+    The directory holds one .npy file per array plus meta.json: sorted id and row
+    arrays (see serving.IdIndex), float32 embedding matrices, and each stack after
+    BatchNorm folding as its Linear layers only. The folded stacks alternate Linear
+    and ReLU (plus a final Sigmoid in mlp mode), which is the forward pass
+    serving.NumpyModel reproduces.
+    """
+    model = state.model
+    user_ids, user_rows = sorted_id_arrays(state.user_id_map)
+    item_ids, item_rows = sorted_id_arrays(state.item_id_map)
+
+    arrays = {
+        "user_ids": user_ids,
+        "user_rows": user_rows,
+        "item_ids": item_ids,
+        "item_rows": item_rows,
+        "user_embedding": model.user_embedding.weight.detach().cpu().numpy(),
+        "item_embedding": model.item_embedding.weight.detach().cpu().numpy()
+    }
+    layers = {}
+
+    for name in SERVING_LAYERS[model.mode]:
+        linears = [layer for layer in fold_batchnorm(getattr(model, name)) if isinstance(layer, nn.Linear)]
+        layers[name] = len(linears)
+        for i, linear in enumerate(linears):
+            arrays[f"{name}.{i}.weight"] = linear.weight.detach().numpy()
+            arrays[f"{name}.{i}.bias"] = linear.bias.detach().numpy()
+
+    for name, array in arrays.items():
+        np.save(directory / f"{name}.npy", array)
+
+    meta = {
+        "mode": model.mode,
+        "model_version": state.model_version,
+        "trained_until": state.trained_until,
+        "layers": layers
+    }
+    with open(directory / "meta.json", "w") as f:
+        json.dump(meta, f, indent=2)
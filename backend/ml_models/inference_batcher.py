@@ -0,0 +1,117 @@
+import asyncio
+from typing import Dict, List, Optional, Tuple
+import logging
+
+from .serving import BaseRecommender
+
+logger = logging.getLogger(__name__)
+
+# Histogram buckets: a value is counted under the smallest bound it does not exceed
+HISTOGRAM_BOUNDS = (1, 2, 4, 8, 16, 32, 64, 128, 256)
+
+
+def _histogram_bucket(value: int) -> str:
+    for bound in HISTOGRAM_BOUNDS:
+        if value <= bound:
+            return f"<={bound}"
+    return f">{HISTOGRAM_BOUNDS[-1]}"
+
+
+class InferenceBatcher:
+    """Coalesces concurrent recommend() calls into one forward pass
+
+    Requests are collected until max_batch_size is reached or max_wait_ms has passed
+    since the first one arrived. The batch is scored with a single
+    recommend_many() call in a worker thread and results are scattered back to
+    each waiting caller. Batches run one at a time, so requests that arrive during
+    a forward pass simply join the next batch.
+    """
+
+    def __init__(self, recommender: BaseRecommender, max_batch_size: int = 32, max_wait_ms: float = 3.0):
+        self.recommender = recommender
+        self.max_batch_size = max_batch_size
+        self.max_wait = max_wait_ms / 1000
+        self._queue: Optional[asyncio.Queue] = None
+        self._worker: Optional[asyncio.Task] = None
+
+        # Metrics
+        self.total_requests = 0
+        self.total_batches = 0
+        self.max_queue_depth = 0
+        self.batch_size_histogram: Dict[str, int] = {}
+        self.queue_depth_histogram: Dict[str, int] = {}
+
+    async def recommend(self, user_id: str, candidate_ids: List[str], top_k: int = 10) -> List[Tuple[str, float]]:
+        """Same contract as BaseRecommender.recommend, batched with concurrent callers"""
+        if self._worker is None or self._worker.done():
+            self._queue = asyncio.Queue()
+            self._worker = asyncio.create_task(self._run())
+
+        future = asyncio.get_running_loop().create_future()
+        await self._queue.put(((user_id, candidate_ids, top_k), future))
+
+        depth = self._queue.qsize()
+        self.max_queue_depth = max(self.max_queue_depth, depth)
+        bucket = _histogram_bucket(depth)
+        self.queue_depth_histogram[bucket] = self.queue_depth_histogram.get(bucket, 0) + 1
+
+        return await future
+
+    async def _collect_batch(self) -> list:
+        """Wait for one request, then gather more until the batch is full or the window closes"""
+        loop = asyncio.get_running_loop()
+        batch = [await self._queue.get()]
+        deadline = loop.time() + self.max_wait
+
+        while len(batch) < self.max_batch_size:
+            # Take whatever is already queued without waiting
+            if not self._queue.empty():
+                batch.append(self._queue.get_nowait())
+                continue
+
+            timeout = deadline - loop.time()
+            if timeout <= 0:
+                break
+            try:
+                batch.append(await asyncio.wait_for(self._queue.get(), timeout))
+            except asyncio.TimeoutError:
+                break
+
+        return batch
+
+    async def _run(self):
+        while True:
+            batch = await self._collect_batch()
+            requests = [request for request, _ in batch]
+
+            self.total_requests += len(batch)
+            self.total_batches += 1
+            bucket = _histogram_bucket(len(batch))
+            self.batch_size_histogram[bucket] = self.batch_size_histogram.get(bucket, 0) + 1
+
+            try:
+                results = await asyncio.to_thread(self.recommender.recommend_many, requests)
+            except Exception as e:
+                logger.error(f"Batched inference failed: {e}")
+                for _, future in batch:
+                    if not future.done():
+                        future.set_exception(e)
+                continue
+
+            for (_, future), result in zip(batch, results):
+                if not future.done():
+                    future.set_result(result)
+
+    def stats(self) -> Dict:
+        """Queue depth and batch size metrics"""
+        return {
+            "queue_depth": self._queue.qsize() if self._queue is not None else 0,
+            "max_queue_depth": self.max_queue_depth,
+            "total_requests": self.total_requests,
+            "total_batches": self.total_batches,
+            "avg_batch_size": self.total_requests / self.total_batches if self.total_batches else 0.0,
+            "max_batch_size": self.max_batch_size,
+            "max_wait_ms": self.max_wait * 1000,
+            "batch_size_histogram": self.batch_size_histogram,
+            "queue_depth_histogram": self.queue_depth_histogram
+        }
@@ -0,0 +1,51 @@
+import asyncio
+from typing import Optional
+import logging
+
+from .serving import BaseRecommender
+
+logger = logging.getLogger(__name__)
+
+
+class ModelWatcher:
+    """Polls the checkpoint manifest and hot-reloads models published by other workers
+
+    Each poll is a stat() of the manifest; the new model is built in a thread and
+    swapped in atomically, so requests keep using the old model until it is ready.
+    The watcher also performs the initial load, so a worker starts serving before
+    its model is read from disk.
+    """
+
+    def __init__(self, recommender: BaseRecommender, interval: float = 5.0):
+        self.recommender = recommender
+        self.interval = interval
+        self._task: Optional[asyncio.Task] = None
+
+    def start(self):
+        """Start polling in the background"""
+        if self._task is None:
+            self._task = asyncio.create_task(self._run())
+
+    async def stop(self):
+        """Stop polling"""
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+
+    async def _run(self):
+        try:
+            await asyncio.to_thread(self.recommender.ensure_loaded)
+        except Exception as e:
+            logger.error(f"Error loading model: {e}")
+
+        while True:
+            await asyncio.sleep(self.interval)
+            try:
+                if await asyncio.to_thread(self.recommender.reload_if_changed):
+                    logger.info(f"Hot-reloaded model {self.recommender.model_version}")
+            except Exception as e:
+                logger.error(f"Error checking for model updates: {e}")
@@ -0,0 +1,88 @@
+import asyncio
+from datetime import datetime, timezone
+from typing import List, Optional
+import logging
+
+from pymongo import UpdateOne
+
+logger = logging.getLogger(__name__)
+
+# Ranked items kept per user; large enough to survive filtering out already-swiped ids
+INDEX_TOP_K = 200
+WRITE_BATCH_SIZE = 500
+
+ROLE_TARGETS = {"host": "guest", "guest": "host"}
+
+
+async def rebuild_recommendation_index(db, recommender, top_k: int = INDEX_TOP_K) -> int:
+    """Score every user against the opposite-role catalog and store a ranked top-K list per user
+
+    Entries are keyed by (user_id, model_version) so workers still serving an older
+    model keep missing cleanly instead of reading rankings from a different model.
+
+    Returns:
+        Number of users indexed
+    """
+    model_version = recommender.model_version
+    if recommender.model is None or model_version is None:
+        logger.warning("No trained model available, skipping recommendation index build")
+        return 0
+
+    users = await db.users.find(
+        {"profile_completed": True, "role": {"$in": list(ROLE_TARGETS)}},
+        {"_id": 0, "user_id": 1, "role": 1}
+    ).to_list(None)
+
+    users_by_role = {role: [] for role in ROLE_TARGETS}
+    for user in users:
+        users_by_role[user["role"]].append(user["user_id"])
+
+    now = datetime.now(timezone.utc)
+    indexed = 0
+
+    for role, target_role in ROLE_TARGETS.items():
+        # Scoring is CPU bound, keep it off the event loop
+        rankings = await asyncio.to_thread(
+            recommender.rank_catalog, users_by_role[role], users_by_role[target_role], top_k
+        )
+
+        operations = [
+            UpdateOne(
+                {"user_id": user_id, "model_version": model_version},
+                {"$set": {
+                    "user_id": user_id,
+                    "model_version": model_version,
+                    "item_ids": [item_id for item_id, _ in ranked],
+                    "scores": [score for _, score in ranked],
+                    "created_at": now
+                }},
+                upsert=True
+            )
+            for user_id, ranked in rankings.items()
+        ]
+
+        for i in range(0, len(operations), WRITE_BATCH_SIZE):
+            await db.recommendation_index.bulk_write(operations[i:i + WRITE_BATCH_SIZE], ordered=False)
+
+        indexed += len(operations)
+
+    # Drop rankings produced by previous models
+    await db.recommendation_index.delete_many({"model_version": {"$ne": model_version}})
+
+    logger.info(f"Recommendation index built for {indexed} users (model {model_version})")
+    return indexed
+
+
+async def get_indexed_recommendations(db, user_id: str, model_version: Optional[str]) -> Optional[List[str]]:
+    """Get the precomputed ranking for a user, or None on an index miss"""
+    if model_version is None:
+        return None
+
+    entry = await db.recommendation_index.find_one(
+        {"user_id": user_id, "model_version": model_version},
+        {"_id": 0, "item_ids": 1}
+    )
+    if not entry:
+        return None
+
+    return entry["item_ids"]
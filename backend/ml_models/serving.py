@@ -0,0 +1,545 @@
+import fcntl
+import json
+import os
+import shutil
+import threading
+from pathlib import Path
+from typing import Any, Callable, Dict, List, Optional, Tuple
+import logging
+
+import numpy as np
+
+logger = logging.getLogger(__name__)
+
+# Scoring modes: "mlp" scores each (user, item) pair through a joint MLP, "two_tower"
+# encodes users and items separately and scores them with a dot product
+MODEL_MODES = ("mlp", "two_tower")
+
+# Linear stacks stored in a serving export, per model mode
+SERVING_LAYERS = {"mlp": ("mlp",), "two_tower": ("user_tower", "item_tower")}
+
+# Serving export arrays opened with mmap, so workers share them through the page cache
+MMAP_ARRAYS = ("user_ids", "user_rows", "item_ids", "item_rows", "user_embedding", "item_embedding")
+
+
+def write_atomic(path: Path, write: Callable[[Path], None]):
+    """Write a file via a temporary sibling and rename it into place
+
+    Readers in other processes see either the old file or the complete new one.
+    """
+    path.parent.mkdir(parents=True, exist_ok=True)
+    tmp_path = path.with_name(f"{path.name}.{os.getpid()}.tmp")
+    write(tmp_path)
+    os.replace(tmp_path, path)
+
+
+def write_atomic_dir(path: Path, write: Callable[[Path], None]):
+    """Build a directory under a temporary sibling name and rename it into place
+
+    If another process published the same directory first, its copy is kept.
+    """
+    tmp_path = path.with_name(f"{path.name}.{os.getpid()}.tmp")
+    shutil.rmtree(tmp_path, ignore_errors=True)
+    tmp_path.mkdir(parents=True)
+
+    try:
+        write(tmp_path)
+        try:
+            os.rename(tmp_path, path)
+        except OSError:
+            if not path.is_dir():
+                raise
+    finally:
+        shutil.rmtree(tmp_path, ignore_errors=True)
+
+
+def sigmoid(x: np.ndarray) -> np.ndarray:
+    # tanh form does not overflow for large negative inputs
+    return 0.5 * (1.0 + np.tanh(0.5 * x))
+
+
+def top_k_rows(scores: np.ndarray, k: int) -> Tuple[np.ndarray, np.ndarray]:
+    """Row-wise top-k of a (rows, columns) matrix, highest first
+
+    Returns:
+        Tuple of (scores, column positions), each (rows, k)
+    """
+    if k < scores.shape[1]:
+        positions = np.argpartition(-scores, k - 1, axis=1)[:, :k]
+    else:
+        positions = np.broadcast_to(np.arange(scores.shape[1]), scores.shape)
+
+    order = np.argsort(-np.take_along_axis(scores, positions, axis=1), axis=1, kind="stable")
+    positions = np.take_along_axis(positions, order, axis=1)
+    return np.take_along_axis(scores, positions, axis=1), positions
+
+
+def encode_ids(ids: List[str]) -> np.ndarray:
+    """UTF-8 byte strings, which sort in the same order as the str ids"""
+    return np.char.encode(np.asarray(ids, dtype=str), "utf-8")
+
+
+def sorted_id_arrays(id_map: Dict[str, int]) -> Tuple[np.ndarray, np.ndarray]:
+    """Split an id -> row mapping into sorted id and row arrays for IdIndex"""
+    ids = encode_ids(list(id_map))
+    rows = np.fromiter(id_map.values(), dtype=np.int64, count=len(id_map))
+    order = np.argsort(ids, kind="stable")
+    return ids[order], rows[order]
+
+
+class IdIndex:
+    """Id -> embedding row lookup over sorted arrays
+
+    Replaces a Python dict with two flat arrays that can be memory-mapped; lookups
+    are a vectorized binary search.
+    """
+
+    def __init__(self, ids: Optional[np.ndarray] = None, rows: Optional[np.ndarray] = None):
+        self.ids = ids if ids is not None else np.empty(0, dtype="S1")  # Sorted UTF-8 ids
+        self.rows = rows if rows is not None else np.empty(0, dtype=np.int64)  # Row of each id
+
+    def __len__(self) -> int:
+        return len(self.ids)
+
+    def lookup(self, ids: List[str]) -> np.ndarray:
+        """Rows for the given ids, -1 for ids not in the index"""
+        if not len(self.ids) or not len(ids):
+            return np.full(len(ids), -1, dtype=np.int64)
+
+        keys = encode_ids(ids)
+        positions = np.minimum(np.searchsorted(self.ids, keys), len(self.ids) - 1)
+        found = self.ids[positions] == keys
+        return np.where(found, self.rows[positions], -1)
+
+
+class NumpyModel:
+    """Pure-NumPy forward pass over a serving export
+
+    The export holds the optimized inference model (see ml_models.inference): BatchNorm
+    already folded into the Linear layers and Dropout removed, so each stack is just
+    Linear layers with a ReLU between them. mlp mode applies a sigmoid to the output,
+    two_tower mode to the dot product of the tower outputs.
+    """
+
+    def __init__(self, mode: str, user_embedding: np.ndarray, item_embedding: np.ndarray,
+                 layers: Dict[str, List[Tuple[np.ndarray, np.ndarray]]]):
+        self.mode = mode
+        self.user_embedding = user_embedding
+        self.item_embedding = item_embedding
+        self.layers = layers  # Stack name -> [(weight (in, out), bias), ...]
+        self.num_users = len(user_embedding)
+        self.num_items = len(item_embedding)
+
+    @staticmethod
+    def _run(layers: List[Tuple[np.ndarray, np.ndarray]], x: np.ndarray) -> np.ndarray:
+        for i, (weight, bias) in enumerate(layers):
+            x = x @ weight + bias
+            if i < len(layers) - 1:
+                np.maximum(x, 0, out=x)
+        return x
+
+    def encode_users(self, user_indices: np.ndarray) -> np.ndarray:
+        return self._run(self.layers["user_tower"], self.user_embedding[user_indices])
+
+    def encode_items(self, item_indices: np.ndarray) -> np.ndarray:
+        return self._run(self.layers["item_tower"], self.item_embedding[item_indices])
+
+    def __call__(self, user_indices: np.ndarray, item_indices: np.ndarray) -> np.ndarray:
+        if self.mode == "two_tower":
+            return sigmoid((self.encode_users(user_indices) * self.encode_items(item_indices)).sum(axis=1))
+
+        x = np.concatenate([self.user_embedding[user_indices], self.item_embedding[item_indices]], axis=1)
+        return sigmoid(self._run(self.layers["mlp"], x)).reshape(-1)
+
+
+class ServingState:
+    """Torch-free counterpart of collaborative_filter.ModelState, backed by a NumpyModel"""
+
+    def __init__(self, model: Optional[NumpyModel] = None, user_index: Optional[IdIndex] = None,
+                 item_index: Optional[IdIndex] = None, model_version: Optional[str] = None,
+                 trained_until: Optional[str] = None):
+        self.model = model
+        self.user_index = user_index if user_index is not None else IdIndex()
+        self.item_index = item_index if item_index is not None else IdIndex()
+        self.model_version = model_version
+        self.trained_until = trained_until
+        self.item_vectors = None  # Precomputed item tower outputs (two_tower mode)
+
+        if model is not None and model.mode == "two_tower":
+            self.item_vectors = model.encode_items(np.arange(model.num_items))
+
+    def lookup_users(self, user_ids: List[str]) -> np.ndarray:
+        return self.user_index.lookup(user_ids)
+
+    def lookup_items(self, item_ids: List[str]) -> np.ndarray:
+        return self.item_index.lookup(item_ids)
+
+    def score_matrix(self, user_indices: np.ndarray, item_indices: np.ndarray) -> np.ndarray:
+        """Score every user against every item, returning a (num_users, num_items) matrix"""
+        if self.item_vectors is not None:
+            return sigmoid(self.model.encode_users(user_indices) @ self.item_vectors[item_indices].T)
+
+        num_users, num_items = len(user_indices), len(item_indices)
+        scores = self.model(np.repeat(user_indices, num_items), np.tile(item_indices, num_users))
+        return scores.reshape(num_users, num_items)
+
+    def score_pairs(self, user_indices: np.ndarray, item_indices: np.ndarray) -> np.ndarray:
+        """Score aligned (user, item) pairs, returning a 1-D array"""
+        if self.item_vectors is not None:
+            # Encode each distinct user once, however many pairs it appears in
+            unique_users, inverse = np.unique(user_indices, return_inverse=True)
+            user_vectors = self.model.encode_users(unique_users)[inverse]
+            return sigmoid((user_vectors * self.item_vectors[item_indices]).sum(axis=1))
+
+        return self.model(user_indices, item_indices)
+
+
+def load_serving_weights(path: Path) -> ServingState:
+    """Open a serving export directory written by inference.export_serving_weights
+
+    Ids and embeddings are memory-mapped read-only; only the small Linear layers are
+    read into process memory.
+    """
+    with open(path / "meta.json") as f:
+        meta = json.load(f)
+
+    arrays = {name: np.load(path / f"{name}.npy", mmap_mode="r") for name in MMAP_ARRAYS}
+
+    layers = {}
+    for name, count in meta["layers"].items():
+        layers[name] = [
+            (np.ascontiguousarray(np.load(path / f"{name}.{i}.weight.npy").T), np.load(path / f"{name}.{i}.bias.npy"))
+            for i in range(count)
+        ]
+
+    return ServingState(
+        model=NumpyModel(meta["mode"], arrays["user_embedding"], arrays["item_embedding"], layers),
+        user_index=IdIndex(arrays["user_ids"], arrays["user_rows"]),
+        item_index=IdIndex(arrays["item_ids"], arrays["item_rows"]),
+        model_version=meta["model_version"],
+        trained_until=meta["trained_until"]
+    )
+
+
+class BaseRecommender:
+    """Versioned checkpoint handling and ranking shared by the training and serving recommenders
+
+    Every trained model is saved as its own versioned checkpoint next to model_path,
+    and a small JSON manifest points at the current version. Workers poll the
+    manifest (see reload_if_changed) to pick up models trained by other processes,
+    and rollback() repoints the manifest at any earlier version. Processes change
+    the manifest only through update_manifest, under an exclusive lock. A bare legacy
+    checkpoint at model_path is still loaded when no manifest exists.
+
+    The published state is any object with the ModelState/ServingState interface:
+    ids are resolved to rows with lookup_users/lookup_items and scored with
+    score_pairs/score_matrix, all on NumPy arrays.
+    """
+
+    def __init__(self, model_path: str = "/app/backend/ml_models/cf_model.pt", model_mode: str = "mlp"):
+        if model_mode not in MODEL_MODES:
+            raise ValueError(f"Unknown model mode: {model_mode}")
+
+        self.model_path = Path(model_path)
+        self.manifest_path = self.model_path.with_suffix(".manifest.json")
+        self.manifest_lock_path = self.model_path.with_suffix(".manifest.lock")
+        self.versions_dir = self.model_path.parent / f"{self.model_path.stem}_versions"
+        self.model_mode = model_mode  # Mode used for the next training run
+        self._state = ServingState()
+        self._manifest_stamp = None  # (inode, mtime) of the manifest last acted on
+        self._loaded = False  # Whether a load of the current model has been attempted
+        self._load_lock = threading.Lock()
+
+    # Read-only views of the published state
+    @property
+    def model(self):
+        return self._state.model
+
+    @property
+    def model_version(self) -> Optional[str]:
+        return self._state.model_version
+
+    @property
+    def trained_until(self) -> Optional[str]:
+        return self._state.trained_until
+
+    @property
+    def supports_full_catalog(self) -> bool:
+        """Whether scoring is cheap enough to rank the whole catalog on every request"""
+        return self._state.item_vectors is not None
+
+    def load_model(self, version: Optional[str] = None):
+        raise NotImplementedError
+
+    def ensure_loaded(self):
+        """Load the current model unless a load has already been attempted"""
+        if self._loaded:
+            return
+
+        with self._load_lock:
+            if not self._loaded:
+                self.load_model()
+                self._loaded = True
+
+    def recommend(self, user_id: str, candidate_ids: List[str], top_k: int = 10) -> List[Tuple[str, float]]:
+        """Get recommendations for a user
+
+        Args:
+            user_id: User ID to get recommendations for
+            candidate_ids: List of candidate item IDs
+            top_k: Number of top recommendations to return
+
+        Returns:
+            List of (item_id, score) tuples sorted by score
+        """
+        return self.recommend_many([(user_id, candidate_ids, top_k)])[0]
+
+    def recommend_many(self, requests: List[Tuple[str, List[str], int]]) -> List[List[Tuple[str, float]]]:
+        """Answer several recommend() requests with one concatenated forward pass
+
+        Args:
+            requests: List of (user_id, candidate_ids, top_k) tuples
+
+        Returns:
+            One recommend() result per request, in order
+        """
+        self.ensure_loaded()
+        state = self._state
+
+        # Model not trained yet: candidates in original order with neutral scores
+        if state.model is None:
+            return [[(cid, 0.5) for cid in candidate_ids[:top_k]] for _, candidate_ids, top_k in requests]
+
+        # Resolve every id in the batch with one vectorized lookup per table
+        user_rows = state.lookup_users([user_id for user_id, _, _ in requests])
+        item_rows = state.lookup_items([cid for _, candidate_ids, _ in requests for cid in candidate_ids])
+
+        results = [None] * len(requests)
+
+        # (request position, mask of candidates the model knows)
+        scored = []
+        user_indices = []
+        item_indices = []
+
+        offset = 0
+        for pos, (user_id, candidate_ids, top_k) in enumerate(requests):
+            rows = item_rows[offset:offset + len(candidate_ids)]
+            offset += len(candidate_ids)
+            known = rows >= 0
+
+            # New user or no known candidates: candidates in original order with neutral scores
+            if user_rows[pos] < 0 or not known.any():
+                results[pos] = [(cid, 0.5) for cid in candidate_ids[:top_k]]
+                continue
+
+            scored.append((pos, known))
+            user_indices.append(np.full(int(known.sum()), user_rows[pos], dtype=np.int64))
+            item_indices.append(rows[known])
+
+        if not scored:
+            return results
+
+        # Predict scores
+        scores = state.score_pairs(np.concatenate(user_indices), np.concatenate(item_indices))
+
+        offset = 0
+        for pos, known in scored:
+            _, candidate_ids, top_k = requests[pos]
+            valid_candidates = [cid for cid, is_known in zip(candidate_ids, known) if is_known]
+            request_scores = scores[offset:offset + len(valid_candidates)]
+            offset += len(valid_candidates)
+
+            # Combine with original IDs and sort
+            recommendations = [(cid, float(score)) for cid, score in zip(valid_candidates, request_scores)]
+            recommendations.sort(key=lambda x: x[1], reverse=True)
+
+            # Add candidates that weren't in the model with neutral scores
+            recommendations.extend((cid, 0.5) for cid, is_known in zip(candidate_ids, known) if not is_known)
+
+            results[pos] = recommendations[:top_k]
+
+        return results
+
+    def rank_catalog(self, user_ids: List[str], catalog_ids: List[str], top_k: int = 200,
+                     max_pairs_per_batch: int = 65536) -> Dict[str, List[Tuple[str, float]]]:
+        """Score every user against the whole catalog in batched passes
+
+        In two_tower mode each batch is one matmul against the precomputed item matrix.
+
+        Args:
+            user_ids: Users to build rankings for (users unknown to the model are skipped)
+            catalog_ids: Full list of candidate item IDs
+            top_k: Number of ranked items to keep per user
+            max_pairs_per_batch: Upper bound on user-item pairs per forward pass
+
+        Returns:
+            Dict of user_id -> list of (item_id, score) tuples, ordered like recommend()
+        """
+        self.ensure_loaded()
+        state = self._state
+
+        if state.model is None:
+            return {}
+
+        user_rows = state.lookup_users(user_ids)
+        item_rows = state.lookup_items(catalog_ids)
+
+        known_users = [uid for uid, row in zip(user_ids, user_rows) if row >= 0]
+        known_items = [cid for cid, row in zip(catalog_ids, item_rows) if row >= 0]
+        unseen_items = [cid for cid, row in zip(catalog_ids, item_rows) if row < 0]
+        user_rows = user_rows[user_rows >= 0]
+
+        if not known_users:
+            return {}
+
+        if not known_items:
+            return {uid: [(cid, 0.5) for cid in unseen_items[:top_k]] for uid in known_users}
+
+        num_items = len(known_items)
+        k = min(top_k, num_items)
+        item_indices = item_rows[item_rows >= 0]
+        users_per_batch = max(1, max_pairs_per_batch // num_items)
+
+        rankings = {}
+        for start in range(0, len(known_users), users_per_batch):
+            batch_users = known_users[start:start + users_per_batch]
+            user_indices = user_rows[start:start + users_per_batch]
+
+            top_scores, top_positions = top_k_rows(state.score_matrix(user_indices, item_indices), k)
+
+            for row, uid in enumerate(batch_users):
+                ranked = [(known_items[pos], float(score)) for pos, score in zip(top_positions[row], top_scores[row])]
+                # Items the model has never seen go last with neutral scores, same as recommend()
+                ranked.extend((cid, 0.5) for cid in unseen_items[:top_k - len(ranked)])
+                rankings[uid] = ranked
+
+        return rankings
+
+    def version_path(self, version: str) -> Path:
+        """Checkpoint file for a model version"""
+        return self.versions_dir / f"{self.model_path.stem}.{version}.pt"
+
+    def serving_path(self, version: Optional[str]) -> Path:
+        """NumPy serving export directory for a model version (or for the legacy checkpoint)"""
+        if version is None:
+            return self.model_path.with_suffix(".serving")
+        return self.versions_dir / f"{self.model_path.stem}.{version}.serving"
+
+    def read_manifest(self) -> Dict[str, Any]:
+        """Read the checkpoint manifest ({"current": version, "versions": [...]})"""
+        if not self.manifest_path.exists():
+            return {"current": None, "versions": []}
+
+        with open(self.manifest_path) as f:
+            return json.load(f)
+
+    def _write_manifest(self, manifest: Dict[str, Any]):
+        def write(path: Path):
+            with open(path, "w") as f:
+                json.dump(manifest, f, indent=2)
+
+        write_atomic(self.manifest_path, write)
+
+    def update_manifest(self, update: Callable[[Dict[str, Any]], None]):
+        """Read the manifest, change it in place with update() and write it back
+
+        Runs under an exclusive flock on manifest_lock_path, so workers training or
+        rolling back at the same time cannot drop each other's version entries. If
+        update() raises, the manifest is left as it was.
+        """
+        self.manifest_lock_path.parent.mkdir(parents=True, exist_ok=True)
+        with open(self.manifest_lock_path, "a") as lock:
+            fcntl.flock(lock, fcntl.LOCK_EX)
+            try:
+                manifest = self.read_manifest()
+                update(manifest)
+                self._write_manifest(manifest)
+            finally:
+                fcntl.flock(lock, fcntl.LOCK_UN)
+
+    def _read_manifest_stamp(self) -> Optional[Tuple[int, int]]:
+        """Identify the manifest file on disk; every atomic rewrite gets a new inode"""
+        try:
+            stat = self.manifest_path.stat()
+        except FileNotFoundError:
+            return None
+        return stat.st_ino, stat.st_mtime_ns
+
+    def reload_if_changed(self) -> bool:
+        """Hot-reload the model if the manifest now points at a different version
+
+        Costs a single stat() when nothing changed, so it is cheap to poll.
+
+        Returns:
+            True if a new model was loaded
+        """
+        stamp = self._read_manifest_stamp()
+        if stamp is None or stamp == self._manifest_stamp:
+            return False
+
+        current = self.read_manifest().get("current")
+        self._manifest_stamp = stamp
+
+        if not current or current == self.model_version:
+            return False
+
+        self.load_model(current)
+        return self.model_version == current
+
+    def rollback(self, version: str):
+        """Make a previously saved version current for every worker, and load it here"""
+        def make_current(manifest: Dict[str, Any]):
+            if version not in {v["version"] for v in manifest["versions"]}:
+                raise ValueError(f"Unknown model version: {version}")
+            if not self.version_path(version).exists():
+                raise ValueError(f"Checkpoint for model version {version} is missing")
+            manifest["current"] = version
+
+        self.update_manifest(make_current)
+        self.load_model(version)
+
+
+class ServingRecommender(BaseRecommender):
+    """Torch-free recommender for API workers
+
+    Serves the NumPy export saved next to every checkpoint, so neither importing this
+    module nor loading a model pulls in torch. Ids and embeddings are memory-mapped,
+    so all workers on a host share one copy in the page cache. Nothing is read from disk until the
+    model is first used or ensure_loaded() is called (ModelWatcher does this in the
+    background at startup).
+    """
+
+    def load_model(self, version: Optional[str] = None):
+        """Load a version's serving export (default: the manifest's current version)
+
+        Checkpoints saved before serving exports existed are converted once, which is
+        the only time this imports torch. On failure the previous model stays.
+        """
+        try:
+            manifest_stamp = self._read_manifest_stamp()
+            version = version or self.read_manifest().get("current")
+            path = self.serving_path(version)
+
+            if not path.exists():
+                checkpoint_path = self.version_path(version) if version else self.model_path
+                if not checkpoint_path.exists():
+                    logger.warning(f"Model file not found at {checkpoint_path}")
+                    return
+
+                logger.warning(f"No serving export for {checkpoint_path}, converting it")
+                from .collaborative_filter import export_checkpoint_for_serving
+                export_checkpoint_for_serving(checkpoint_path, path)
+
+            state = load_serving_weights(path)
+
+            self._state = state
+            self._manifest_stamp = manifest_stamp
+            logger.info(f"Model {state.model_version} loaded from {path}")
+        except Exception as e:
+            logger.error(f"Error loading model: {e}")
+        finally:
+            self._loaded = True
+
+
+# Global recommender instance (loaded lazily)
+recommender = ServingRecommender(model_mode=os.environ.get('CF_MODEL_MODE', 'mlp'))
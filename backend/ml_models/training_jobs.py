@@ -0,0 +1,225 @@
+import asyncio
+import contextlib
+import multiprocessing
+import time
+import uuid
+from concurrent.futures import ProcessPoolExecutor
+from datetime import datetime, timedelta, timezone
+from typing import Any, Awaitable, Callable, Dict, List, Optional
+import logging
+
+from pymongo.errors import DuplicateKeyError
+
+from .serving import BaseRecommender
+
+logger = logging.getLogger(__name__)
+
+
+def run_training_job(job_id: str, model_path: str, model_mode: str, swipes: List[Dict], epochs: int,
+                     incremental: bool, progress) -> Dict[str, Any]:
+    """Train and save a model inside a worker process
+
+    Progress is written to a shared dict so the API process can report it while
+    the job runs.
+    """
+    # Imported here so only the worker process loads torch
+    from .collaborative_filter import PodcastRecommender
+
+    started_at = time.time()
+    progress[job_id] = {"status": "running", "started_at": started_at, "epoch": 0, "loss": None}
+
+    def report(epoch: int, total_epochs: int, loss: float):
+        progress[job_id] = {"status": "running", "started_at": started_at, "epoch": epoch, "loss": loss}
+
+    trainer = PodcastRecommender(model_path=model_path, model_mode=model_mode)
+    previous_version = trainer.model_version
+    trainer.train_model(swipes, epochs=epochs, incremental=incremental, progress_callback=report)
+
+    return {
+        "trained": trainer.model_version != previous_version,
+        "model_version": trainer.model_version,
+        "elapsed": time.time() - started_at
+    }
+
+
+class TrainingJobManager:
+    """Runs model training in a separate process and swaps the served model when it finishes
+
+    Job records, with live epoch/loss/elapsed, are kept in the given collection so
+    any uvicorn worker can report on a job another worker accepted. Jobs run one at
+    a time across workers: a job stays queued until it holds the lock document in
+    the same collection, so incremental jobs always warm-start from the previous
+    result. The holder refreshes the lock every progress_interval seconds; a lock
+    not refreshed for claim_timeout seconds (its worker died) is taken over.
+    """
+
+    LOCK_ID = "training_lock"
+
+    def __init__(self, recommender: BaseRecommender, collection, max_workers: int = 1,
+                 progress_interval: float = 1.0, claim_timeout: float = 60.0):
+        self.recommender = recommender
+        self.collection = collection
+        self.max_workers = max_workers
+        self.progress_interval = progress_interval
+        self.claim_timeout = claim_timeout
+        self._tasks: Dict[str, asyncio.Task] = {}
+        self._executor = None
+        self._manager = None
+        self._progress = None
+
+    def _ensure_pool(self):
+        """Start the worker pool on first use (spawn, since torch is not fork-safe)"""
+        if self._executor is None:
+            context = multiprocessing.get_context("spawn")
+            self._manager = context.Manager()
+            self._progress = self._manager.dict()
+            self._executor = ProcessPoolExecutor(max_workers=self.max_workers, mp_context=context)
+
+    async def submit(self, swipes: List[Dict], epochs: int = 20, incremental: bool = False,
+                     on_complete: Optional[Callable[[], Awaitable[Any]]] = None) -> Dict[str, Any]:
+        """Record a training job, start it in the background and return its initial status
+
+        Args:
+            swipes: Training swipes
+            epochs: Number of epochs
+            incremental: Fine-tune the current checkpoint instead of training from scratch
+            on_complete: Awaited after the new model has been swapped in; its result is
+                stored on the job as "result". If it raises, the job still completes with
+                its model_version and the error is stored as "rebuild_error"
+        """
+        self._ensure_pool()
+
+        job_id = f"train_{uuid.uuid4().hex[:12]}"
+        job = {
+            "job_id": job_id,
+            "status": "queued",
+            "incremental": incremental,
+            "swipes_used": len(swipes),
+            "epoch": 0,
+            "epochs": epochs,
+            "loss": None,
+            "elapsed": 0.0,
+            "model_version": None,
+            "result": None,
+            "error": None,
+            "rebuild_error": None,
+            "created_at": datetime.now(timezone.utc),
+            "started_at": None,
+            "finished_at": None
+        }
+        await self.collection.insert_one({"_id": job_id, **job})
+        self._tasks[job_id] = asyncio.create_task(self._run(job_id, swipes, epochs, incremental, on_complete))
+
+        return job
+
+    async def _claim(self, job_id: str):
+        """Wait until this job holds the training lock"""
+        while True:
+            now = datetime.now(timezone.utc)
+            try:
+                await self.collection.update_one(
+                    {
+                        "_id": self.LOCK_ID,
+                        "$or": [
+                            {"job_id": None},
+                            {"claimed_at": {"$lt": now - timedelta(seconds=self.claim_timeout)}}
+                        ]
+                    },
+                    {"$set": {"job_id": job_id, "claimed_at": now}},
+                    upsert=True
+                )
+                return
+            except DuplicateKeyError:
+                # Held by another job; the upsert collided with the existing lock
+                await asyncio.sleep(self.progress_interval)
+
+    async def _report(self, job_id: str):
+        """Refresh the lock and copy the worker's progress to the job record until cancelled"""
+        while True:
+            await asyncio.sleep(self.progress_interval)
+            writes = [self.collection.update_one(
+                {"_id": self.LOCK_ID, "job_id": job_id},
+                {"$set": {"claimed_at": datetime.now(timezone.utc)}}
+            )]
+            progress = self._progress.get(job_id)
+            if progress:
+                writes.append(self.collection.update_one({"_id": job_id}, {"$set": {
+                    "status": progress["status"],
+                    "epoch": progress["epoch"],
+                    "loss": progress["loss"],
+                    "elapsed": time.time() - progress["started_at"]
+                }}))
+            try:
+                await asyncio.gather(*writes)
+            except Exception as e:
+                logger.error(f"Error reporting progress of training job {job_id}: {e}")
+
+    async def _run(self, job_id: str, swipes: List[Dict], epochs: int, incremental: bool,
+                   on_complete: Optional[Callable[[], Awaitable[Any]]]):
+        loop = asyncio.get_running_loop()
+        reporter = None
+        update: Dict[str, Any] = {}
+
+        try:
+            await self._claim(job_id)
+            await self.collection.update_one({"_id": job_id}, {"$set": {"started_at": datetime.now(timezone.utc)}})
+            reporter = asyncio.create_task(self._report(job_id))
+
+            outcome = await loop.run_in_executor(
+                self._executor, run_training_job, job_id, str(self.recommender.model_path),
+                self.recommender.model_mode, swipes, epochs, incremental, self._progress
+            )
+
+            if outcome["trained"]:
+                # Build the new model off the event loop; it is published in one assignment
+                await asyncio.to_thread(self.recommender.load_model)
+
+                if on_complete:
+                    # The new model is live by now, so a failure here does not fail the job
+                    try:
+                        update["result"] = await on_complete()
+                    except Exception as e:
+                        logger.error(f"Post-training callback for job {job_id} failed: {e}")
+                        update["rebuild_error"] = str(e)
+
+            update.update({
+                "status": "completed",
+                "epoch": epochs if outcome["trained"] else 0,
+                "elapsed": outcome["elapsed"],
+                "model_version": outcome["model_version"]
+            })
+            logger.info(f"Training job {job_id} completed (model {outcome['model_version']})")
+        except Exception as e:
+            logger.error(f"Training job {job_id} failed: {e}")
+            update.update({"status": "failed", "error": str(e)})
+        except asyncio.CancelledError:
+            # Shutting down; record the job as failed so pollers stop waiting on it
+            update.update({"status": "failed", "error": "Training was interrupted"})
+            raise
+        finally:
+            if reporter is not None:
+                reporter.cancel()
+                with contextlib.suppress(asyncio.CancelledError):
+                    await reporter
+            progress = self._progress.pop(job_id, None) if self._progress is not None else None
+            if progress:
+                update["loss"] = progress["loss"]
+                if update.get("status") == "failed":
+                    update.update({"epoch": progress["epoch"], "elapsed": time.time() - progress["started_at"]})
+            update["finished_at"] = datetime.now(timezone.utc)
+            await self.collection.update_one({"_id": job_id}, {"$set": update})
+            await self.collection.update_one({"_id": self.LOCK_ID, "job_id": job_id}, {"$set": {"job_id": None}})
+            self._tasks.pop(job_id, None)
+
+    async def get(self, job_id: str) -> Optional[Dict[str, Any]]:
+        """Get the current status of a job, whichever worker runs it"""
+        return await self.collection.find_one({"_id": job_id}, {"_id": 0})
+
+    def shutdown(self):
+        """Stop the worker pool"""
+        if self._executor is not None:
+            self._executor.shutdown(wait=False, cancel_futures=True)
+            self._manager.shutdown()
+            self._executor = None
+            self._manager = None
+            self._progress = None
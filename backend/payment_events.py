@@ -0,0 +1,143 @@
+import asyncio
+import logging
+from datetime import datetime, timedelta, timezone
+from typing import Any, Awaitable, Callable, Dict, Optional
+
+from pymongo.errors import DuplicateKeyError
+
+logger = logging.getLogger(__name__)
+
+
+async def record_payment_event(db, event_id: str, session_id: str) -> bool:
+    """Store a paid-checkout webhook event for processing
+
+    Returns:
+        False if the event was already recorded (a retried delivery)
+    """
+    try:
+        await db.stripe_events.insert_one({
+            "_id": event_id,
+            "session_id": session_id,
+            "status": "pending",
+            "attempts": 0,
+            "created_at": datetime.now(timezone.utc)
+        })
+    except DuplicateKeyError:
+        return False
+    return True
+
+
+class PaymentEventWorker:
+    """Applies recorded webhook events in the background
+
+    The webhook only records an event and submits its id here, so Stripe gets
+    its acknowledgement without waiting on the payment writes. Each event is
+    claimed with a conditional update before it is applied, so several workers
+    never apply the same event at once. Events that fail, or that were recorded
+    by a process that died before applying them, are picked up again by a sweep
+    every sweep_interval seconds, up to max_attempts times.
+    """
+
+    def __init__(self, db, apply: Callable[[Dict[str, Any]], Awaitable[None]], sweep_interval: float = 30.0,
+                 claim_timeout: float = 300.0, max_attempts: int = 5):
+        self.db = db
+        self.apply = apply
+        self.sweep_interval = sweep_interval
+        self.claim_timeout = claim_timeout
+        self.max_attempts = max_attempts
+        self._queue: asyncio.Queue = asyncio.Queue()
+        self._task: Optional[asyncio.Task] = None
+        self._stopping = False
+
+    def submit(self, event_id: str):
+        """Queue a recorded event for processing"""
+        self._queue.put_nowait(event_id)
+
+    def _due_query(self, now: datetime) -> Dict[str, Any]:
+        """Events not yet applied, whose claim (if any) has gone stale"""
+        return {
+            "attempts": {"$lt": self.max_attempts},
+            "$or": [
+                {"status": "pending"},
+                {"status": "processing", "claimed_at": {"$lt": now - timedelta(seconds=self.claim_timeout)}}
+            ]
+        }
+
+    async def process(self, event_id: str) -> bool:
+        """Claim and apply one event
+
+        Returns:
+            Whether the event was claimed (False if applied or claimed elsewhere)
+        """
+        now = datetime.now(timezone.utc)
+        event = await self.db.stripe_events.find_one_and_update(
+            {"_id": event_id, **self._due_query(now)},
+            {"$set": {"status": "processing", "claimed_at": now}, "$inc": {"attempts": 1}}
+        )
+        if event is None:
+            return False
+
+        try:
+            await self.apply(event)
+        except Exception as e:
+            logger.error(f"Error applying payment event {event['_id']}: {e}")
+            await self.db.stripe_events.update_one(
+                {"_id": event["_id"]},
+                {"$set": {"status": "pending", "error": str(e)}}
+            )
+        else:
+            await self.db.stripe_events.update_one(
+                {"_id": event["_id"]},
+                {"$set": {"status": "processed", "processed_at": datetime.now(timezone.utc)}}
+            )
+        return True
+
+    async def sweep(self) -> int:
+        """Process every event that is due; returns how many were claimed"""
+        due = await self.db.stripe_events.find(
+            self._due_query(datetime.now(timezone.utc)), {"_id": 1}
+        ).to_list(None)
+
+        processed = 0
+        for event in due:
+            if await self.process(event["_id"]):
+                processed += 1
+        return processed
+
+    def start(self):
+        """Start processing in the background"""
+        if self._task is None:
+            self._stopping = False
+            self._task = asyncio.create_task(self._run())
+
+    async def stop(self):
+        """Stop processing; unprocessed events are left for the next sweep"""
+        if self._task is not None:
+            # wait_for can swallow the cancellation when a queued event arrives at
+            # the same moment, so the loop also checks this flag
+            self._stopping = True
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+
+    async def _run(self):
+        loop = asyncio.get_running_loop()
+        # Sweep right away for events left over from a previous run
+        next_sweep = loop.time()
+        while not self._stopping:
+            try:
+                event_id = await asyncio.wait_for(self._queue.get(), max(0.0, next_sweep - loop.time()))
+            except asyncio.TimeoutError:
+                event_id = None
+
+            try:
+                if event_id is not None:
+                    await self.process(event_id)
+                if loop.time() >= next_sweep:
+                    await self.sweep()
+                    next_sweep = loop.time() + self.sweep_interval
+            except Exception as e:
+                logger.error(f"Error processing payment events: {e}")
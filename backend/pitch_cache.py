@@ -0,0 +1,148 @@
+import asyncio
+import hashlib
+import logging
+from datetime import datetime, timezone
+from typing import Any, AsyncIterator, Awaitable, Callable, Dict, List, Optional, Set
+
+logger = logging.getLogger(__name__)
+
+
+class _Generation:
+    """Chunks of one in-flight pitch, replayed to every request waiting on it"""
+
+    def __init__(self):
+        self.chunks: List[str] = []
+        self.done = False
+        self.error: Optional[BaseException] = None
+        self._changed = asyncio.Event()
+
+    def _notify(self):
+        self._changed.set()
+        self._changed = asyncio.Event()
+
+    def push(self, chunk: str):
+        self.chunks.append(chunk)
+        self._notify()
+
+    def finish(self, error: Optional[BaseException] = None):
+        self.done = True
+        self.error = error
+        self._notify()
+
+    async def follow(self) -> AsyncIterator[str]:
+        """Every chunk so far, then each new one until the pitch is complete"""
+        sent = 0
+        while True:
+            changed = self._changed
+            while sent < len(self.chunks):
+                yield self.chunks[sent]
+                sent += 1
+            if self.done:
+                if self.error is not None:
+                    raise self.error
+                return
+            await changed.wait()
+
+
+class PitchCache:
+    """AI pitches cached in Mongo, with one in-flight generation per key
+
+    Pitches are keyed on (match_id, requesting role, hash of the prompt). The prompt
+    is built from both users' relevant profile fields, so editing a profile changes
+    the key and the next request generates a fresh pitch. The cache lives in the
+    ai_pitches collection, so every worker sees pitches generated by the others;
+    concurrent requests for the same key within a worker share one LLM stream.
+    """
+
+    def __init__(self, db, generate: Callable[[str], AsyncIterator[str]]):
+        self.db = db
+        self.generate = generate
+        self._inflight: Dict[str, _Generation] = {}
+        self._background: Set[asyncio.Task] = set()
+
+        # Metrics
+        self.hits = 0
+        self.misses = 0
+        self.joined = 0  # Requests that waited on another request's generation
+
+    @staticmethod
+    def key(match_id: str, role: str, prompt: str) -> str:
+        prompt_hash = hashlib.sha256(prompt.encode()).hexdigest()[:32]
+        return f"{match_id}:{role}:{prompt_hash}"
+
+    async def stream(self, match_id: str, role: str, prompt: str) -> AsyncIterator[str]:
+        """Pitch chunks for a prompt: one chunk when cached, streamed from the LLM otherwise"""
+        key = self.key(match_id, role, prompt)
+
+        generation = self._inflight.get(key)
+        if generation is None:
+            cached = await self.db.ai_pitches.find_one({"_id": key}, {"pitch": 1})
+            if cached:
+                self.hits += 1
+                yield cached["pitch"]
+                return
+            # Another request may have started generating while we read the cache
+            generation = self._inflight.get(key)
+
+        if generation is not None:
+            self.joined += 1
+        else:
+            self.misses += 1
+            generation = self._inflight[key] = _Generation()
+            # Runs as its own task, so a disconnecting client does not stop the
+            # generation for the requests sharing it
+            self._spawn(self._generate(key, generation, match_id, role, prompt))
+
+        async for chunk in generation.follow():
+            yield chunk
+
+    async def get(self, match_id: str, role: str, prompt: str) -> str:
+        """Cached pitch for a prompt, generating it if needed"""
+        return "".join([chunk async for chunk in self.stream(match_id, role, prompt)])
+
+    async def _generate(self, key: str, generation: _Generation, match_id: str, role: str, prompt: str):
+        try:
+            async for chunk in self.generate(prompt):
+                generation.push(chunk)
+            await self.db.ai_pitches.update_one(
+                {"_id": key},
+                {"$set": {
+                    "match_id": match_id,
+                    "role": role,
+                    "pitch": "".join(generation.chunks),
+                    "created_at": datetime.now(timezone.utc)
+                }},
+                upsert=True
+            )
+        except Exception as e:
+            generation.finish(e)
+        else:
+            generation.finish()
+        finally:
+            self._inflight.pop(key, None)
+
+    def _spawn(self, coro: Awaitable[Any]) -> asyncio.Task:
+        task = asyncio.create_task(coro)
+        self._background.add(task)
+        task.add_done_callback(self._background.discard)
+        return task
+
+    def run_in_background(self, coro: Awaitable[Any]):
+        """Run a pre-generation coroutine without awaiting it, logging failures"""
+        async def run():
+            try:
+                await coro
+            except Exception as e:
+                logger.warning(f"Pitch pre-generation failed: {e}")
+
+        self._spawn(run())
+
+    def stats(self) -> Dict[str, Any]:
+        lookups = self.hits + self.misses + self.joined
+        return {
+            "hits": self.hits,
+            "misses": self.misses,
+            "joined": self.joined,
+            "in_flight": len(self._inflight),
+            "hit_rate": (self.hits + self.joined) / lookups if lookups else 0.0
+        }
@@ -0,0 +1,99 @@
+import asyncio
+import logging
+from datetime import datetime, timezone
+from typing import Dict, Optional
+
+logger = logging.getLogger(__name__)
+
+# The counters document in the counters collection
+STATS_ID = "platform_stats"
+
+STAT_FIELDS = (
+    "total_users",
+    "total_hosts",
+    "total_guests",
+    "total_matches",
+    "total_messages",
+    "total_swipes",
+    "pro_users"
+)
+
+
+async def increment_stats(db, **deltas: int):
+    """Atomically adjust platform counters, e.g. increment_stats(db, total_swipes=1)"""
+    await db.counters.update_one({"_id": STATS_ID}, {"$inc": deltas}, upsert=True)
+
+
+async def count_stats(db) -> Dict[str, int]:
+    """Exact platform counts, computed with full counts over each collection"""
+    counts = await asyncio.gather(
+        db.users.count_documents({}),
+        db.users.count_documents({"role": "host"}),
+        db.users.count_documents({"role": "guest"}),
+        db.matches.count_documents({}),
+        db.chat_messages.count_documents({}),
+        db.swipes.count_documents({}),
+        db.users.count_documents({"subscription_tier": "pro"})
+    )
+    return dict(zip(STAT_FIELDS, counts))
+
+
+async def reconcile_stats(db) -> Dict[str, int]:
+    """Overwrite the counters with exact counts
+
+    Increments that land between the counts and the write can be lost or counted
+    twice; the next reconciliation corrects them.
+    """
+    stats = await count_stats(db)
+    await db.counters.update_one(
+        {"_id": STATS_ID},
+        {"$set": {**stats, "reconciled_at": datetime.now(timezone.utc)}},
+        upsert=True
+    )
+    return stats
+
+
+async def read_stats(db) -> Dict[str, int]:
+    """Current counters (one document read); reconciles first if they were never built"""
+    doc = await db.counters.find_one({"_id": STATS_ID})
+    if doc is None or "reconciled_at" not in doc:
+        return await reconcile_stats(db)
+    return {field: doc.get(field, 0) for field in STAT_FIELDS}
+
+
+class StatsReconciler:
+    """Periodically recomputes the platform counters from the collections
+
+    The counters are maintained incrementally by the write paths; this corrects any
+    drift (writes outside the API, failed requests between a write and its
+    increment, races with a previous reconciliation).
+    """
+
+    def __init__(self, db, interval: float = 3600.0):
+        self.db = db
+        self.interval = interval
+        self._task: Optional[asyncio.Task] = None
+
+    def start(self):
+        """Start reconciling in the background"""
+        if self._task is None:
+            self._task = asyncio.create_task(self._run())
+
+    async def stop(self):
+        """Stop reconciling"""
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+
+    async def _run(self):
+        while True:
+            await asyncio.sleep(self.interval)
+            try:
+                stats = await reconcile_stats(self.db)
+                logger.info(f"Reconciled platform stats: {stats}")
+            except Exception as e:
+                logger.error(f"Error reconciling platform stats: {e}")
@@ -1,5 +1,6 @@
-from fastapi import FastAPI, APIRouter, HTTPException, Request, Header, Response
-from fastapi.responses import JSONResponse
+from fastapi import FastAPI, APIRouter, HTTPException, Request, Header, Response, WebSocket, WebSocketDisconnect
+from fastapi.encoders import jsonable_encoder
+from fastapi.responses import JSONResponse, StreamingResponse
 from dotenv import load_dotenv
 from starlette.middleware.cors import CORSMiddleware
 from motor.motor_asyncio import AsyncIOMotorClient
@@ -7,21 +8,42 @@ import os
 import logging
 from pathlib import Path
 from pydantic import BaseModel, Field, ConfigDict, EmailStr
-from typing import List, Optional, Dict, Any
+from typing import List, Optional, Dict, Any, AsyncIterator
 import uuid
 from datetime import datetime, timezone, timedelta
 from emergentintegrations.llm.chat import LlmChat, UserMessage
 from emergentintegrations.payments.stripe.checkout import StripeCheckout, CheckoutSessionResponse, CheckoutStatusResponse, CheckoutSessionRequest
 import bcrypt
 import asyncio
-from ml_models.collaborative_filter import recommender
+import contextlib
+import time
+import base64
+import json
+from ml_models.serving import recommender
+from ml_models.recommendation_index import rebuild_recommendation_index, get_indexed_recommendations
+from ml_models.training_jobs import TrainingJobManager
+from ml_models.model_watcher import ModelWatcher
+from ml_models.inference_batcher import InferenceBatcher
+from session_cache import SessionCache
+from candidate_retrieval import SwipeExclusions, CandidatePool
+from db_setup import ensure_indexes
+from chat_broker import create_broker
+from platform_stats import StatsReconciler, increment_stats, read_stats
+from admin_export import build_export_query, stream_ndjson
+from pitch_cache import PitchCache
+from llm_gateway import CircuitBreaker, LlmLimiter, LlmUnavailable, stream_chat_completion
+from http_client import HttpClient
+from payment_events import PaymentEventWorker, record_payment_event
+from checkout_status import CheckoutStatusCache
+from pymongo import ReturnDocument
 
 ROOT_DIR = Path(__file__).parent
 load_dotenv(ROOT_DIR / '.env')
 
 # MongoDB connection
 mongo_url = os.environ['MONGO_URL']
-client = AsyncIOMotorClient(mongo_url)
+# Timestamps are stored as BSON datetimes; read them back as aware UTC datetimes
+client = AsyncIOMotorClient(mongo_url, tz_aware=True)
 db = client[os.environ['DB_NAME']]
 
 # Create the main app
@@ -30,6 +52,77 @@ app = FastAPI()
 # Create a router with the /api prefix
 api_router = APIRouter(prefix="/api")
 
+# Model training runs in a worker process, off the event loop. Job records and the
+# lock that runs one job at a time across uvicorn workers live in training_jobs
+training_jobs = TrainingJobManager(recommender, db.training_jobs)
+
+# Picks up models trained or rolled back by other uvicorn workers
+model_watcher = ModelWatcher(recommender, interval=float(os.environ.get('MODEL_RELOAD_INTERVAL', '5')))
+
+# Concurrent /discover rankings share one forward pass
+inference_batcher = InferenceBatcher(
+    recommender,
+    max_batch_size=int(os.environ.get('INFERENCE_MAX_BATCH_SIZE', '32')),
+    max_wait_ms=float(os.environ.get('INFERENCE_BATCH_WINDOW_MS', '3'))
+)
+
+# Resolved sessions, so authenticated requests skip the session and user lookups.
+# Cached sessions are re-checked every SESSION_RECHECK_INTERVAL seconds, which
+# bounds how long a logout through another worker takes to reach this one.
+session_cache = SessionCache(
+    max_size=int(os.environ.get('SESSION_CACHE_SIZE', '10000')),
+    ttl=float(os.environ.get('SESSION_CACHE_TTL', '30')),
+    recheck_after=float(os.environ.get('SESSION_RECHECK_INTERVAL', '5'))
+)
+
+# Swiped-id filters per user and discoverable ids per role, so /discover never
+# ships the user's swipe history to Mongo as a $nin list
+swipe_exclusions = SwipeExclusions(max_users=int(os.environ.get('SWIPE_FILTER_CACHE_SIZE', '10000')))
+candidate_pool = CandidatePool(ttl=float(os.environ.get('CANDIDATE_POOL_TTL', '60')))
+
+# Pushes sent chat messages to the match's open WebSockets
+chat_broker = create_broker(os.environ.get('CHAT_BROKER', 'memory'), db)
+
+# Corrects drift in the incrementally maintained /admin/stats counters
+stats_reconciler = StatsReconciler(db, interval=float(os.environ.get('STATS_RECONCILE_INTERVAL', '3600')))
+
+# Daily swipes for the free tier
+FREE_SWIPE_LIMIT = 20
+
+# Pooled client for outbound HTTP (auth session exchange, streamed LLM calls),
+# opened at startup so logins reuse keep-alive connections
+http_client = HttpClient(
+    timeout=float(os.environ.get('HTTP_TIMEOUT', '10')),
+    connect_timeout=float(os.environ.get('HTTP_CONNECT_TIMEOUT', '5')),
+    keepalive_timeout=float(os.environ.get('HTTP_KEEPALIVE_TIMEOUT', '30')),
+    pool_size=int(os.environ.get('HTTP_POOL_SIZE', '100'))
+)
+
+# Emergent Auth endpoint that exchanges a session_id for user data
+AUTH_SESSION_URL = os.environ.get(
+    'AUTH_SESSION_URL', 'https://demobackend.emergentagent.com/auth/v1/env/oauth/session-data'
+)
+
+# Generate both AI pitches in the background as soon as a match is created
+PREGENERATE_PITCHES = os.environ.get('PREGENERATE_PITCHES', 'false').lower() == 'true'
+
+# OpenAI-compatible endpoint to stream pitches from; without it pitches come
+# whole from LlmChat
+LLM_API_BASE = os.environ.get('LLM_API_BASE')
+LLM_MODEL = os.environ.get('LLM_MODEL', 'gpt-5.2')
+
+# Every LLM call goes through this limiter and its circuit breaker
+llm_limiter = LlmLimiter(
+    max_concurrency=int(os.environ.get('LLM_MAX_CONCURRENCY', '8')),
+    max_queue=int(os.environ.get('LLM_MAX_QUEUE', '32')),
+    timeout=float(os.environ.get('LLM_TIMEOUT', '30')),
+    idle_timeout=float(os.environ.get('LLM_IDLE_TIMEOUT', '10')),
+    breaker=CircuitBreaker(
+        failure_threshold=int(os.environ.get('LLM_BREAKER_THRESHOLD', '5')),
+        reset_timeout=float(os.environ.get('LLM_BREAKER_RESET', '30'))
+    )
+)
+
 # Pydantic Models
 class User(BaseModel):
     user_id: str
@@ -145,6 +238,9 @@ class CheckoutRequest(BaseModel):
 class AIGenerateRequest(BaseModel):
     match_id: str
 
+class ModelRollbackRequest(BaseModel):
+    version: str
+
 # Helper Functions
 async def get_user_from_token(authorization: Optional[str] = None, session_token: Optional[str] = None) -> User:
     """Get user from session token (cookie or header)"""
@@ -153,16 +249,26 @@ async def get_user_from_token(authorization: Optional[str] = None, session_token
     if not token:
         raise HTTPException(status_code=401, detail="Not authenticated")
     
+    # Callers may modify the user, so hand out copies of the cached one
+    cached_user = session_cache.get(token)
+    if cached_user is not None:
+        if session_cache.needs_recheck(token):
+            # The session may have been logged out through another worker
+            if not await db.user_sessions.find_one({"session_token": token}, {"_id": 1}):
+                session_cache.invalidate_token(token)
+                raise HTTPException(status_code=401, detail="Invalid session")
+            session_cache.confirm(token)
+        return cached_user.model_copy()
+    
+    epoch = session_cache.epoch
+    started = time.perf_counter()
+    
     session_doc = await db.user_sessions.find_one({"session_token": token}, {"_id": 0})
     if not session_doc:
         raise HTTPException(status_code=401, detail="Invalid session")
     
+    # Expired sessions are removed by the TTL index, but its sweep runs only once a minute
     expires_at = session_doc["expires_at"]
-    if isinstance(expires_at, str):
-        expires_at = datetime.fromisoformat(expires_at)
-    if expires_at.tzinfo is None:
-        expires_at = expires_at.replace(tzinfo=timezone.utc)
-    
     if expires_at < datetime.now(timezone.utc):
         raise HTTPException(status_code=401, detail="Session expired")
     
@@ -170,29 +276,71 @@ async def get_user_from_token(authorization: Optional[str] = None, session_token
     if not user_doc:
         raise HTTPException(status_code=401, detail="User not found")
     
-    if isinstance(user_doc.get('created_at'), str):
-        user_doc['created_at'] = datetime.fromisoformat(user_doc['created_at'])
-    if isinstance(user_doc.get('swipes_reset_at'), str):
-        user_doc['swipes_reset_at'] = datetime.fromisoformat(user_doc['swipes_reset_at'])
+    user = User(**user_doc)
+    session_cache.put(token, user, expires_at, epoch, time.perf_counter() - started)
+    
+    return user.model_copy()
+
+def encode_cursor(*values) -> str:
+    """Encode the sort key of the last returned item as an opaque pagination cursor"""
+    return base64.urlsafe_b64encode(json.dumps(list(values)).encode()).decode()
+
+def decode_cursor(cursor: str, size: int) -> List[Any]:
+    """Decode a cursor from encode_cursor, checking it holds the expected number of values"""
+    try:
+        values = json.loads(base64.urlsafe_b64decode(cursor.encode()))
+    except ValueError:
+        raise HTTPException(status_code=400, detail="Invalid cursor")
+    
+    if not isinstance(values, list) or len(values) != size:
+        raise HTTPException(status_code=400, detail="Invalid cursor")
     
-    return User(**user_doc)
+    return values
+
+def keyset_condition(cursor: str, id_field: str, operator: str) -> Dict[str, Any]:
+    """Filter for items strictly before ("$lt") or after ("$gt") a (created_at, id) cursor"""
+    created_at, item_id = decode_cursor(cursor, 2)
+    try:
+        created_at = datetime.fromisoformat(created_at)
+    except (TypeError, ValueError):
+        raise HTTPException(status_code=400, detail="Invalid cursor")
+    
+    return {"$or": [
+        {"created_at": {operator: created_at}},
+        {"created_at": created_at, id_field: {operator: item_id}}
+    ]}
 
-async def reset_swipes_if_needed(user: User):
-    """Reset swipes if 24 hours have passed"""
-    if user.swipes_reset_at and user.swipes_reset_at.tzinfo is None:
-        user.swipes_reset_at = user.swipes_reset_at.replace(tzinfo=timezone.utc)
+def swipes_used_today(user: User) -> int:
+    """Swipes counted against today's quota (0 once the daily window has passed)"""
+    if not user.swipes_reset_at or datetime.now(timezone.utc) >= user.swipes_reset_at:
+        return 0
+    return user.swipes_today
+
+async def consume_swipe(user_id: str) -> bool:
+    """Atomically reset the daily window if due and count one swipe against the quota
     
+    Returns False when a free user has used up today's swipes. Check, reset and
+    increment run as one conditional pipeline update, so concurrent swipes cannot
+    go past the limit.
+    """
     now = datetime.now(timezone.utc)
-    if not user.swipes_reset_at or now >= user.swipes_reset_at:
-        await db.users.update_one(
-            {"user_id": user.user_id},
-            {"$set": {
-                "swipes_today": 0,
-                "swipes_reset_at": (now + timedelta(days=1)).isoformat()
-            }}
-        )
-        user.swipes_today = 0
-        user.swipes_reset_at = now + timedelta(days=1)
+    reset_due = {"$lte": ["$swipes_reset_at", now]}
+    
+    updated = await db.users.find_one_and_update(
+        {
+            "user_id": user_id,
+            "$or": [
+                {"subscription_tier": {"$ne": "free"}},
+                {"swipes_today": {"$lt": FREE_SWIPE_LIMIT}},
+                {"swipes_reset_at": {"$not": {"$gt": now}}}
+            ]
+        },
+        [{"$set": {
+            "swipes_today": {"$cond": [reset_due, 1, {"$add": [{"$ifNull": ["$swipes_today", 0]}, 1]}]},
+            "swipes_reset_at": {"$cond": [reset_due, now + timedelta(days=1), "$swipes_reset_at"]}
+        }}]
+    )
+    return updated is not None
 
 # Auth Routes
 @api_router.post("/auth/session")
@@ -202,53 +350,50 @@ async def create_session(request: Request):
     if not session_id:
         raise HTTPException(status_code=400, detail="X-Session-ID header required")
     
-    # Call Emergent Auth API
-    import aiohttp
-    async with aiohttp.ClientSession() as session:
-        async with session.get(
-            "https://demobackend.emergentagent.com/auth/v1/env/oauth/session-data",
-            headers={"X-Session-ID": session_id}
-        ) as resp:
-            if resp.status != 200:
-                raise HTTPException(status_code=401, detail="Invalid session_id")
-            data = await resp.json()
-    
-    # Check if user exists
-    user_doc = await db.users.find_one({"email": data["email"]}, {"_id": 0})
-    
-    if user_doc:
-        user_id = user_doc["user_id"]
-        # Update user info
-        await db.users.update_one(
-            {"user_id": user_id},
-            {"$set": {"name": data["name"], "picture": data["picture"]}}
-        )
-    else:
-        # Create new user
-        user_id = f"user_{uuid.uuid4().hex[:12]}"
-        await db.users.insert_one({
-            "user_id": user_id,
-            "email": data["email"],
-            "name": data["name"],
-            "picture": data["picture"],
-            "role": None,
-            "profile_completed": False,
-            "subscription_tier": "free",
-            "swipes_today": 0,
-            "swipes_reset_at": None,
-            "created_at": datetime.now(timezone.utc).isoformat()
-        })
+    # Call Emergent Auth API over the pooled client
+    async with http_client.session.get(AUTH_SESSION_URL, headers={"X-Session-ID": session_id}) as resp:
+        if resp.status != 200:
+            raise HTTPException(status_code=401, detail="Invalid session_id")
+        data = await resp.json()
+    
+    # Update the user's info, creating the user on first login, in one round trip
+    new_user_id = f"user_{uuid.uuid4().hex[:12]}"
+    now = datetime.now(timezone.utc)
+    user_doc = await db.users.find_one_and_update(
+        {"email": data["email"]},
+        {
+            "$set": {"name": data["name"], "picture": data["picture"]},
+            "$setOnInsert": {
+                "user_id": new_user_id,
+                "email": data["email"],
+                "role": None,
+                "profile_completed": False,
+                "subscription_tier": "free",
+                "swipes_today": 0,
+                "swipes_reset_at": None,
+                "created_at": now
+            }
+        },
+        projection={"_id": 0},
+        upsert=True,
+        return_document=ReturnDocument.AFTER
+    )
+    user_id = user_doc["user_id"]
     
     # Create session
     session_token = data["session_token"]
-    await db.user_sessions.insert_one({
+    writes = [db.user_sessions.insert_one({
         "user_id": user_id,
         "session_token": session_token,
-        "expires_at": (datetime.now(timezone.utc) + timedelta(days=7)).isoformat(),
-        "created_at": datetime.now(timezone.utc).isoformat()
-    })
+        "expires_at": now + timedelta(days=7),
+        "created_at": now
+    })]
+    if user_id == new_user_id:
+        writes.append(increment_stats(db, total_users=1))
+    else:
+        session_cache.invalidate_user(user_id)
+    await asyncio.gather(*writes)
     
-    user_doc = await db.users.find_one({"user_id": user_id}, {"_id": 0})
     return {**user_doc, "session_token": session_token}
 
 @api_router.get("/auth/me")
@@ -266,6 +411,7 @@ async def logout(request: Request, authorization: Optional[str] = Header(None)):
     
     if token:
         await db.user_sessions.delete_one({"session_token": token})
+        session_cache.invalidate_token(token)
     
     return {"message": "Logged out successfully"}
 
@@ -279,10 +425,19 @@ async def select_role(role_req: RoleSelectionRequest, request: Request, authoriz
     if role_req.role not in ["host", "guest"]:
         raise HTTPException(status_code=400, detail="Invalid role")
     
-    await db.users.update_one(
+    previous = await db.users.find_one_and_update(
         {"user_id": user.user_id},
-        {"$set": {"role": role_req.role}}
+        {"$set": {"role": role_req.role}},
+        projection={"_id": 0, "role": 1}
     )
+    session_cache.invalidate_user(user.user_id)
+    candidate_pool.invalidate()
+    
+    if previous is not None and previous.get("role") != role_req.role:
+        deltas = {f"total_{role_req.role}s": 1}
+        if previous.get("role") in ["host", "guest"]:
+            deltas[f"total_{previous['role']}s"] = -1
+        await increment_stats(db, **deltas)
     
     return {"message": "Role selected", "role": role_req.role}
 
@@ -300,14 +455,14 @@ async def setup_profile(profile_req: ProfileSetupRequest, request: Request, auth
     profile_data["user_id"] = user.user_id
     
     if existing_profile:
-        profile_data["updated_at"] = datetime.now(timezone.utc).isoformat()
+        profile_data["updated_at"] = datetime.now(timezone.utc)
         await db.profiles.update_one(
             {"user_id": user.user_id},
             {"$set": profile_data}
         )
     else:
-        profile_data["created_at"] = datetime.now(timezone.utc).isoformat()
-        profile_data["updated_at"] = datetime.now(timezone.utc).isoformat()
+        profile_data["created_at"] = datetime.now(timezone.utc)
+        profile_data["updated_at"] = datetime.now(timezone.utc)
         await db.profiles.insert_one(profile_data)
     
     # Mark profile as completed
@@ -315,6 +470,8 @@ async def setup_profile(profile_req: ProfileSetupRequest, request: Request, auth
         {"user_id": user.user_id},
         {"$set": {"profile_completed": True}}
     )
+    session_cache.invalidate_user(user.user_id)
+    candidate_pool.invalidate()
     
     return {"message": "Profile saved successfully"}
 
@@ -330,6 +487,34 @@ async def get_profile(request: Request, authorization: Optional[str] = Header(No
     
     return profile
 
+async def rank_candidates_live(user: User, target_role: str) -> List[Dict[str, Any]]:
+    """Rank unswiped candidates from the role's pool with the collaborative filter on the fly"""
+    pool = await candidate_pool.get(db, target_role)
+    pool = [uid for uid in pool if uid != user.user_id]
+    
+    # Two-tower scoring is a single matmul, so rank the whole pool; otherwise rank
+    # the first 50 unswiped candidates
+    limit = None if recommender.supports_full_catalog else 50
+    candidate_ids = await swipe_exclusions.filter_unswiped(db, user.user_id, pool, limit=limit, min_results=10)
+    
+    if not candidate_ids:
+        return []
+    
+    try:
+        ranked_ids = [item_id for item_id, score in await inference_batcher.recommend(user.user_id, candidate_ids, top_k=10)]
+    except Exception as e:
+        logger.warning(f"Error using collaborative filter: {e}. Falling back to default ordering.")
+        ranked_ids = candidate_ids[:10]
+    
+    # Only fetch full documents for the winners
+    candidates = await db.users.find({
+        "user_id": {"$in": ranked_ids},
+        "role": target_role,
+        "profile_completed": True
+    }, {"_id": 0}).to_list(len(ranked_ids))
+    candidates_dict = {c["user_id"]: c for c in candidates}
+    return [candidates_dict[uid] for uid in ranked_ids if uid in candidates_dict]
+
 # Discovery Routes
 @api_router.get("/discover")
 async def get_candidates(request: Request, authorization: Optional[str] = Header(None)):
@@ -340,62 +525,46 @@ async def get_candidates(request: Request, authorization: Optional[str] = Header
     if not user.profile_completed:
         raise HTTPException(status_code=400, detail="Complete your profile first")
     
-    # Check swipe limit for free users
-    await reset_swipes_if_needed(user)
-    
-    # Refresh user data
-    user_doc = await db.users.find_one({"user_id": user.user_id}, {"_id": 0})
-    user = User(**user_doc)
-    
-    if user.subscription_tier == "free" and user.swipes_today >= 20:
+    # Check swipe limit for free users (/swipe enforces it atomically)
+    if user.subscription_tier == "free" and swipes_used_today(user) >= FREE_SWIPE_LIMIT:
         raise HTTPException(status_code=429, detail="Daily swipe limit reached. Upgrade to Pro for unlimited swipes.")
     
-    # Get already swiped users
-    swiped = await db.swipes.find({"swiper_id": user.user_id}, {"_id": 0}).to_list(1000)
-    swiped_ids = [s["swiped_id"] for s in swiped]
-    
     # Get candidates (opposite role)
     target_role = "guest" if user.role == "host" else "host"
     
-    # Build query
-    query = {
-        "user_id": {"$nin": [user.user_id] + swiped_ids},
-        "role": target_role,
-        "profile_completed": True
-    }
+    # Serve from the precomputed ranking when one exists for the current model
+    candidates = []
+    indexed_ids = await get_indexed_recommendations(db, user.user_id, recommender.model_version)
+    if indexed_ids:
+        indexed_ids = [uid for uid in indexed_ids if uid != user.user_id]
+        top_ids = await swipe_exclusions.filter_unswiped(db, user.user_id, indexed_ids, limit=10, min_results=10)
+        
+        if top_ids:
+            indexed_candidates = await db.users.find({
+                "user_id": {"$in": top_ids},
+                "role": target_role,
+                "profile_completed": True
+            }, {"_id": 0}).to_list(len(top_ids))
+            
+            candidates_dict = {c["user_id"]: c for c in indexed_candidates}
+            candidates = [candidates_dict[uid] for uid in top_ids if uid in candidates_dict]
     
-    # Get more candidates for ranking (limit 50)
-    candidates_cursor = db.users.find(query, {"_id": 0}).limit(50)
-    candidates = await candidates_cursor.to_list(50)
+    if not candidates:
+        candidates = await rank_candidates_live(user, target_role)
     
     if not candidates:
         return []
     
-    # Use collaborative filtering to rank candidates
+    # Get profiles for all candidates in one query, keeping the ranking order
     candidate_ids = [c["user_id"] for c in candidates]
-    try:
-        ranked_candidates = recommender.recommend(user.user_id, candidate_ids, top_k=10)
-        # Sort candidates by recommendation score
-        ranked_ids = [item_id for item_id, score in ranked_candidates]
-        
-        # Reorder candidates based on ranking
-        candidates_dict = {c["user_id"]: c for c in candidates}
-        candidates = [candidates_dict[uid] for uid in ranked_ids if uid in candidates_dict]
-    except Exception as e:
-        logger.warning(f"Error using collaborative filter: {e}. Falling back to default ordering.")
-        candidates = candidates[:10]
-    
-    # Get profiles for candidates
-    result = []
-    for candidate in candidates:
-        profile = await db.profiles.find_one({"user_id": candidate["user_id"]}, {"_id": 0})
-        if profile:
-            result.append({
-                "user": candidate,
-                "profile": profile
-            })
-    
-    return result
+    profiles = await db.profiles.find({"user_id": {"$in": candidate_ids}}, {"_id": 0}).to_list(len(candidate_ids))
+    profiles_dict = {p["user_id"]: p for p in profiles}
+    
+    return [
+        {"user": candidate, "profile": profiles_dict[candidate["user_id"]]}
+        for candidate in candidates
+        if candidate["user_id"] in profiles_dict
+    ]
 
 # Swipe Routes
 @api_router.post("/swipe")
@@ -404,36 +573,32 @@ async def swipe(swipe_req: SwipeRequest, request: Request, authorization: Option
     session_token = request.cookies.get("session_token")
     user = await get_user_from_token(authorization, session_token)
     
-    # Check swipe limit
-    await reset_swipes_if_needed(user)
-    user_doc = await db.users.find_one({"user_id": user.user_id}, {"_id": 0})
-    user = User(**user_doc)
-    
-    if user.subscription_tier == "free" and user.swipes_today >= 20:
+    # Check the swipe limit, resetting the daily window and counting this swipe in one update
+    if not await consume_swipe(user.user_id):
         raise HTTPException(status_code=429, detail="Daily swipe limit reached")
+    session_cache.invalidate_user(user.user_id)
     
     # Create swipe record
     swipe_id = f"swipe_{uuid.uuid4().hex[:12]}"
-    await db.swipes.insert_one({
-        "swipe_id": swipe_id,
-        "swiper_id": user.user_id,
-        "swiped_id": swipe_req.target_id,
-        "direction": swipe_req.direction,
-        "created_at": datetime.now(timezone.utc).isoformat()
-    })
-    
-    # Increment swipe count
-    await db.users.update_one(
-        {"user_id": user.user_id},
-        {"$inc": {"swipes_today": 1}}
+    await asyncio.gather(
+        db.swipes.insert_one({
+            "swipe_id": swipe_id,
+            "swiper_id": user.user_id,
+            "swiped_id": swipe_req.target_id,
+            "direction": swipe_req.direction,
+            "created_at": datetime.now(timezone.utc)
+        }),
+        increment_stats(db, total_swipes=1)
     )
+    swipe_exclusions.record(user.user_id, swipe_req.target_id)
     
     # Check for match (if this is a right swipe)
     matched = False
     match_id = None
     
     if swipe_req.direction == "right":
-        # Check if target also swiped right on this user
+        # Check if target also swiped right on this user; only once this swipe is
+        # stored, so two users swiping right at the same time still match
         reverse_swipe = await db.swipes.find_one({
             "swiper_id": swipe_req.target_id,
             "swiped_id": user.user_id,
@@ -443,14 +608,21 @@ async def swipe(swipe_req: SwipeRequest, request: Request, authorization: Option
         if reverse_swipe:
             # Create match
             match_id = f"match_{uuid.uuid4().hex[:12]}"
-            await db.matches.insert_one({
+            match = {
                 "match_id": match_id,
                 "user1_id": user.user_id,
                 "user2_id": swipe_req.target_id,
-                "created_at": datetime.now(timezone.utc).isoformat(),
+                "created_at": datetime.now(timezone.utc),
                 "last_message_at": None
-            })
+            }
+            await asyncio.gather(
+                db.matches.insert_one(match.copy()),
+                increment_stats(db, total_matches=1)
+            )
             matched = True
+            
+            if PREGENERATE_PITCHES:
+                pitch_cache.run_in_background(pregenerate_pitches(match))
     
     return {
         "message": "Swipe recorded",
@@ -459,42 +631,94 @@ async def swipe(swipe_req: SwipeRequest, request: Request, authorization: Option
     }
 
 # Match Routes
-@api_router.get("/matches")
-async def get_matches(request: Request, authorization: Optional[str] = Header(None)):
-    """Get all matches for current user"""
-    session_token = request.cookies.get("session_token")
-    user = await get_user_from_token(authorization, session_token)
+async def build_match_results(user: User, matches: List[Dict[str, Any]]) -> List[Dict[str, Any]]:
+    """Attach the other user and their profile to each match, with one query per collection"""
+    other_ids = list({m["user2_id"] if m["user1_id"] == user.user_id else m["user1_id"] for m in matches})
     
-    # Get matches
-    matches_cursor = db.matches.find({
-        "$or": [
-            {"user1_id": user.user_id},
-            {"user2_id": user.user_id}
-        ]
-    }, {"_id": 0}).sort("created_at", -1)
-    
-    matches = await matches_cursor.to_list(100)
+    other_users, other_profiles = await asyncio.gather(
+        db.users.find({"user_id": {"$in": other_ids}}, {"_id": 0}).to_list(len(other_ids)),
+        db.profiles.find({"user_id": {"$in": other_ids}}, {"_id": 0}).to_list(len(other_ids))
+    )
+    users_dict = {u["user_id"]: u for u in other_users}
+    profiles_dict = {p["user_id"]: p for p in other_profiles}
     
-    # Get user info for each match
     result = []
     for match in matches:
         other_user_id = match["user2_id"] if match["user1_id"] == user.user_id else match["user1_id"]
-        other_user = await db.users.find_one({"user_id": other_user_id}, {"_id": 0})
-        other_profile = await db.profiles.find_one({"user_id": other_user_id}, {"_id": 0})
         
-        if other_user and other_profile:
+        if other_user_id in users_dict and other_user_id in profiles_dict:
             result.append({
                 "match": match,
-                "other_user": other_user,
-                "other_profile": other_profile
+                "other_user": users_dict[other_user_id],
+                "other_profile": profiles_dict[other_user_id]
             })
     
     return result
 
+@api_router.get("/matches")
+async def get_matches(request: Request, cursor: Optional[str] = None, limit: int = 50, authorization: Optional[str] = Header(None)):
+    """Get matches for current user, newest first
+    
+    Pages are keyed on (created_at, match_id): pass the returned next_cursor to get
+    the following page. next_cursor is null on the last page.
+    """
+    session_token = request.cookies.get("session_token")
+    user = await get_user_from_token(authorization, session_token)
+    
+    limit = max(1, min(limit, 100))
+    query = {
+        "$or": [
+            {"user1_id": user.user_id},
+            {"user2_id": user.user_id}
+        ]
+    }
+    
+    if cursor:
+        query = {"$and": [query, keyset_condition(cursor, "match_id", "$lt")]}
+    
+    # Fetch one extra match to know whether another page exists
+    matches_cursor = db.matches.find(query, {"_id": 0}).sort([("created_at", -1), ("match_id", -1)]).limit(limit + 1)
+    matches = await matches_cursor.to_list(limit + 1)
+    
+    next_cursor = None
+    if len(matches) > limit:
+        matches = matches[:limit]
+        next_cursor = encode_cursor(matches[-1]["created_at"].isoformat(), matches[-1]["match_id"])
+    
+    return {
+        "matches": await build_match_results(user, matches) if matches else [],
+        "next_cursor": next_cursor
+    }
+
+@api_router.get("/matches/{match_id}")
+async def get_match(match_id: str, request: Request, authorization: Optional[str] = Header(None)):
+    """Get a single match of the current user"""
+    session_token = request.cookies.get("session_token")
+    user = await get_user_from_token(authorization, session_token)
+    
+    match = await db.matches.find_one({"match_id": match_id}, {"_id": 0})
+    if not match:
+        raise HTTPException(status_code=404, detail="Match not found")
+    
+    if user.user_id not in [match["user1_id"], match["user2_id"]]:
+        raise HTTPException(status_code=403, detail="Not authorized")
+    
+    result = await build_match_results(user, [match])
+    if not result:
+        raise HTTPException(status_code=404, detail="Match not found")
+    
+    return result[0]
+
 # Chat Routes
 @api_router.get("/chat/{match_id}/messages")
-async def get_chat_messages(match_id: str, request: Request, authorization: Optional[str] = Header(None)):
-    """Get chat messages for a match"""
+async def get_chat_messages(match_id: str, request: Request, before: Optional[str] = None, after: Optional[str] = None,
+                            limit: int = 50, authorization: Optional[str] = Header(None)):
+    """Get a page of chat messages for a match, oldest first
+    
+    Pages are keyed on (created_at, message_id). Without cursors the latest messages
+    are returned. Pass before_cursor as `before` to page back through history, and
+    after_cursor as `after` to fetch only messages newer than the ones already held.
+    """
     session_token = request.cookies.get("session_token")
     user = await get_user_from_token(authorization, session_token)
     
@@ -506,11 +730,47 @@ async def get_chat_messages(match_id: str, request: Request, authorization: Opti
     if user.user_id not in [match["user1_id"], match["user2_id"]]:
         raise HTTPException(status_code=403, detail="Not authorized")
     
-    # Get messages
-    messages_cursor = db.chat_messages.find({"match_id": match_id}, {"_id": 0}).sort("created_at", 1)
-    messages = await messages_cursor.to_list(1000)
+    if before and after:
+        raise HTTPException(status_code=400, detail="Use either before or after, not both")
+    
+    limit = max(1, min(limit, 100))
+    query = {"match_id": match_id}
+    
+    if after:
+        # Oldest messages after the cursor first, so a poll never skips any
+        query = {"$and": [query, keyset_condition(after, "message_id", "$gt")]}
+        sort_direction = 1
+    else:
+        if before:
+            query = {"$and": [query, keyset_condition(before, "message_id", "$lt")]}
+        sort_direction = -1
+    
+    # Fetch one extra message to know whether another page exists
+    messages_cursor = db.chat_messages.find(query, {"_id": 0}).sort(
+        [("created_at", sort_direction), ("message_id", sort_direction)]
+    ).limit(limit + 1)
+    messages = await messages_cursor.to_list(limit + 1)
+    
+    has_more = len(messages) > limit
+    messages = messages[:limit]
+    if sort_direction == -1:
+        messages.reverse()
+    
+    if messages:
+        after_cursor = encode_cursor(messages[-1]["created_at"].isoformat(), messages[-1]["message_id"])
+    else:
+        after_cursor = after
     
-    return messages
+    before_cursor = None
+    if not after and has_more:
+        before_cursor = encode_cursor(messages[0]["created_at"].isoformat(), messages[0]["message_id"])
+    
+    return {
+        "messages": messages,
+        "before_cursor": before_cursor,
+        "after_cursor": after_cursor,
+        "has_more_after": bool(after) and has_more
+    }
 
 @api_router.post("/chat/{match_id}/messages")
 async def send_message(match_id: str, msg_req: ChatMessageRequest, request: Request, authorization: Optional[str] = Header(None)):
@@ -526,52 +786,92 @@ async def send_message(match_id: str, msg_req: ChatMessageRequest, request: Requ
     if user.user_id not in [match["user1_id"], match["user2_id"]]:
         raise HTTPException(status_code=403, detail="Not authorized")
     
-    # Create message
+    # Create message; Mongo keeps milliseconds, so truncate to keep the pushed copy
+    # (and cursors built from it) identical to the stored one
+    now = datetime.now(timezone.utc)
     message_id = f"msg_{uuid.uuid4().hex[:12]}"
     message_data = {
         "message_id": message_id,
         "match_id": match_id,
         "sender_id": user.user_id,
         "content": msg_req.content,
-        "created_at": datetime.now(timezone.utc).isoformat()
+        "created_at": now.replace(microsecond=now.microsecond // 1000 * 1000)
     }
     
     await db.chat_messages.insert_one(message_data.copy())
+    await increment_stats(db, total_messages=1)
+    await chat_broker.publish(message_data)
     
     # Update last_message_at
     await db.matches.update_one(
         {"match_id": match_id},
-        {"$set": {"last_message_at": datetime.now(timezone.utc).isoformat()}}
+        {"$set": {"last_message_at": message_data["created_at"]}}
     )
     
     return message_data
 
-# AI Routes
-@api_router.post("/ai/generate-pitch")
-async def generate_pitch(ai_req: AIGenerateRequest, request: Request, authorization: Optional[str] = Header(None)):
-    """Generate AI pitch message for a match"""
-    session_token = request.cookies.get("session_token")
-    user = await get_user_from_token(authorization, session_token)
-    
-    # Get match
-    match = await db.matches.find_one({"match_id": ai_req.match_id}, {"_id": 0})
-    if not match:
-        raise HTTPException(status_code=404, detail="Match not found")
-    
-    if user.user_id not in [match["user1_id"], match["user2_id"]]:
-        raise HTTPException(status_code=403, detail="Not authorized")
+@api_router.websocket("/chat/{match_id}/ws")
+async def chat_socket(websocket: WebSocket, match_id: str):
+    """Push new chat messages for a match as {"message", "cursor"} events
+    
+    Authenticated like the HTTP routes (session_token cookie or Authorization
+    header). The cursor can be passed as `after` to GET /chat/{match_id}/messages
+    to catch up after a reconnect.
+    """
+    session_token = websocket.cookies.get("session_token")
+    try:
+        user = await get_user_from_token(websocket.headers.get("authorization"), session_token)
+    except HTTPException:
+        await websocket.close(code=4401)
+        return
     
-    # Get other user's profile
-    other_user_id = match["user2_id"] if match["user1_id"] == user.user_id else match["user1_id"]
-    other_user = await db.users.find_one({"user_id": other_user_id}, {"_id": 0})
-    other_profile = await db.profiles.find_one({"user_id": other_user_id}, {"_id": 0})
-    my_profile = await db.profiles.find_one({"user_id": user.user_id}, {"_id": 0})
+    match = await db.matches.find_one({"match_id": match_id}, {"_id": 0})
+    if not match or user.user_id not in [match["user1_id"], match["user2_id"]]:
+        await websocket.close(code=4403)
+        return
+    
+    await websocket.accept()
+    subscription = chat_broker.subscribe(match_id)
+    
+    async def forward():
+        while True:
+            message = await subscription.get()
+            if message is None:
+                # Too far behind; the client reconnects and catches up over HTTP
+                await websocket.close(code=1013)
+                return
+            await websocket.send_json({
+                "message": jsonable_encoder(message),
+                "cursor": encode_cursor(message["created_at"].isoformat(), message["message_id"])
+            })
     
-    # Generate pitch using AI
-    api_key = os.environ.get('EMERGENT_LLM_KEY')
-    session_id = f"pitch_{uuid.uuid4().hex[:8]}"
+    sender = asyncio.create_task(forward())
+    try:
+        # Clients only listen; reading detects the disconnect
+        while True:
+            await websocket.receive_text()
+    except WebSocketDisconnect:
+        pass
+    finally:
+        sender.cancel()
+        # The sender fails on its own if the client left mid-send; retrieve that too
+        with contextlib.suppress(asyncio.CancelledError, WebSocketDisconnect, RuntimeError):
+            await sender
+        chat_broker.unsubscribe(subscription)
+
+# AI Routes
+async def build_pitch_prompt(requester: Dict[str, Any], other_user_id: str) -> str:
+    """Build the LLM prompt for a pitch from the requester to the other user of a match"""
+    other_user, other_profile, my_profile = await asyncio.gather(
+        db.users.find_one({"user_id": other_user_id}, {"_id": 0}),
+        db.profiles.find_one({"user_id": other_user_id}, {"_id": 0}),
+        db.profiles.find_one({"user_id": requester["user_id"]}, {"_id": 0})
+    )
+    other_user = other_user or {}
+    other_profile = other_profile or {}
+    my_profile = my_profile or {}
     
-    if user.role == "host":
+    if requester["role"] == "host":
         prompt = f"""You are helping a podcast host reach out to a potential guest.
         
 Host's podcast: {my_profile.get('podcast_name', 'Unknown')}
@@ -586,7 +886,7 @@ Write a friendly, professional pitch message (2-3 sentences) inviting this guest
     else:
         prompt = f"""You are helping a podcast guest reach out to a podcast host.
         
-Guest's name: {user.name}
+Guest's name: {requester.get('name', 'Guest')}
 Guest's expertise: {', '.join(my_profile.get('expertise', []))}
 Guest's bio: {my_profile.get('bio', 'N/A')}
 
@@ -596,16 +896,130 @@ Podcast topics: {', '.join(other_profile.get('topics', []))}
 
 Write a friendly, professional pitch message (2-3 sentences) expressing interest in being a guest on this podcast. Be specific about what value you could bring."""
     
+    return prompt
+
+PITCH_SYSTEM_MESSAGE = "You are a helpful assistant that writes professional, friendly podcast pitch messages."
+
+async def generate_pitch_text(prompt: str) -> str:
+    """Send a pitch prompt to the LLM"""
     chat = LlmChat(
-        api_key=api_key,
-        session_id=session_id,
-        system_message="You are a helpful assistant that writes professional, friendly podcast pitch messages."
-    ).with_model("openai", "gpt-5.2")
+        api_key=os.environ.get('EMERGENT_LLM_KEY'),
+        session_id=f"pitch_{uuid.uuid4().hex[:8]}",
+        system_message=PITCH_SYSTEM_MESSAGE
+    ).with_model("openai", LLM_MODEL)
     
-    user_message = UserMessage(text=prompt)
-    response = await chat.send_message(user_message)
+    return await chat.send_message(UserMessage(text=prompt))
+
+async def stream_pitch_text(prompt: str) -> AsyncIterator[str]:
+    """Stream a pitch completion from the LLM"""
+    if LLM_API_BASE:
+        messages = [
+            {"role": "system", "content": PITCH_SYSTEM_MESSAGE},
+            {"role": "user", "content": prompt}
+        ]
+        async for chunk in stream_chat_completion(
+            http_client.session, LLM_API_BASE, os.environ.get('EMERGENT_LLM_KEY'), LLM_MODEL, messages
+        ):
+            yield chunk
+    else:
+        # LlmChat only returns whole completions
+        yield await generate_pitch_text(prompt)
+
+def limited_pitch_stream(prompt: str) -> AsyncIterator[str]:
+    """Pitch stream gated by the shared LLM limiter"""
+    return llm_limiter.stream(stream_pitch_text(prompt))
+
+# Generated pitches, shared by all workers through the ai_pitches collection
+pitch_cache = PitchCache(db, limited_pitch_stream)
+
+async def pregenerate_pitches(match: Dict[str, Any]):
+    """Generate both participants' pitches for a new match ahead of the first request"""
+    participants = await db.users.find(
+        {"user_id": {"$in": [match["user1_id"], match["user2_id"]]}},
+        {"_id": 0, "user_id": 1, "role": 1, "name": 1}
+    ).to_list(2)
+    
+    for participant in participants:
+        if participant.get("role") not in ["host", "guest"]:
+            continue
+        other_user_id = match["user2_id"] if match["user1_id"] == participant["user_id"] else match["user1_id"]
+        prompt = await build_pitch_prompt(participant, other_user_id)
+        await pitch_cache.get(match["match_id"], participant["role"], prompt)
+
+async def get_pitch_prompt(match_id: str, user: User) -> str:
+    """Pitch prompt for a user in a match, checking they are part of it"""
+    match = await db.matches.find_one({"match_id": match_id}, {"_id": 0})
+    if not match:
+        raise HTTPException(status_code=404, detail="Match not found")
+    
+    if user.user_id not in [match["user1_id"], match["user2_id"]]:
+        raise HTTPException(status_code=403, detail="Not authorized")
+    
+    other_user_id = match["user2_id"] if match["user1_id"] == user.user_id else match["user1_id"]
+    return await build_pitch_prompt(user.model_dump(), other_user_id)
+
+@api_router.post("/ai/generate-pitch")
+async def generate_pitch(ai_req: AIGenerateRequest, request: Request, authorization: Optional[str] = Header(None)):
+    """Generate AI pitch message for a match"""
+    session_token = request.cookies.get("session_token")
+    user = await get_user_from_token(authorization, session_token)
+    
+    prompt = await get_pitch_prompt(ai_req.match_id, user)
+    
+    # Served from the pitch cache when both profiles are unchanged
+    try:
+        pitch = await pitch_cache.get(ai_req.match_id, user.role, prompt)
+    except LlmUnavailable as e:
+        raise HTTPException(status_code=503, detail=str(e))
     
-    return {"pitch": response}
+    return {"pitch": pitch}
+
+def sse_event(event: str, data: Dict[str, Any]) -> str:
+    """Encode a server-sent event"""
+    return f"event: {event}\ndata: {json.dumps(data)}\n\n"
+
+@api_router.post("/ai/generate-pitch/stream")
+async def stream_pitch(ai_req: AIGenerateRequest, request: Request, authorization: Optional[str] = Header(None)):
+    """Generate AI pitch message for a match, streamed as server-sent events
+    
+    Sends a "delta" event per chunk of text, then "done" with the full pitch, or
+    "error" if the LLM call fails after the first chunk. Failures before the first
+    chunk are a 503.
+    """
+    session_token = request.cookies.get("session_token")
+    user = await get_user_from_token(authorization, session_token)
+    
+    prompt = await get_pitch_prompt(ai_req.match_id, user)
+    
+    # Wait for the first chunk before responding: cached pitches are served even
+    # while the LLM is unavailable, and a rejected LLM call is a plain 503
+    pitch_stream = pitch_cache.stream(ai_req.match_id, user.role, prompt)
+    try:
+        first_chunks = [await pitch_stream.__anext__()]
+    except StopAsyncIteration:
+        first_chunks = []
+    except LlmUnavailable as e:
+        raise HTTPException(status_code=503, detail=str(e))
+    
+    async def events():
+        chunks = []
+        for chunk in first_chunks:
+            chunks.append(chunk)
+            yield sse_event("delta", {"text": chunk})
+        try:
+            async for chunk in pitch_stream:
+                chunks.append(chunk)
+                yield sse_event("delta", {"text": chunk})
+        except LlmUnavailable as e:
+            yield sse_event("error", {"detail": str(e)})
+            return
+        yield sse_event("done", {"pitch": "".join(chunks)})
+    
+    return StreamingResponse(
+        events(),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"}
+    )
 
 # Subscription Routes
 PACKAGES = {
@@ -613,6 +1027,39 @@ PACKAGES = {
     "pro_yearly": 89.99
 }
 
+# Stripe client for status checks and webhooks, built on first use and reused
+_stripe_checkout: Optional[StripeCheckout] = None
+
+def get_stripe_checkout() -> StripeCheckout:
+    """Shared Stripe client (its webhook_url is only used when creating checkouts)"""
+    global _stripe_checkout
+    if _stripe_checkout is None:
+        _stripe_checkout = StripeCheckout(
+            api_key=os.environ.get('STRIPE_API_KEY'),
+            webhook_url="https://placeholder.com/webhook"
+        )
+    return _stripe_checkout
+
+async def fetch_checkout_status(session_id: str) -> CheckoutStatusResponse:
+    """Checkout status straight from Stripe"""
+    return await get_stripe_checkout().get_checkout_status(session_id)
+
+# Stripe statuses of open checkouts, shared by concurrent Settings page polls
+checkout_status_cache = CheckoutStatusCache(
+    fetch_checkout_status, ttl=float(os.environ.get('CHECKOUT_STATUS_TTL', '2'))
+)
+
+async def upgrade_to_pro(user_id: str):
+    """Move a user to the pro tier, counting them once however often payment is confirmed"""
+    result = await db.users.update_one(
+        {"user_id": user_id, "subscription_tier": {"$ne": "pro"}},
+        {"$set": {"subscription_tier": "pro"}}
+    )
+    session_cache.invalidate_user(user_id)
+    
+    if result.modified_count:
+        await increment_stats(db, pro_users=1)
+
 @api_router.get("/subscription/status")
 async def get_subscription_status(request: Request, authorization: Optional[str] = Header(None)):
     """Get subscription status"""
@@ -621,7 +1068,7 @@ async def get_subscription_status(request: Request, authorization: Optional[str]
     
     return {
         "tier": user.subscription_tier,
-        "swipes_today": user.swipes_today,
+        "swipes_today": swipes_used_today(user),
         "swipes_reset_at": user.swipes_reset_at
     }
 
@@ -670,8 +1117,8 @@ async def create_checkout(checkout_req: CheckoutRequest, request: Request, autho
         "status": "pending",
         "payment_status": "pending",
         "metadata": {"package_id": checkout_req.package_id},
-        "created_at": datetime.now(timezone.utc).isoformat(),
-        "updated_at": datetime.now(timezone.utc).isoformat()
+        "created_at": datetime.now(timezone.utc),
+        "updated_at": datetime.now(timezone.utc)
     })
     
     return {"url": session.url, "session_id": session.session_id}
@@ -690,120 +1137,164 @@ async def check_checkout_status(session_id: str, request: Request, authorization
     if transaction["user_id"] != user.user_id:
         raise HTTPException(status_code=403, detail="Not authorized")
     
-    # Check with Stripe
-    api_key = os.environ.get('STRIPE_API_KEY')
-    webhook_url = "https://placeholder.com/webhook"  # Not used for status check
-    stripe_checkout = StripeCheckout(api_key=api_key, webhook_url=webhook_url)
+    # Paid or expired checkouts never change again, so answer from the transaction
+    if transaction["payment_status"] == "paid" or transaction["status"] == "expired":
+        return CheckoutStatusResponse(
+            status="complete" if transaction["payment_status"] == "paid" else "expired",
+            payment_status=transaction["payment_status"],
+            amount_total=round(transaction["amount"] * 100),
+            currency=transaction["currency"],
+            metadata={"user_id": transaction["user_id"], **transaction.get("metadata", {})}
+        )
     
-    status = await stripe_checkout.get_checkout_status(session_id)
+    # Check with Stripe (shared with other polls of this session)
+    status = await checkout_status_cache.get(session_id)
     
-    # Update transaction if paid and not already processed
-    if status.payment_status == "paid" and transaction["payment_status"] != "paid":
+    # Record terminal states so later polls stop reaching Stripe
+    if status.payment_status == "paid":
+        await complete_payment(session_id)
+    elif status.status == "expired":
         await db.payment_transactions.update_one(
-            {"session_id": session_id},
-            {"$set": {
-                "status": "completed",
-                "payment_status": "paid",
-                "updated_at": datetime.now(timezone.utc).isoformat()
-            }}
-        )
-        
-        # Upgrade user subscription
-        await db.users.update_one(
-            {"user_id": user.user_id},
-            {"$set": {"subscription_tier": "pro"}}
+            {"session_id": session_id, "payment_status": {"$ne": "paid"}},
+            {"$set": {"status": "expired", "updated_at": datetime.now(timezone.utc)}}
         )
     
     return status
 
+async def complete_payment(session_id: str):
+    """Mark a paid checkout's transaction completed and upgrade its user"""
+    transaction = await db.payment_transactions.find_one_and_update(
+        {"session_id": session_id},
+        {"$set": {
+            "status": "completed",
+            "payment_status": "paid",
+            "updated_at": datetime.now(timezone.utc)
+        }},
+        projection={"_id": 0, "user_id": 1}
+    )
+    
+    if transaction:
+        await upgrade_to_pro(transaction["user_id"])
+
+async def apply_payment_event(event: Dict[str, Any]):
+    """Apply a recorded Stripe webhook event"""
+    await complete_payment(event["session_id"])
+
+# Applies recorded Stripe webhook events after the webhook has been acknowledged
+payment_worker = PaymentEventWorker(
+    db, apply_payment_event, sweep_interval=float(os.environ.get('PAYMENT_SWEEP_INTERVAL', '30'))
+)
+
 @api_router.post("/webhook/stripe")
 async def stripe_webhook(request: Request):
-    """Handle Stripe webhooks"""
+    """Handle Stripe webhooks
+    
+    Paid events are recorded once (by event id) and applied in the background;
+    retried deliveries of a recorded event are acknowledged without other work.
+    """
     body = await request.body()
     signature = request.headers.get("Stripe-Signature")
     
-    api_key = os.environ.get('STRIPE_API_KEY')
-    webhook_url = "https://placeholder.com/webhook"
-    stripe_checkout = StripeCheckout(api_key=api_key, webhook_url=webhook_url)
-    
     try:
-        webhook_response = await stripe_checkout.handle_webhook(body, signature)
-        
-        if webhook_response.payment_status == "paid":
-            # Update transaction
-            await db.payment_transactions.update_one(
-                {"session_id": webhook_response.session_id},
-                {"$set": {
-                    "status": "completed",
-                    "payment_status": "paid",
-                    "updated_at": datetime.now(timezone.utc).isoformat()
-                }}
-            )
-            
-            # Get user_id from transaction
-            transaction = await db.payment_transactions.find_one(
-                {"session_id": webhook_response.session_id},
-                {"_id": 0}
-            )
-            
-            if transaction:
-                await db.users.update_one(
-                    {"user_id": transaction["user_id"]},
-                    {"$set": {"subscription_tier": "pro"}}
-                )
-        
-        return {"status": "success"}
+        webhook_response = await get_stripe_checkout().handle_webhook(body, signature)
     except Exception as e:
         raise HTTPException(status_code=400, detail=str(e))
+    
+    if webhook_response.payment_status == "paid":
+        event_id = webhook_response.event_id or webhook_response.session_id
+        if await record_payment_event(db, event_id, webhook_response.session_id):
+            payment_worker.submit(event_id)
+    
+    return {"status": "success"}
 
 # Admin Routes
+def export_filters(request: Request, reserved: set) -> Dict[str, str]:
+    """Query parameters of an admin listing that are equality filters"""
+    return {key: value for key, value in request.query_params.items() if key not in reserved}
+
 @api_router.get("/admin/users")
-async def get_all_users(request: Request, authorization: Optional[str] = Header(None)):
-    """Get all users (admin only)"""
+async def get_all_users(request: Request, format: str = "json", fields: Optional[str] = None, limit: int = 1000,
+                        authorization: Optional[str] = Header(None)):
+    """Get users (admin only)
+    
+    Other query parameters filter on user fields (e.g. role=host). format=json returns
+    the newest `limit` users (max 1000) as an array; format=ndjson streams every
+    matching user, one JSON document per line, in constant memory.
+    """
     session_token = request.cookies.get("session_token")
     user = await get_user_from_token(authorization, session_token)
     
     # Simple admin check (in production, add proper admin role)
-    users_cursor = db.users.find({}, {"_id": 0}).sort("created_at", -1)
-    users = await users_cursor.to_list(1000)
+    query, projection = build_export_query(
+        "users", export_filters(request, {"format", "fields", "limit"}), fields
+    )
+    
+    if format == "ndjson":
+        return StreamingResponse(stream_ndjson(db.users.find(query, projection)), media_type="application/x-ndjson")
+    if format != "json":
+        raise HTTPException(status_code=400, detail="format must be json or ndjson")
+    
+    limit = max(1, min(limit, 1000))
+    users_cursor = db.users.find(query, projection).sort("created_at", -1).limit(limit)
+    users = await users_cursor.to_list(limit)
     
     return users
 
+@api_router.get("/admin/export/{collection}")
+async def export_collection(collection: str, request: Request, fields: Optional[str] = None,
+                            authorization: Optional[str] = Header(None)):
+    """Stream a collection (users, profiles, swipes, matches) as NDJSON (admin only)
+    
+    Other query parameters are equality filters on the collection's filterable fields,
+    and fields=a,b limits the exported fields.
+    """
+    session_token = request.cookies.get("session_token")
+    user = await get_user_from_token(authorization, session_token)
+    
+    query, projection = build_export_query(collection, export_filters(request, {"fields"}), fields)
+    
+    return StreamingResponse(
+        stream_ndjson(db[collection].find(query, projection)),
+        media_type="application/x-ndjson",
+        headers={"Content-Disposition": f'attachment; filename="{collection}.ndjson"'}
+    )
+
 @api_router.get("/admin/stats")
 async def get_stats(request: Request, authorization: Optional[str] = Header(None)):
     """Get platform statistics"""
     session_token = request.cookies.get("session_token")
     user = await get_user_from_token(authorization, session_token)
     
-    total_users = await db.users.count_documents({})
-    total_hosts = await db.users.count_documents({"role": "host"})
-    total_guests = await db.users.count_documents({"role": "guest"})
-    total_matches = await db.matches.count_documents({})
-    total_messages = await db.chat_messages.count_documents({})
-    total_swipes = await db.swipes.count_documents({})
-    pro_users = await db.users.count_documents({"subscription_tier": "pro"})
-    
-    return {
-        "total_users": total_users,
-        "total_hosts": total_hosts,
-        "total_guests": total_guests,
-        "total_matches": total_matches,
-        "total_messages": total_messages,
-        "total_swipes": total_swipes,
-        "pro_users": pro_users
-    }
+    # Counters maintained by the write paths, reconciled by stats_reconciler
+    return await read_stats(db)
 
 @api_router.post("/admin/train-model")
-async def train_recommendation_model(request: Request, authorization: Optional[str] = Header(None)):
-    """Train the collaborative filtering model (Admin only)"""
+async def train_recommendation_model(request: Request, incremental: bool = False, authorization: Optional[str] = Header(None)):
+    """Train the collaborative filtering model (Admin only)
+    
+    With incremental=true the current model is fine-tuned on swipes newer than its
+    training watermark, so the cost scales with new data rather than total history.
+    """
     session_token = request.cookies.get("session_token")
     user = await get_user_from_token(authorization, session_token)
     
-    # Get all swipes
-    swipes_cursor = db.swipes.find({}, {"_id": 0})
-    swipes = await swipes_cursor.to_list(10000)
+    # The model loads lazily; make sure the watermark reflects the current checkpoint
+    await asyncio.to_thread(recommender.ensure_loaded)
+    incremental = incremental and recommender.model is not None
     
-    if len(swipes) < 10:
+    if incremental:
+        # Only fetch swipes the current model hasn't seen yet
+        query = {"created_at": {"$gt": datetime.fromisoformat(recommender.trained_until)}} if recommender.trained_until else {}
+        swipes = await db.swipes.find(query, {"_id": 0}).to_list(None)
+        
+        if not swipes:
+            return {"message": "Model is already up to date", "job_id": None, "status": "completed", "swipes_used": 0}
+    else:
+        # Get all swipes
+        swipes_cursor = db.swipes.find({}, {"_id": 0})
+        swipes = await swipes_cursor.to_list(10000)
+    
+    if len(swipes) < 10 and not incremental:
         # Create synthetic training data if not enough real swipes
         logger.info("Creating synthetic training data...")
         hosts = await db.users.find({"role": "host"}, {"_id": 0, "user_id": 1}).to_list(10)
@@ -827,19 +1318,89 @@ async def train_recommendation_model(request: Request, authorization: Optional[s
             
             swipes = synthetic_swipes
     
-    if len(swipes) < 10:
+    if len(swipes) < 10 and not incremental:
         raise HTTPException(status_code=400, detail="Not enough swipe data to train model")
     
-    # Train model in background
+    # Train model in background; the index is rebuilt once the new model is live
     try:
-        recommender.train_model(swipes, epochs=20)
-        return {
-            "message": "Model training completed successfully",
-            "swipes_used": len(swipes)
-        }
+        job = await training_jobs.submit(
+            swipes,
+            epochs=20,
+            incremental=incremental,
+            on_complete=lambda: rebuild_recommendation_index(db, recommender)
+        )
     except Exception as e:
-        logger.error(f"Error training model: {e}")
-        raise HTTPException(status_code=500, detail=f"Model training failed: {str(e)}")
+        logger.error(f"Error starting model training: {e}")
+        raise HTTPException(status_code=500, detail=f"Model training failed to start: {str(e)}")
+    
+    return {
+        "message": "Model training started",
+        "job_id": job["job_id"],
+        "status": job["status"],
+        "swipes_used": len(swipes)
+    }
+
+@api_router.get("/admin/train-model/{job_id}")
+async def get_training_job(job_id: str, request: Request, authorization: Optional[str] = Header(None)):
+    """Get status and progress (epoch, loss, elapsed) of a training job"""
+    session_token = request.cookies.get("session_token")
+    user = await get_user_from_token(authorization, session_token)
+    
+    job = await training_jobs.get(job_id)
+    if not job:
+        raise HTTPException(status_code=404, detail="Training job not found")
+    
+    return job
+
+@api_router.get("/admin/inference/stats")
+async def get_inference_stats(request: Request, authorization: Optional[str] = Header(None)):
+    """Get micro-batching metrics for recommendation inference"""
+    session_token = request.cookies.get("session_token")
+    user = await get_user_from_token(authorization, session_token)
+    
+    return inference_batcher.stats()
+
+@api_router.get("/admin/ai/stats")
+async def get_ai_stats(request: Request, authorization: Optional[str] = Header(None)):
+    """Get pitch cache and LLM limiter metrics"""
+    session_token = request.cookies.get("session_token")
+    user = await get_user_from_token(authorization, session_token)
+    
+    return {"pitch_cache": pitch_cache.stats(), "llm": llm_limiter.stats()}
+
+@api_router.get("/admin/auth/stats")
+async def get_auth_stats(request: Request, authorization: Optional[str] = Header(None)):
+    """Get session cache hit/miss metrics for the auth path"""
+    session_token = request.cookies.get("session_token")
+    user = await get_user_from_token(authorization, session_token)
+    
+    return session_cache.stats()
+
+@api_router.get("/admin/model/versions")
+async def get_model_versions(request: Request, authorization: Optional[str] = Header(None)):
+    """List saved model versions and the one currently served"""
+    session_token = request.cookies.get("session_token")
+    user = await get_user_from_token(authorization, session_token)
+    
+    manifest = await asyncio.to_thread(recommender.read_manifest)
+    return {**manifest, "loaded": recommender.model_version}
+
+@api_router.post("/admin/model/rollback")
+async def rollback_model(rollback_req: ModelRollbackRequest, request: Request, authorization: Optional[str] = Header(None)):
+    """Roll every worker back to a previously trained model version"""
+    session_token = request.cookies.get("session_token")
+    user = await get_user_from_token(authorization, session_token)
+    
+    try:
+        await asyncio.to_thread(recommender.rollback, rollback_req.version)
+    except ValueError as e:
+        raise HTTPException(status_code=404, detail=str(e))
+    
+    if recommender.model_version != rollback_req.version:
+        raise HTTPException(status_code=500, detail="Failed to load model version")
+    
+    users_indexed = await rebuild_recommendation_index(db, recommender)
+    return {"message": "Model rolled back", "version": rollback_req.version, "users_indexed": users_indexed}
 
 # Include the router in the main app
 app.include_router(api_router)
@@ -858,6 +1419,55 @@ logging.basicConfig(
 )
 logger = logging.getLogger(__name__)
 
+@app.on_event("startup")
+async def prepare_database():
+    # ISO timestamps are converted by scripts/migrate_timestamps.py, not by every worker
+    await ensure_indexes(db)
+
+@app.on_event("startup")
+async def start_http_client():
+    await http_client.start()
+
+@app.on_event("startup")
+async def start_chat_broker():
+    await chat_broker.start()
+
+@app.on_event("startup")
+async def start_stats_reconciler():
+    stats_reconciler.start()
+
+@app.on_event("startup")
+async def start_payment_worker():
+    payment_worker.start()
+
+@app.on_event("startup")
+async def start_model_watcher():
+    model_watcher.start()
+
 @app.on_event("shutdown")
 async def shutdown_db_client():
-    client.close()
\ No newline at end of file
+    client.close()
+
+@app.on_event("shutdown")
+async def stop_model_watcher():
+    await model_watcher.stop()
+
+@app.on_event("shutdown")
+async def stop_http_client():
+    await http_client.stop()
+
+@app.on_event("shutdown")
+async def stop_chat_broker():
+    await chat_broker.stop()
+
+@app.on_event("shutdown")
+async def stop_payment_worker():
+    await payment_worker.stop()
+
+@app.on_event("shutdown")
+async def stop_stats_reconciler():
+    await stats_reconciler.stop()
+
+@app.on_event("shutdown")
+async def shutdown_training_jobs():
+    training_jobs.shutdown()
\ No newline at end of file
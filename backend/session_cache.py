@@ -0,0 +1,146 @@
+import time
+from collections import OrderedDict
+from datetime import datetime, timezone
+from typing import Any, Dict, Set
+
+
+class SessionCache:
+    """Bounded LRU/TTL cache of session token -> resolved user
+
+    Entries live for at most ttl seconds and never past the session's own
+    expires_at. Writes that change what a user's session resolves to (role,
+    profile, subscription, swipe counters) must call invalidate_user(), and logout
+    must call invalidate_token().
+
+    The cache is per process, so those invalidations only reach this worker.
+    Logouts elsewhere are caught by re-checking that the session still exists:
+    once an entry was last confirmed more than recheck_after seconds ago,
+    needs_recheck() is true and the caller should look the session up (one
+    indexed read, no user lookup) and call confirm() or invalidate_token(). A
+    session logged out through another worker therefore keeps working here for
+    at most recheck_after seconds, and other workers can serve a stale user
+    document for up to ttl seconds.
+    """
+
+    def __init__(self, max_size: int = 10000, ttl: float = 30.0, recheck_after: float = 5.0):
+        self.max_size = max_size
+        self.ttl = ttl
+        self.recheck_after = recheck_after
+        self._entries: "OrderedDict[str, Dict[str, Any]]" = OrderedDict()
+        self._tokens_by_user: Dict[str, Set[str]] = {}
+        self._epoch = 0  # Bumped by every invalidation
+
+        # Metrics
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.invalidations = 0
+        self.rechecks = 0
+        self.db_lookups = 0
+        self.db_lookup_seconds = 0.0  # Time spent resolving sessions from the database
+
+    @property
+    def epoch(self) -> int:
+        """Read before a database lookup and pass to put(), so a lookup that raced an
+        invalidation is not cached"""
+        return self._epoch
+
+    def get(self, token: str):
+        """Cached user for a session token, or None"""
+        entry = self._entries.get(token)
+
+        if entry is not None and (
+            entry["cached_until"] <= time.monotonic() or entry["expires_at"] < datetime.now(timezone.utc)
+        ):
+            self._remove(token)
+            entry = None
+
+        if entry is None:
+            self.misses += 1
+            return None
+
+        self._entries.move_to_end(token)
+        self.hits += 1
+        return entry["user"]
+
+    def put(self, token: str, user, expires_at: datetime, epoch: int, lookup_seconds: float = 0.0):
+        """Cache a user resolved from the database
+
+        Args:
+            token: Session token
+            user: Resolved user (callers get this object back from get(), so cache a copy
+                if they may mutate it)
+            expires_at: Session expiry (aware datetime)
+            epoch: Value of epoch read before the lookup started
+            lookup_seconds: How long the database lookup took
+        """
+        self.db_lookups += 1
+        self.db_lookup_seconds += lookup_seconds
+        if epoch != self._epoch or self.max_size <= 0:
+            return
+
+        self._remove(token)
+        self._entries[token] = {
+            "user": user,
+            "user_id": user.user_id,
+            "expires_at": expires_at,
+            "cached_until": time.monotonic() + self.ttl,
+            "checked_at": time.monotonic()
+        }
+        self._tokens_by_user.setdefault(user.user_id, set()).add(token)
+
+        while len(self._entries) > self.max_size:
+            self._remove(next(iter(self._entries)))
+            self.evictions += 1
+
+    def needs_recheck(self, token: str) -> bool:
+        """Whether a cached session is due for a check that it still exists"""
+        entry = self._entries.get(token)
+        return entry is not None and time.monotonic() - entry["checked_at"] >= self.recheck_after
+
+    def confirm(self, token: str):
+        """Record that a cached session was found to still exist"""
+        entry = self._entries.get(token)
+        if entry is not None:
+            entry["checked_at"] = time.monotonic()
+            self.rechecks += 1
+
+    def invalidate_token(self, token: str):
+        """Drop one session (logout)"""
+        self._epoch += 1
+        self.invalidations += 1
+        self._remove(token)
+
+    def invalidate_user(self, user_id: str):
+        """Drop every cached session of a user whose stored document changed"""
+        self._epoch += 1
+        self.invalidations += 1
+        for token in list(self._tokens_by_user.get(user_id, ())):
+            self._remove(token)
+
+    def _remove(self, token: str):
+        entry = self._entries.pop(token, None)
+        if entry is None:
+            return
+
+        tokens = self._tokens_by_user.get(entry["user_id"])
+        if tokens is not None:
+            tokens.discard(token)
+            if not tokens:
+                del self._tokens_by_user[entry["user_id"]]
+
+    def stats(self) -> Dict[str, Any]:
+        """Hit/miss counters and the average cost of resolving a session from the database"""
+        lookups = self.hits + self.misses
+        return {
+            "size": len(self._entries),
+            "max_size": self.max_size,
+            "ttl": self.ttl,
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_rate": self.hits / lookups if lookups else 0.0,
+            "evictions": self.evictions,
+            "invalidations": self.invalidations,
+            "rechecks": self.rechecks,
+            "avg_db_lookup_ms": self.db_lookup_seconds * 1000 / self.db_lookups if self.db_lookups else 0.0
+        }
@@ -191,6 +191,13 @@ class PodcastMatchAPITester:
             "api/matches",
             401  # Expected to fail without valid session
         )
+        
+        self.run_test(
+            "Get Match",
+            "GET",
+            "api/matches/test_match_123",
+            401  # Expected to fail without valid session
+        )
 
     def test_chat_endpoints(self):
         """Test chat endpoints"""
@@ -21,7 +21,7 @@ function AdminDashboard() {
     try {
       const [statsRes, usersRes] = await Promise.all([
         fetch(`${BACKEND_URL}/api/admin/stats`, { credentials: 'include' }),
-        fetch(`${BACKEND_URL}/api/admin/users`, { credentials: 'include' })
+        fetch(`${BACKEND_URL}/api/admin/users?limit=20`, { credentials: 'include' })
       ]);
 
       if (statsRes.ok) {
@@ -54,7 +54,28 @@ function AdminDashboard() {
       }
 
       const data = await response.json();
-      toast.success(`Model trained successfully with ${data.swipes_used} swipes!`);
+      if (!data.job_id) {
+        toast.success(data.message);
+        return;
+      }
+
+      // Training runs in the background, poll the job until it finishes
+      let job = data;
+      while (job.status === 'queued' || job.status === 'running') {
+        await new Promise((resolve) => setTimeout(resolve, 1000));
+        const statusRes = await fetch(`${BACKEND_URL}/api/admin/train-model/${data.job_id}`, {
+          credentials: 'include'
+        });
+        if (!statusRes.ok) {
+          throw new Error('Failed to get training status');
+        }
+        job = await statusRes.json();
+      }
+
+      if (job.status !== 'completed') {
+        throw new Error(job.error || 'Failed to train model');
+      }
+      toast.success(`Model trained successfully with ${job.swipes_used} swipes!`);
     } catch (error) {
       console.error('Error training model:', error);
       toast.error('Failed to train model');
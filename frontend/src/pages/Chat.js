@@ -11,6 +11,8 @@ function Chat() {
   const { matchId } = useParams();
   const navigate = useNavigate();
   const [messages, setMessages] = useState([]);
+  const [beforeCursor, setBeforeCursor] = useState(null);
+  const [loadingEarlier, setLoadingEarlier] = useState(false);
   const [newMessage, setNewMessage] = useState('');
   const [user, setUser] = useState(null);
   const [otherUser, setOtherUser] = useState(null);
@@ -18,16 +20,47 @@ function Chat() {
   const [sending, setSending] = useState(false);
   const [generatingPitch, setGeneratingPitch] = useState(false);
   const messagesEndRef = useRef(null);
+  // Cursor of the newest message held, so catch-up fetches only get what is new
+  const afterCursorRef = useRef(null);
 
   useEffect(() => {
+    afterCursorRef.current = null;
     fetchData();
-    const interval = setInterval(fetchMessages, 3000);
-    return () => clearInterval(interval);
+
+    // New messages are pushed over a WebSocket instead of polled
+    let socket = null;
+    let reconnectTimer = null;
+    let closed = false;
+
+    const connect = () => {
+      socket = new WebSocket(`${BACKEND_URL.replace(/^http/, 'ws')}/api/chat/${matchId}/ws`);
+      socket.onopen = () => {
+        // Catch up on anything sent while the socket was down
+        if (afterCursorRef.current) fetchMessages();
+      };
+      socket.onmessage = (event) => {
+        const data = JSON.parse(event.data);
+        appendMessages([data.message]);
+        afterCursorRef.current = data.cursor;
+      };
+      socket.onclose = () => {
+        if (!closed) reconnectTimer = setTimeout(connect, 2000);
+      };
+    };
+    connect();
+
+    return () => {
+      closed = true;
+      clearTimeout(reconnectTimer);
+      socket?.close();
+    };
   }, [matchId]);
 
+  // Only follow new messages; loading earlier ones keeps the scroll position
+  const lastMessageId = messages.length ? messages[messages.length - 1].message_id : null;
   useEffect(() => {
     scrollToBottom();
-  }, [messages]);
+  }, [lastMessageId]);
 
   const scrollToBottom = () => {
     messagesEndRef.current?.scrollIntoView({ behavior: 'smooth' });
@@ -35,10 +68,10 @@ function Chat() {
 
   const fetchData = async () => {
     try {
-      const [userRes, messagesRes, matchesRes] = await Promise.all([
+      const [userRes, messagesRes, matchRes] = await Promise.all([
         fetch(`${BACKEND_URL}/api/auth/me`, { credentials: 'include' }),
         fetch(`${BACKEND_URL}/api/chat/${matchId}/messages`, { credentials: 'include' }),
-        fetch(`${BACKEND_URL}/api/matches`, { credentials: 'include' })
+        fetch(`${BACKEND_URL}/api/matches/${matchId}`, { credentials: 'include' })
       ]);
 
       if (userRes.ok) {
@@ -48,15 +81,14 @@ function Chat() {
 
       if (messagesRes.ok) {
         const messagesData = await messagesRes.json();
-        setMessages(messagesData);
+        setMessages(messagesData.messages);
+        setBeforeCursor(messagesData.before_cursor);
+        afterCursorRef.current = messagesData.after_cursor;
       }
 
-      if (matchesRes.ok) {
-        const matchesData = await matchesRes.json();
-        const currentMatch = matchesData.find(m => m.match.match_id === matchId);
-        if (currentMatch) {
-          setOtherUser(currentMatch.other_user);
-        }
+      if (matchRes.ok) {
+        const currentMatch = await matchRes.json();
+        setOtherUser(currentMatch.other_user);
       }
     } catch (error) {
       console.error('Error fetching data:', error);
@@ -65,20 +97,62 @@ function Chat() {
     }
   };
 
+  const appendMessages = (newMessages) => {
+    setMessages(prev => {
+      const known = new Set(prev.map(m => m.message_id));
+      return [...prev, ...newMessages.filter(m => !known.has(m.message_id))];
+    });
+  };
+
   const fetchMessages = async () => {
+    const afterCursor = afterCursorRef.current;
+    const url = afterCursor
+      ? `${BACKEND_URL}/api/chat/${matchId}/messages?after=${encodeURIComponent(afterCursor)}`
+      : `${BACKEND_URL}/api/chat/${matchId}/messages`;
+
     try {
-      const response = await fetch(`${BACKEND_URL}/api/chat/${matchId}/messages`, {
+      const response = await fetch(url, {
         credentials: 'include'
       });
       if (response.ok) {
         const data = await response.json();
-        setMessages(data);
+        if (afterCursor) {
+          appendMessages(data.messages);
+        } else {
+          setMessages(data.messages);
+          setBeforeCursor(data.before_cursor);
+        }
+        afterCursorRef.current = data.after_cursor;
+
+        if (data.has_more_after) {
+          fetchMessages();
+        }
       }
     } catch (error) {
       console.error('Error fetching messages:', error);
     }
   };
 
+  const loadEarlier = async () => {
+    setLoadingEarlier(true);
+    try {
+      const response = await fetch(
+        `${BACKEND_URL}/api/chat/${matchId}/messages?before=${encodeURIComponent(beforeCursor)}`,
+        { credentials: 'include' }
+      );
+      if (response.ok) {
+        const data = await response.json();
+        setMessages(prev => [...data.messages, ...prev]);
+        setBeforeCursor(data.before_cursor);
+      }
+    } catch (error) {
+      console.error('Error fetching earlier messages:', error);
+      toast.error('Failed to load earlier messages');
+    } finally {
+      setLoadingEarlier(false);
+    }
+  };
+
   const handleSendMessage = async (e) => {
     e.preventDefault();
     if (!newMessage.trim() || sending) return;
@@ -99,7 +173,7 @@ function Chat() {
       }
 
       setNewMessage('');
-      fetchMessages();
+      appendMessages([await response.json()]);
     } catch (error) {
       console.error('Error sending message:', error);
       toast.error('Failed to send message');
@@ -111,7 +185,7 @@ function Chat() {
   const handleGeneratePitch = async () => {
     setGeneratingPitch(true);
     try {
-      const response = await fetch(`${BACKEND_URL}/api/ai/generate-pitch`, {
+      const response = await fetch(`${BACKEND_URL}/api/ai/generate-pitch/stream`, {
         method: 'POST',
         headers: {
           'Content-Type': 'application/json'
@@ -124,8 +198,33 @@ function Chat() {
         throw new Error('Failed to generate pitch');
       }
 
-      const data = await response.json();
-      setNewMessage(data.pitch);
+      // Server-sent events: "delta" per chunk, then "done" or "error"
+      const reader = response.body.getReader();
+      const decoder = new TextDecoder();
+      let buffer = '';
+      let pitch = '';
+      setNewMessage('');
+
+      for (;;) {
+        const { done, value } = await reader.read();
+        if (done) break;
+        buffer += decoder.decode(value, { stream: true });
+
+        const events = buffer.split('\n\n');
+        buffer = events.pop();
+        for (const block of events) {
+          const fields = Object.fromEntries(
+            block.split('\n').map((line) => [line.slice(0, line.indexOf(': ')), line.slice(line.indexOf(': ') + 2)])
+          );
+          const data = JSON.parse(fields.data);
+          if (fields.event === 'error') {
+            throw new Error(data.detail);
+          }
+          pitch = fields.event === 'done' ? data.pitch : pitch + data.text;
+          setNewMessage(pitch);
+        }
+      }
+
       toast.success('AI pitch generated!');
     } catch (error) {
       console.error('Error generating pitch:', error);
@@ -174,26 +273,42 @@ function Chat() {
             </Button>
           </div>
         ) : (
-          messages.map((message) => (
-            <div
-              key={message.message_id}
-              className={`flex ${message.sender_id === user?.user_id ? 'justify-end' : 'justify-start'}`}
-            >
+          <>
+            {beforeCursor && (
+              <div className="flex justify-center">
+                <Button
+                  onClick={loadEarlier}
+                  disabled={loadingEarlier}
+                  variant="outline"
+                  size="sm"
+                  className="rounded-full"
+                  data-testid="load-earlier-messages-btn"
+                >
+                  {loadingEarlier ? 'Loading...' : 'Load earlier messages'}
+                </Button>
+              </div>
+            )}
+            {messages.map((message) => (
               <div
-                className={`max-w-[80%] rounded-2xl p-4 ${
-                  message.sender_id === user?.user_id
-                    ? 'bg-zinc-950 text-white rounded-tr-sm'
-                    : 'bg-white text-zinc-900 rounded-tl-sm border border-zinc-100'
-                }`}
-                data-testid={`message-${message.message_id}`}
+                key={message.message_id}
+                className={`flex ${message.sender_id === user?.user_id ? 'justify-end' : 'justify-start'}`}
               >
-                <p className="leading-relaxed whitespace-pre-wrap break-words">{message.content}</p>
-                <p className="text-xs opacity-60 mt-1">
-                  {new Date(message.created_at).toLocaleTimeString([], { hour: '2-digit', minute: '2-digit' })}
-                </p>
+                <div
+                  className={`max-w-[80%] rounded-2xl p-4 ${
+                    message.sender_id === user?.user_id
+                      ? 'bg-zinc-950 text-white rounded-tr-sm'
+                      : 'bg-white text-zinc-900 rounded-tl-sm border border-zinc-100'
+                  }`}
+                  data-testid={`message-${message.message_id}`}
+                >
+                  <p className="leading-relaxed whitespace-pre-wrap break-words">{message.content}</p>
+                  <p className="text-xs opacity-60 mt-1">
+                    {new Date(message.created_at).toLocaleTimeString([], { hour: '2-digit', minute: '2-digit' })}
+                  </p>
+                </div>
               </div>
-            </div>
-          ))
+            ))}
+          </>
         )}
         <div ref={messagesEndRef} />
       </div>
@@ -257,6 +257,7 @@ function DataMapping() {
                     <div className="bg-zinc-50 p-3 rounded font-mono text-sm">GET /api/discover</div>
                     <div className="bg-zinc-50 p-3 rounded font-mono text-sm">POST /api/swipe</div>
                     <div className="bg-zinc-50 p-3 rounded font-mono text-sm">GET /api/matches</div>
+                    <div className="bg-zinc-50 p-3 rounded font-mono text-sm">GET /api/matches/{'{match_id}'}</div>
                   </div>
                 </div>
 
@@ -268,7 +269,9 @@ function DataMapping() {
                   <div className="space-y-2">
                     <div className="bg-zinc-50 p-3 rounded font-mono text-sm">GET /api/chat/{'{match_id}'}/messages</div>
                     <div className="bg-zinc-50 p-3 rounded font-mono text-sm">POST /api/chat/{'{match_id}'}/messages</div>
+                    <div className="bg-zinc-50 p-3 rounded font-mono text-sm">WS /api/chat/{'{match_id}'}/ws</div>
                     <div className="bg-zinc-50 p-3 rounded font-mono text-sm">POST /api/ai/generate-pitch</div>
+                    <div className="bg-zinc-50 p-3 rounded font-mono text-sm">POST /api/ai/generate-pitch/stream</div>
                   </div>
                 </div>
 
@@ -281,6 +284,8 @@ function DataMapping() {
                     <div className="bg-zinc-50 p-3 rounded font-mono text-sm">GET /api/subscription/status</div>
                     <div className="bg-zinc-50 p-3 rounded font-mono text-sm">POST /api/subscription/checkout</div>
                     <div className="bg-zinc-50 p-3 rounded font-mono text-sm">GET /api/admin/stats</div>
+                    <div className="bg-zinc-50 p-3 rounded font-mono text-sm">GET /api/admin/users</div>
+                    <div className="bg-zinc-50 p-3 rounded font-mono text-sm">GET /api/admin/export/{'{collection}'}</div>
                     <div className="bg-zinc-50 p-3 rounded font-mono text-sm">POST /api/admin/train-model</div>
                   </div>
                 </div>
@@ -8,31 +8,44 @@ const BACKEND_URL = process.env.REACT_APP_BACKEND_URL;
 
 function Matches() {
   const [matches, setMatches] = useState([]);
+  const [nextCursor, setNextCursor] = useState(null);
   const [loading, setLoading] = useState(true);
+  const [loadingMore, setLoadingMore] = useState(false);
   const navigate = useNavigate();
 
   useEffect(() => {
     fetchMatches();
   }, []);
 
-  const fetchMatches = async () => {
+  const fetchMatches = async (cursor = null) => {
+    const url = cursor
+      ? `${BACKEND_URL}/api/matches?cursor=${encodeURIComponent(cursor)}`
+      : `${BACKEND_URL}/api/matches`;
+
     try {
-      const response = await fetch(`${BACKEND_URL}/api/matches`, {
+      const response = await fetch(url, {
         credentials: 'include'
       });
 
       if (response.ok) {
         const data = await response.json();
-        setMatches(data);
+        setMatches(prev => cursor ? [...prev, ...data.matches] : data.matches);
+        setNextCursor(data.next_cursor);
       }
     } catch (error) {
       console.error('Error fetching matches:', error);
       toast.error('Failed to load matches');
     } finally {
       setLoading(false);
+      setLoadingMore(false);
     }
   };
 
+  const loadMore = () => {
+    setLoadingMore(true);
+    fetchMatches(nextCursor);
+  };
+
   if (loading) {
     return (
       <div className="min-h-screen flex items-center justify-center bg-stone-50">
@@ -46,7 +59,7 @@ function Matches() {
       <div className="max-w-2xl mx-auto px-6 py-8">
         <div className="mb-8">
           <h1 className="text-3xl font-bold font-heading text-zinc-950 mb-2">Your Matches</h1>
-          <p className="text-zinc-600">{matches.length} connections</p>
+          <p className="text-zinc-600">{matches.length}{nextCursor ? '+' : ''} connections</p>
         </div>
 
         {matches.length === 0 ? (
@@ -111,6 +124,20 @@ function Matches() {
                 </div>
               </div>
             ))}
+
+            {nextCursor && (
+              <div className="text-center pt-2">
+                <Button
+                  onClick={loadMore}
+                  disabled={loadingMore}
+                  variant="outline"
+                  className="rounded-full px-8"
+                  data-testid="load-more-matches-btn"
+                >
+                  {loadingMore ? 'Loading...' : 'Load more'}
+                </Button>
+              </div>
+            )}
           </div>
         )}
       </div>
@@ -0,0 +1,81 @@
+import sys
+import os
+sys.path.append(os.path.dirname(os.path.dirname(__file__)))
+
+import argparse
+import time
+import numpy as np
+import torch
+from backend.ml_models.collaborative_filter import NeuralCollaborativeFiltering, CollaborativeFilterTrainer
+
+
+def legacy_train_epoch(trainer, train_data, batch_size=128):
+    """Previous train_epoch: shuffle a list of tuples and build tensors per batch"""
+    trainer.model.train()
+    total_loss = 0.0
+    num_batches = 0
+
+    np.random.shuffle(train_data)
+
+    for i in range(0, len(train_data), batch_size):
+        batch = train_data[i:i+batch_size]
+
+        user_ids = torch.tensor([x[0] for x in batch], dtype=torch.long).to(trainer.device)
+        item_ids = torch.tensor([x[1] for x in batch], dtype=torch.long).to(trainer.device)
+        labels = torch.tensor([x[2] for x in batch], dtype=torch.float32).to(trainer.device)
+
+        predictions = trainer.model(user_ids, item_ids)
+        loss = trainer.criterion(predictions, labels)
+
+        trainer.optimizer.zero_grad()
+        loss.backward()
+        trainer.optimizer.step()
+
+        total_loss += loss.item()
+        num_batches += 1
+
+    return total_loss / num_batches if num_batches > 0 else 0.0
+
+
+def make_trainer(num_users, num_items):
+    torch.manual_seed(0)
+    model = NeuralCollaborativeFiltering(num_users=num_users, num_items=num_items)
+    return CollaborativeFilterTrainer(model)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Compare training throughput of the list and tensor data paths")
+    parser.add_argument("--samples", type=int, default=200000)
+    parser.add_argument("--users", type=int, default=5000)
+    parser.add_argument("--items", type=int, default=5000)
+    parser.add_argument("--batch-size", type=int, default=1024)
+    parser.add_argument("--epochs", type=int, default=2)
+    args = parser.parse_args()
+
+    rng = np.random.default_rng(0)
+    user_idx = rng.integers(0, args.users, args.samples)
+    item_idx = rng.integers(0, args.items, args.samples)
+    labels = (rng.random(args.samples) > 0.3).astype(np.float32)
+
+    # Legacy path: Python list of (user_idx, item_idx, label) tuples
+    rows = list(zip(user_idx.tolist(), item_idx.tolist(), labels.tolist()))
+    trainer = make_trainer(args.users, args.items)
+    start = time.perf_counter()
+    for _ in range(args.epochs):
+        legacy_train_epoch(trainer, rows, args.batch_size)
+    legacy_rate = args.samples * args.epochs / (time.perf_counter() - start)
+
+    # Tensor path: columnar tensors built once, permutation-sliced batches
+    columns = (torch.from_numpy(user_idx), torch.from_numpy(item_idx), torch.from_numpy(labels))
+    trainer = make_trainer(args.users, args.items)
+    start = time.perf_counter()
+    trainer.train(columns, epochs=args.epochs, batch_size=args.batch_size)
+    tensor_rate = args.samples * args.epochs / (time.perf_counter() - start)
+
+    print(f"samples={args.samples} batch_size={args.batch_size} epochs={args.epochs}")
+    print(f"legacy list path:     {legacy_rate:,.0f} samples/sec")
+    print(f"columnar tensor path: {tensor_rate:,.0f} samples/sec ({tensor_rate / legacy_rate:.1f}x)")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,34 @@
+import sys
+import os
+sys.path.append(os.path.dirname(os.path.dirname(__file__)))
+
+import asyncio
+from pathlib import Path
+from dotenv import load_dotenv
+from motor.motor_asyncio import AsyncIOMotorClient
+from backend.db_setup import migrate_timestamps
+import logging
+
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger(__name__)
+
+async def run_migration():
+    """Convert ISO string timestamps to BSON datetimes, once per database
+
+    Run after deploying over a database written with ISO strings; the API
+    workers only create indexes at startup.
+    """
+
+    # Connect with the backend's settings
+    load_dotenv(Path(__file__).parent.parent / 'backend' / '.env')
+    client = AsyncIOMotorClient(os.environ['MONGO_URL'])
+    db = client[os.environ['DB_NAME']]
+
+    converted = await migrate_timestamps(db)
+    if not converted:
+        logger.info("Timestamp migration already recorded, nothing to do")
+
+    client.close()
+
+if __name__ == "__main__":
+    asyncio.run(run_migration())
@@ -318,7 +318,7 @@ async def populate_demo_data():
             "subscription_tier": "free",
             "swipes_today": 0,
             "swipes_reset_at": None,
-            "created_at": datetime.now(timezone.utc).isoformat()
+            "created_at": datetime.now(timezone.utc)
         }
         await db.users.insert_one(user)
         
@@ -340,8 +340,8 @@ async def populate_demo_data():
                 "apple": f"https://podcasts.apple.com/{user_id}",
                 "youtube": ""
             },
-            "created_at": datetime.now(timezone.utc).isoformat(),
-            "updated_at": datetime.now(timezone.utc).isoformat()
+            "created_at": datetime.now(timezone.utc),
+            "updated_at": datetime.now(timezone.utc)
         }
         await db.profiles.insert_one(profile)
         print(f"  ✅ Created host: {host_data['name']} - {host_data['podcast_name']}")
@@ -361,7 +361,7 @@ async def populate_demo_data():
             "subscription_tier": "free",
             "swipes_today": 0,
             "swipes_reset_at": None,
-            "created_at": datetime.now(timezone.utc).isoformat()
+            "created_at": datetime.now(timezone.utc)
         }
         await db.users.insert_one(user)
         
@@ -381,8 +381,8 @@ async def populate_demo_data():
                 "website": f"https://{guest_data['name'].lower().replace(' ', '')}.com"
             },
             "remote_recording": guest_data["remote_recording"],
-            "created_at": datetime.now(timezone.utc).isoformat(),
-            "updated_at": datetime.now(timezone.utc).isoformat()
+            "created_at": datetime.now(timezone.utc),
+            "updated_at": datetime.now(timezone.utc)
         }
         await db.profiles.insert_one(profile)
         print(f"  ✅ Created guest: {guest_data['name']} - {', '.join(guest_data['expertise'][:2])}")
@@ -5,6 +5,7 @@ sys.path.append(os.path.dirname(os.path.dirname(__file__)))
 import asyncio
 from motor.motor_asyncio import AsyncIOMotorClient
 from backend.ml_models.collaborative_filter import PodcastRecommender
+from backend.ml_models.recommendation_index import rebuild_recommendation_index
 import logging
 
 logging.basicConfig(level=logging.INFO)
@@ -65,6 +66,10 @@ async def train_collaborative_model():
     
     logger.info("Model training completed!")
     
+    # Precompute per-user rankings for /discover
+    users_indexed = await rebuild_recommendation_index(db, recommender)
+    logger.info(f"Recommendation index built for {users_indexed} users")
+    
     # Test recommendation
     if swipes:
         test_user_id = swipes[0]['swiper_id']
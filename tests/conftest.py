@@ -0,0 +1,5 @@
+import sys
+from pathlib import Path
+
+# The backend is run from its own directory (`uvicorn server:app`), mirror that for imports
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent / "backend"))
@@ -0,0 +1,37 @@
+import asyncio
+from datetime import datetime, timezone
+
+import pytest
+from fastapi import HTTPException
+
+from admin_export import build_export_query, stream_ndjson
+
+mongomock_motor = pytest.importorskip("mongomock_motor")
+
+
+def test_export_query_validates_filters_and_fields():
+    query, projection = build_export_query("users", {"role": "host", "profile_completed": "false"}, "user_id, email")
+    assert query == {"role": "host", "profile_completed": False}
+    assert projection == {"_id": 0, "user_id": 1, "email": 1}
+
+    for collection, params, fields in [
+        ("user_sessions", {}, None),
+        ("users", {"session_token": "x"}, None),
+        ("users", {"profile_completed": "yes"}, None),
+        ("users", {}, "$where")
+    ]:
+        with pytest.raises(HTTPException):
+            build_export_query(collection, params, fields)
+
+
+def test_stream_ndjson_yields_one_chunk_per_batch():
+    db = mongomock_motor.AsyncMongoMockClient(tz_aware=True)["test_database"]
+    created_at = datetime(2026, 1, 1, tzinfo=timezone.utc)
+
+    async def run():
+        await db.swipes.insert_many([{"swipe_id": f"swipe_{i}", "created_at": created_at} for i in range(5)])
+        return [chunk async for chunk in stream_ndjson(db.swipes.find({}, {"_id": 0}), batch_size=2)]
+
+    chunks = asyncio.run(run())
+    assert [chunk.count("\n") for chunk in chunks] == [2, 2, 1]
+    assert chunks[0].splitlines()[0] == '{"swipe_id": "swipe_0", "created_at": "2026-01-01T00:00:00+00:00"}'
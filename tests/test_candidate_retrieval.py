@@ -0,0 +1,85 @@
+import asyncio
+from datetime import datetime, timedelta, timezone
+
+import pytest
+
+from candidate_retrieval import BloomFilter, SwipeExclusions
+
+mongomock_motor = pytest.importorskip("mongomock_motor")
+
+START = datetime(2026, 1, 1, tzinfo=timezone.utc)
+
+
+def make_db():
+    return mongomock_motor.AsyncMongoMockClient(tz_aware=True)["test_database"]
+
+
+def test_bloom_filter_has_no_false_negatives():
+    bloom = BloomFilter(capacity=1000, error_rate=0.01)
+    for i in range(1000):
+        bloom.add(f"user_{i}")
+
+    assert all(f"user_{i}" in bloom for i in range(1000))
+    false_positives = sum(f"other_{i}" in bloom for i in range(10000))
+    assert false_positives < 300  # ~1% expected
+
+
+def test_exclusions_cover_long_swipe_histories():
+    db = make_db()
+    exclusions = SwipeExclusions(capacity=64)
+    swipes = [
+        {"swiper_id": "host_1", "swiped_id": f"guest_{i}", "created_at": START + timedelta(seconds=i % 60)}
+        for i in range(1500)
+    ]
+    candidates = [f"guest_{i}" for i in range(1600)]
+
+    async def run():
+        await db.swipes.insert_many(swipes)
+        first = await exclusions.filter_unswiped(db, "host_1", candidates, limit=50)
+
+        # A swipe written by another worker is picked up by the watermark catch-up
+        await db.swipes.insert_one(
+            {"swiper_id": "host_1", "swiped_id": "guest_1500", "created_at": START + timedelta(minutes=1)}
+        )
+        second = await exclusions.filter_unswiped(db, "host_1", candidates, limit=50)
+        return first, second
+
+    first, second = asyncio.run(run())
+    assert len(first) == 50
+    assert set(first) <= {f"guest_{i}" for i in range(1500, 1600)}
+    assert "guest_1500" not in second
+    assert all(int(c.split("_")[1]) > 1500 for c in second)
+
+
+def test_false_positives_are_recovered_by_exact_check():
+    db = make_db()
+    exclusions = SwipeExclusions()
+
+    async def run():
+        await db.swipes.insert_one(
+            {"swiper_id": "host_1", "swiped_id": "guest_0", "created_at": START}
+        )
+        bloom = await exclusions.get(db, "host_1")
+        # Force every candidate to look swiped
+        bloom.bits[:] = b"\xff" * len(bloom.bits)
+        return await exclusions.filter_unswiped(db, "host_1", ["guest_0", "guest_1", "guest_2"], min_results=2)
+
+    assert asyncio.run(run()) == ["guest_1", "guest_2"]
+
+
+def test_repeated_catch_ups_do_not_grow_the_filter():
+    db = make_db()
+    exclusions = SwipeExclusions(capacity=8)
+
+    async def run():
+        await db.swipes.insert_one({"swiper_id": "host_1", "swiped_id": "guest_0", "created_at": START})
+        exclusions.record("host_1", "guest_0")
+        first = await exclusions.get(db, "host_1")
+        sizes = (first.count, first.capacity)
+        for _ in range(40):
+            bloom = await exclusions.get(db, "host_1")
+        return sizes, bloom
+
+    sizes, bloom = asyncio.run(run())
+    assert sizes == (1, 8)
+    assert (bloom.count, bloom.capacity) == (1, 8)
@@ -0,0 +1,74 @@
+import asyncio
+from datetime import datetime, timezone
+
+import pytest
+
+from chat_broker import InProcessBroker, MongoPollingBroker, create_broker
+
+mongomock_motor = pytest.importorskip("mongomock_motor")
+
+
+def make_message(message_id, match_id="match_1"):
+    return {
+        "message_id": message_id,
+        "match_id": match_id,
+        "sender_id": "user_1",
+        "content": message_id,
+        "created_at": datetime.now(timezone.utc)
+    }
+
+
+def test_in_process_broker_fans_out_per_match():
+    broker = InProcessBroker(max_queue=2)
+
+    async def run():
+        first, second = broker.subscribe("match_1"), broker.subscribe("match_1")
+        other = broker.subscribe("match_2")
+
+        await broker.publish(make_message("msg_1"))
+        received = [(await first.get())["message_id"], (await second.get())["message_id"]]
+
+        broker.unsubscribe(second)
+        for i in range(3):
+            await broker.publish(make_message(f"msg_{i + 2}"))
+
+        return received, other._queue.qsize(), second._queue.qsize(), await first.get()
+
+    received, other_pending, second_pending, overflowed = asyncio.run(run())
+    assert received == ["msg_1", "msg_1"]
+    assert other_pending == 0
+    assert second_pending == 0
+    # A subscriber that falls too far behind is cut off rather than buffered
+    assert overflowed is None
+
+
+def test_polling_broker_delivers_messages_from_other_workers_once():
+    db = mongomock_motor.AsyncMongoMockClient(tz_aware=True)["test_database"]
+    broker = MongoPollingBroker(db, poll_interval=0.01)
+
+    async def run():
+        subscription = broker.subscribe("match_1")
+        await broker.start()
+
+        local = make_message("msg_local")
+        await db.chat_messages.insert_one(dict(local))
+        await broker.publish(local)
+        # Stored by another worker, never published here
+        await db.chat_messages.insert_one(make_message("msg_remote"))
+
+        received = [await asyncio.wait_for(subscription.get(), 1) for _ in range(2)]
+        # Later polls re-read the overlap window without delivering again
+        await broker.poll()
+        pending = subscription._queue.qsize()
+        await broker.stop()
+        return [m["message_id"] for m in received], pending
+
+    received, pending = asyncio.run(run())
+    assert received == ["msg_local", "msg_remote"]
+    assert pending == 0
+
+
+def test_create_broker_rejects_unknown_kind():
+    assert type(create_broker("memory", None)) is InProcessBroker
+    with pytest.raises(ValueError):
+        create_broker("redis", None)
@@ -0,0 +1,32 @@
+import asyncio
+
+from checkout_status import CheckoutStatusCache
+
+
+def test_coalesces_concurrent_calls_and_expires_entries():
+    calls = []
+
+    async def fetch(session_id):
+        calls.append(session_id)
+        await asyncio.sleep(0.02)
+        return f"{session_id}:{len(calls)}"
+
+    cache = CheckoutStatusCache(fetch, ttl=0.05, max_size=1)
+
+    async def run():
+        first = await asyncio.gather(*(cache.get("cs_1") for _ in range(4)))
+        cached = await cache.get("cs_1")
+        await asyncio.sleep(0.06)
+        expired = await cache.get("cs_1")
+        # The second session evicts the first from a size-1 cache
+        other = await cache.get("cs_2")
+        evicted = await cache.get("cs_1")
+        return first, cached, expired, other, evicted
+
+    first, cached, expired, other, evicted = asyncio.run(run())
+    assert first == ["cs_1:1"] * 4
+    assert cached == "cs_1:1"
+    assert expired == "cs_1:2"
+    assert other == "cs_2:3"
+    assert evicted == "cs_1:4"
+    assert cache.stats() == {"hits": 1, "misses": 4, "joined": 3, "cached": 1, "in_flight": 0}
@@ -0,0 +1,299 @@
+import asyncio
+import random
+import shutil
+import subprocess
+import sys
+import threading
+import time
+from pathlib import Path
+
+import numpy as np
+import pytest
+import torch
+
+from ml_models.collaborative_filter import PodcastRecommender
+from ml_models.inference_batcher import InferenceBatcher
+from ml_models.serving import ServingRecommender
+from ml_models.training_jobs import TrainingJobManager
+
+
+def make_swipes(num_hosts=6, num_guests=15, seed=0):
+    rng = random.Random(seed)
+    swipes = []
+    for h in range(num_hosts):
+        for g in rng.sample(range(num_guests), 8):
+            swipes.append({
+                "swiper_id": f"host_{h}",
+                "swiped_id": f"guest_{g}",
+                "direction": "right" if rng.random() > 0.3 else "left"
+            })
+    return swipes
+
+
+@pytest.fixture(params=["mlp", "two_tower"])
+def trained_recommender(request, tmp_path):
+    torch.manual_seed(0)
+    recommender = PodcastRecommender(model_path=str(tmp_path / "cf_model.pt"), model_mode=request.param)
+    recommender.train_model(make_swipes(), epochs=2)
+    return recommender
+
+
+def test_rank_catalog_matches_live_recommend(trained_recommender):
+    users = [f"host_{h}" for h in range(6)] + ["host_unknown"]
+    catalog = [f"guest_{g}" for g in range(15)] + ["guest_new"]
+
+    rankings = trained_recommender.rank_catalog(users, catalog, top_k=len(catalog), max_pairs_per_batch=40)
+
+    assert "host_unknown" not in rankings
+    for user_id in users[:-1]:
+        live = trained_recommender.recommend(user_id, catalog, top_k=len(catalog))
+        # Compare per-item scores; near-ties may legitimately order differently
+        assert dict(rankings[user_id]) == pytest.approx(dict(live), abs=1e-5)
+        assert rankings[user_id][-1] == ("guest_new", 0.5)
+
+
+def test_checkpoint_records_version_and_mode(trained_recommender):
+    # The checkpoint's mode wins over the constructor default when loading
+    reloaded = PodcastRecommender(model_path=str(trained_recommender.model_path))
+
+    assert reloaded.model_version == trained_recommender.model_version
+    assert reloaded.model.mode == trained_recommender.model_mode
+    assert reloaded.supports_full_catalog == (trained_recommender.model_mode == "two_tower")
+
+    catalog = [f"guest_{g}" for g in range(15)]
+    assert reloaded.recommend("host_0", catalog, top_k=5) == pytest.approx(
+        trained_recommender.recommend("host_0", catalog, top_k=5)
+    )
+
+
+def test_incremental_training_keeps_ids_and_grows_tables(tmp_path):
+    torch.manual_seed(0)
+    recommender = PodcastRecommender(model_path=str(tmp_path / "cf_model.pt"))
+    history = make_swipes()
+    for i, swipe in enumerate(history):
+        swipe["created_at"] = f"2026-01-01T00:{i // 60:02d}:{i % 60:02d}+00:00"
+    recommender.train_model(history, epochs=1)
+
+    user_map, item_map = dict(recommender.user_id_map), dict(recommender.item_id_map)
+    watermark = recommender.trained_until
+
+    new_swipes = [
+        {"swiper_id": "host_new", "swiped_id": "guest_0", "direction": "right", "created_at": "2026-01-02T00:00:00+00:00"},
+        {"swiper_id": "host_0", "swiped_id": "guest_new", "direction": "left", "created_at": "2026-01-02T00:00:01+00:00"},
+    ]
+    warm = PodcastRecommender(model_path=str(recommender.model_path))
+    warm.train_model(history + new_swipes, epochs=1, incremental=True)
+
+    assert {k: warm.user_id_map[k] for k in user_map} == user_map
+    assert {k: warm.item_id_map[k] for k in item_map} == item_map
+    assert warm.user_id_map["host_new"] == len(user_map)
+    assert warm.item_id_map["guest_new"] == len(item_map)
+    assert warm.model.num_users == len(user_map) + 1
+    assert warm.model.num_items == len(item_map) + 1
+    assert warm.trained_until > watermark
+
+    # Nothing newer than the watermark: no retrain, no new version
+    version = warm.model_version
+    warm.train_model(history + new_swipes, epochs=1, incremental=True)
+    assert warm.model_version == version
+
+
+def make_job_collection():
+    mongomock_motor = pytest.importorskip("mongomock_motor")
+    return mongomock_motor.AsyncMongoMockClient(tz_aware=True)["test_database"].training_jobs
+
+
+def test_training_job_runs_in_worker_and_swaps_model(tmp_path):
+    serving = PodcastRecommender(model_path=str(tmp_path / "cf_model.pt"))
+    manager = TrainingJobManager(serving, make_job_collection(), progress_interval=0.05)
+    completed = []
+
+    async def on_complete():
+        completed.append(serving.model_version)
+        return "indexed"
+
+    async def failing_rebuild():
+        raise RuntimeError("index rebuild failed")
+
+    async def run():
+        job = await manager.submit(make_swipes(), epochs=2, on_complete=on_complete)
+        assert job["status"] == "queued"
+        await manager._tasks[job["job_id"]]
+        first = await manager.get(job["job_id"])
+
+        job = await manager.submit(make_swipes(seed=1), epochs=1, on_complete=failing_rebuild)
+        await manager._tasks[job["job_id"]]
+        return first, await manager.get(job["job_id"])
+
+    try:
+        job, rebuilt_badly = asyncio.run(run())
+    finally:
+        manager.shutdown()
+
+    assert job["status"] == "completed", job["error"]
+    assert job["epoch"] == 2 and job["loss"] is not None and job["elapsed"] > 0
+    assert job["result"] == "indexed" and job["rebuild_error"] is None
+    # The serving instance picked up the worker's checkpoint before on_complete ran
+    assert serving.model is not None
+    assert completed == [job["model_version"]]
+
+    # A failed rebuild is reported, but the new model is live and the job completed
+    assert rebuilt_badly["status"] == "completed"
+    assert rebuilt_badly["rebuild_error"] == "index rebuild failed"
+    assert rebuilt_badly["model_version"] == serving.model_version != job["model_version"]
+
+
+def test_training_jobs_are_shared_and_serialized_across_workers(tmp_path):
+    # Two managers on one collection stand in for two uvicorn workers
+    jobs = make_job_collection()
+    model_path = str(tmp_path / "cf_model.pt")
+    first = TrainingJobManager(PodcastRecommender(model_path=model_path), jobs, progress_interval=0.05)
+    second = TrainingJobManager(PodcastRecommender(model_path=model_path), jobs, progress_interval=0.05)
+
+    async def run():
+        running = await first.submit(make_swipes(), epochs=2)
+        waiting = await second.submit(make_swipes(seed=1), epochs=2)
+        # Either worker can report on a job the other accepted
+        assert (await second.get(running["job_id"]))["swipes_used"] == running["swipes_used"]
+
+        await asyncio.gather(first._tasks[running["job_id"]], second._tasks[waiting["job_id"]])
+        return (await first.get(running["job_id"]), await first.get(waiting["job_id"]),
+                await jobs.find_one({"_id": TrainingJobManager.LOCK_ID}))
+
+    try:
+        running, waiting, lock = asyncio.run(run())
+    finally:
+        first.shutdown()
+        second.shutdown()
+
+    assert running["status"] == waiting["status"] == "completed"
+    # Whichever job claimed the lock first, the other only started once it was released
+    earlier, later = sorted([running, waiting], key=lambda job: job["started_at"])
+    assert later["started_at"] >= earlier["finished_at"]
+    assert lock["job_id"] is None
+
+
+def test_versioned_checkpoints_hot_reload_and_rollback(tmp_path):
+    model_path = str(tmp_path / "cf_model.pt")
+    trainer = PodcastRecommender(model_path=model_path)
+    trainer.train_model(make_swipes(seed=0), epochs=1)
+    first_version = trainer.model_version
+
+    worker = PodcastRecommender(model_path=model_path)
+    assert worker.model_version == first_version
+    assert worker.reload_if_changed() is False
+
+    trainer.train_model(make_swipes(seed=1), epochs=1)
+    second_version = trainer.model_version
+    assert worker.reload_if_changed() is True
+    assert worker.model_version == second_version
+
+    manifest = worker.read_manifest()
+    assert manifest["current"] == second_version
+    assert [v["version"] for v in manifest["versions"]] == [first_version, second_version]
+
+    worker.rollback(first_version)
+    assert worker.model_version == first_version
+    assert trainer.reload_if_changed() is True
+    assert trainer.model_version == first_version
+
+    with pytest.raises(ValueError):
+        worker.rollback("missing")
+
+
+def test_concurrent_manifest_updates_keep_every_version(tmp_path):
+    # Separate instances open the lock file separately, like separate workers do
+    model_path = str(tmp_path / "cf_model.pt")
+    writers = [ServingRecommender(model_path=model_path) for _ in range(8)]
+
+    def publish(writer, version):
+        def add_version(manifest):
+            entries = manifest["versions"]
+            time.sleep(0.01)  # Widen the read-modify-write window
+            manifest["versions"] = entries + [{"version": version}]
+            manifest["current"] = version
+
+        writer.update_manifest(add_version)
+
+    threads = [threading.Thread(target=publish, args=(writer, f"v{i}")) for i, writer in enumerate(writers)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+    manifest = writers[0].read_manifest()
+    assert sorted(v["version"] for v in manifest["versions"]) == sorted(f"v{i}" for i in range(8))
+    assert manifest["current"] == manifest["versions"][-1]["version"]
+
+
+def test_inference_batcher_coalesces_concurrent_requests(trained_recommender):
+    batcher = InferenceBatcher(trained_recommender, max_batch_size=8, max_wait_ms=20)
+    catalog = [f"guest_{g}" for g in range(15)] + ["guest_new"]
+    requests = [(f"host_{i % 7}" if i % 7 < 6 else "host_unknown", catalog[i % 5:], 5) for i in range(20)]
+
+    async def run():
+        return await asyncio.gather(*(batcher.recommend(*request) for request in requests))
+
+    results = asyncio.run(run())
+
+    for request, result in zip(requests, results):
+        expected = trained_recommender.recommend(*request)
+        assert dict(result) == pytest.approx(dict(expected), abs=1e-6)
+
+    stats = batcher.stats()
+    assert stats["total_requests"] == 20
+    assert stats["total_batches"] == 3
+    assert stats["batch_size_histogram"] == {"<=8": 2, "<=4": 1}
+    assert sum(stats["queue_depth_histogram"].values()) == 20
+
+
+@pytest.mark.parametrize("inference_mode,tolerance", [("optimized", 1e-5), ("quantized", 0.05)])
+def test_optimized_inference_matches_eager(trained_recommender, inference_mode, tolerance):
+    optimized = PodcastRecommender(model_path=str(trained_recommender.model_path), inference_mode=inference_mode)
+    catalog = [f"guest_{g}" for g in range(15)]
+
+    for h in range(6):
+        eager_scores = dict(trained_recommender.recommend(f"host_{h}", catalog, top_k=len(catalog)))
+        optimized_scores = dict(optimized.recommend(f"host_{h}", catalog, top_k=len(catalog)))
+        assert optimized_scores == pytest.approx(eager_scores, abs=tolerance)
+
+
+def test_serving_recommender_matches_torch_and_loads_lazily(trained_recommender):
+    serving = ServingRecommender(model_path=str(trained_recommender.model_path))
+    assert serving.model is None
+
+    users = [f"host_{h}" for h in range(6)]
+    catalog = [f"guest_{g}" for g in range(15)] + ["guest_new"]
+
+    for user_id in users:
+        expected = dict(trained_recommender.recommend(user_id, catalog, top_k=len(catalog)))
+        assert dict(serving.recommend(user_id, catalog, top_k=len(catalog))) == pytest.approx(expected, abs=1e-5)
+
+    assert serving.model_version == trained_recommender.model_version
+    assert isinstance(serving.model.user_embedding, np.memmap)
+    assert serving.supports_full_catalog == trained_recommender.supports_full_catalog
+
+    rankings = serving.rank_catalog(users, catalog, top_k=5)
+    expected = trained_recommender.rank_catalog(users, catalog, top_k=5)
+    for user_id in users:
+        assert dict(rankings[user_id]) == pytest.approx(dict(expected[user_id]), abs=1e-5)
+
+    # A checkpoint saved without an export is converted on load
+    export_path = serving.serving_path(serving.model_version)
+    shutil.rmtree(export_path)
+    converted = ServingRecommender(model_path=str(trained_recommender.model_path))
+    converted.ensure_loaded()
+    assert export_path.exists()
+    assert converted.model_version == trained_recommender.model_version
+
+
+def test_serving_stack_imports_without_torch():
+    code = (
+        "import sys\n"
+        "import ml_models\n"
+        "from ml_models import recommender\n"
+        "recommender.ensure_loaded()\n"
+        "assert 'torch' not in sys.modules\n"
+    )
+    backend = Path(__file__).resolve().parent.parent / "backend"
+    subprocess.run([sys.executable, "-c", code], cwd=backend, check=True)
@@ -0,0 +1,55 @@
+import asyncio
+from datetime import datetime, timezone
+
+import pytest
+
+from db_setup import ensure_indexes, migrate_timestamps
+
+mongomock_motor = pytest.importorskip("mongomock_motor")
+
+
+def make_db():
+    return mongomock_motor.AsyncMongoMockClient(tz_aware=True)["test_database"]
+
+
+def test_migrate_timestamps_converts_iso_strings_once():
+    db = make_db()
+
+    async def run():
+        await db.users.insert_many([
+            {"user_id": "user_1", "created_at": "2026-01-01T10:00:00+00:00", "swipes_reset_at": None},
+            {"user_id": "user_2", "created_at": "2026-01-02T10:00:00", "swipes_reset_at": "not a date"}
+        ])
+        await db.swipes.insert_one({"swipe_id": "swipe_1", "created_at": datetime(2026, 1, 3, tzinfo=timezone.utc)})
+
+        converted = await migrate_timestamps(db)
+        users = {u["user_id"]: u async for u in db.users.find({}, {"_id": 0})}
+
+        await db.users.insert_one({"user_id": "user_3", "created_at": "2026-01-04T10:00:00+00:00"})
+        return converted, users, await migrate_timestamps(db)
+
+    converted, users, second_run = asyncio.run(run())
+
+    assert converted["users"] == 2
+    assert converted["swipes"] == 0
+    assert users["user_1"]["created_at"] == datetime(2026, 1, 1, 10, tzinfo=timezone.utc)
+    assert users["user_1"]["swipes_reset_at"] is None
+    # Naive strings are taken as UTC, unparseable ones are left for inspection
+    assert users["user_2"]["created_at"] == datetime(2026, 1, 2, 10, tzinfo=timezone.utc)
+    assert users["user_2"]["swipes_reset_at"] == "not a date"
+    # The migration is recorded as done and not repeated
+    assert second_run == {}
+
+
+def test_ensure_indexes_adds_session_ttl():
+    db = make_db()
+
+    async def run():
+        await ensure_indexes(db)
+        await ensure_indexes(db)
+        return await db.user_sessions.index_information()
+
+    indexes = asyncio.run(run())
+    ttl = [index for index in indexes.values() if "expireAfterSeconds" in index]
+    assert [(list(index["key"]), index["expireAfterSeconds"]) for index in ttl] == [([("expires_at", 1)], 0)]
+    assert indexes["session_token_1"]["unique"]
@@ -0,0 +1,141 @@
+import asyncio
+
+import aiohttp
+import pytest
+from aiohttp import web
+from aiohttp.test_utils import TestServer
+
+from llm_gateway import CircuitBreaker, LlmLimiter, LlmUnavailable, stream_chat_completion
+
+
+class FakeClock:
+    def __init__(self):
+        self.now = 0.0
+
+    def __call__(self):
+        return self.now
+
+
+def test_circuit_breaker_opens_and_recovers():
+    clock = FakeClock()
+    breaker = CircuitBreaker(failure_threshold=3, reset_timeout=10, clock=clock)
+
+    breaker.record_failure()
+    breaker.record_failure()
+    breaker.record_success()
+    breaker.record_failure()
+    breaker.record_failure()
+    assert breaker.state == "closed"
+
+    breaker.record_failure()
+    assert breaker.state == "open" and not breaker.allow()
+
+    # After reset_timeout a single failed trial reopens it at once
+    clock.now = 10
+    assert breaker.state == "half_open" and breaker.allow()
+    breaker.record_failure()
+    assert breaker.state == "open"
+
+    clock.now = 20
+    breaker.record_success()
+    assert breaker.state == "closed"
+
+
+async def words(*chunks, delay=0.01):
+    for chunk in chunks:
+        await asyncio.sleep(delay)
+        yield chunk
+
+
+def test_limiter_bounds_concurrency_and_queue():
+    limiter = LlmLimiter(max_concurrency=1, max_queue=1)
+
+    async def consume(stream):
+        return [chunk async for chunk in stream]
+
+    async def run():
+        first = asyncio.create_task(consume(limiter.stream(words("a", "b"))))
+        queued = asyncio.create_task(consume(limiter.stream(words("c"))))
+        while limiter.stats()["running"] == 0:
+            await asyncio.sleep(0)
+        stats = limiter.stats()
+        with pytest.raises(LlmUnavailable):
+            await consume(limiter.stream(words("d")))
+        return stats, await first, await queued
+
+    stats, first, queued = asyncio.run(run())
+    assert (stats["running"], stats["queued"]) == (1, 1)
+    assert first == ["a", "b"] and queued == ["c"]
+    assert limiter.stats()["rejected"] == 1
+    assert limiter.stats()["running"] == 0
+
+
+def test_stalled_stream_times_out_and_counts_as_failure():
+    limiter = LlmLimiter(timeout=0.1, idle_timeout=0.05, breaker=CircuitBreaker(failure_threshold=1))
+
+    async def run():
+        received = []
+        with pytest.raises(LlmUnavailable):
+            async for chunk in limiter.stream(words("a", "b", delay=0.2)):
+                received.append(chunk)
+        return received
+
+    assert asyncio.run(run()) == []
+    assert limiter.stats()["timeouts"] == 1
+    assert limiter.breaker.state == "open"
+    assert limiter.stats()["running"] == 0
+
+
+def test_idle_timeout_only_applies_after_the_first_chunk():
+    limiter = LlmLimiter(timeout=3, idle_timeout=0.1)
+
+    async def run():
+        # A provider that does not stream: one chunk, after more than idle_timeout
+        whole = [chunk async for chunk in limiter.stream(words("whole pitch", delay=0.3))]
+        stalled = []
+        with pytest.raises(LlmUnavailable):
+            async for chunk in limiter.stream(stall_after_first()):
+                stalled.append(chunk)
+        return whole, stalled
+
+    async def stall_after_first():
+        yield "a"
+        await asyncio.sleep(0.3)
+        yield "b"
+
+    whole, stalled = asyncio.run(run())
+    assert whole == ["whole pitch"]
+    assert stalled == ["a"]
+    assert limiter.stats()["timeouts"] == 1
+
+
+def test_streams_chat_completion_from_a_slow_local_llm():
+    requests = []
+
+    async def completions(request):
+        requests.append(await request.json())
+        response = web.StreamResponse(headers={"Content-Type": "text/event-stream"})
+        await response.prepare(request)
+        for word in ("Hello", " there"):
+            await response.write(f'data: {{"choices": [{{"delta": {{"content": "{word}"}}}}]}}\n\n'.encode())
+            await asyncio.sleep(0.05)
+        await response.write(b"data: [DONE]\n\n")
+        return response
+
+    async def run():
+        app = web.Application()
+        app.router.add_post("/v1/chat/completions", completions)
+        async with TestServer(app) as fake_llm, aiohttp.ClientSession() as session:
+            api_base = str(fake_llm.make_url("/v1"))
+            messages = [{"role": "user", "content": "pitch"}]
+            loop = asyncio.get_running_loop()
+            arrivals = []
+            async for chunk in stream_chat_completion(session, api_base, "key", "test-model", messages):
+                arrivals.append((chunk, loop.time()))
+            return arrivals
+
+    arrivals = asyncio.run(run())
+    assert [chunk for chunk, _ in arrivals] == ["Hello", " there"]
+    # The first chunk is relayed before the completion finishes
+    assert arrivals[1][1] - arrivals[0][1] >= 0.04
+    assert requests[0]["stream"] is True and requests[0]["model"] == "test-model"
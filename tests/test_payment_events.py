@@ -0,0 +1,89 @@
+import asyncio
+from datetime import datetime, timedelta, timezone
+
+import pytest
+
+from payment_events import PaymentEventWorker, record_payment_event
+
+mongomock_motor = pytest.importorskip("mongomock_motor")
+
+
+def make_worker(fail_times=0):
+    db = mongomock_motor.AsyncMongoMockClient(tz_aware=True)["test"]
+    applied = []
+
+    async def apply(event):
+        if len(applied) < fail_times:
+            applied.append(None)
+            raise RuntimeError("database unavailable")
+        applied.append(event["session_id"])
+
+    return db, PaymentEventWorker(db, apply, max_attempts=3), applied
+
+
+def test_events_are_recorded_once_and_applied_once():
+    db, worker, applied = make_worker()
+
+    async def run():
+        first = await record_payment_event(db, "evt_1", "cs_1")
+        retried = await record_payment_event(db, "evt_1", "cs_1")
+        claimed = [await worker.process("evt_1"), await worker.process("evt_1")]
+        return first, retried, claimed, await db.stripe_events.find_one({"_id": "evt_1"})
+
+    first, retried, claimed, event = asyncio.run(run())
+    assert (first, retried) == (True, False)
+    assert claimed == [True, False]
+    assert applied == ["cs_1"]
+    assert event["status"] == "processed" and event["attempts"] == 1
+
+
+def test_sweep_retries_failed_and_abandoned_events():
+    db, worker, applied = make_worker(fail_times=1)
+
+    async def run():
+        await record_payment_event(db, "evt_1", "cs_1")
+        await record_payment_event(db, "evt_2", "cs_2")
+        # Claimed by a worker that died ten minutes ago
+        await db.stripe_events.update_one(
+            {"_id": "evt_2"},
+            {"$set": {"status": "processing", "claimed_at": datetime.now(timezone.utc) - timedelta(minutes=10)}}
+        )
+
+        await worker.process("evt_1")
+        failed = await db.stripe_events.find_one({"_id": "evt_1"})
+        swept = await worker.sweep()
+        return failed, swept, await db.stripe_events.count_documents({"status": "processed"})
+
+    failed, swept, processed = asyncio.run(run())
+    assert failed["status"] == "pending" and failed["error"] == "database unavailable"
+    assert swept == 2
+    assert processed == 2
+    assert sorted(applied[1:]) == ["cs_1", "cs_2"]
+
+
+def test_background_worker_processes_submitted_events():
+    db, worker, applied = make_worker()
+
+    async def run():
+        done = asyncio.Event()
+        apply = worker.apply
+
+        async def apply_and_signal(event):
+            await apply(event)
+            done.set()
+
+        worker.apply = apply_and_signal
+        worker.start()
+        await record_payment_event(db, "evt_1", "cs_1")
+        worker.submit("evt_1")
+        await asyncio.wait_for(done.wait(), 5)
+        # evt_1 was applied by the initial sweep and is still queued, so this stop
+        # lands while the loop picks it up
+        started = asyncio.get_running_loop().time()
+        async with asyncio.timeout(5):
+            await worker.stop()
+        return asyncio.get_running_loop().time() - started
+
+    assert asyncio.run(run()) < 1
+    assert applied == ["cs_1"]
+
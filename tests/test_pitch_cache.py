@@ -0,0 +1,86 @@
+import asyncio
+
+import pytest
+
+from pitch_cache import PitchCache
+
+mongomock_motor = pytest.importorskip("mongomock_motor")
+
+
+def test_concurrent_requests_share_one_generation():
+    db = mongomock_motor.AsyncMongoMockClient()["test"]
+    prompts = []
+
+    async def generate(prompt):
+        prompts.append(prompt)
+        for word in ("pitch ", "for ", prompt):
+            await asyncio.sleep(0.01)
+            yield word
+
+    cache = PitchCache(db, generate)
+
+    async def run():
+        first = await asyncio.gather(*(cache.get("match_1", "guest", "prompt") for _ in range(5)))
+        again = await cache.get("match_1", "guest", "prompt")
+        changed = await cache.get("match_1", "guest", "edited prompt")
+        return first, again, changed
+
+    first, again, changed = asyncio.run(run())
+    assert first == ["pitch for prompt"] * 5
+    assert again == "pitch for prompt"
+    assert changed == "pitch for edited prompt"
+    assert prompts == ["prompt", "edited prompt"]
+    assert cache.stats()["misses"] == 2
+    assert cache.stats()["hits"] == 1
+    assert cache.stats()["in_flight"] == 0
+
+
+def test_failed_generation_is_not_cached():
+    db = mongomock_motor.AsyncMongoMockClient()["test"]
+    calls = []
+
+    async def generate(prompt):
+        calls.append(prompt)
+        if len(calls) == 1:
+            raise RuntimeError("LLM unavailable")
+        yield "pitch"
+
+    cache = PitchCache(db, generate)
+
+    async def run():
+        with pytest.raises(RuntimeError):
+            await cache.get("match_1", "host", "prompt")
+        return await cache.get("match_1", "host", "prompt")
+
+    assert asyncio.run(run()) == "pitch"
+    assert len(calls) == 2
+
+
+def test_late_joiners_replay_the_chunks_streamed_so_far():
+    db = mongomock_motor.AsyncMongoMockClient()["test"]
+    release = None
+
+    async def generate(prompt):
+        yield "first "
+        await release.wait()
+        yield "second"
+
+    cache = PitchCache(db, generate)
+
+    async def run():
+        nonlocal release
+        release = asyncio.Event()
+        leader = cache.stream("match_1", "guest", "prompt")
+        first = await leader.__anext__()
+
+        # Joins after the first chunk went out, and still receives all of it
+        joiner = asyncio.create_task(cache.get("match_1", "guest", "prompt"))
+        while cache.joined == 0:
+            await asyncio.sleep(0)
+        release.set()
+        rest = [chunk async for chunk in leader]
+        return first, rest, await joiner
+
+    first, rest, joined = asyncio.run(run())
+    assert (first, rest, joined) == ("first ", ["second"], "first second")
+    assert cache.stats()["joined"] == 1
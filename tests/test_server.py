@@ -0,0 +1,674 @@
+import asyncio
+import json
+import os
+from datetime import datetime, timedelta, timezone
+from types import SimpleNamespace
+
+import httpx
+import pytest
+
+pytest.importorskip("emergentintegrations")
+mongomock_motor = pytest.importorskip("mongomock_motor")
+
+os.environ.setdefault("MONGO_URL", "mongodb://localhost:27017")
+os.environ.setdefault("DB_NAME", "test_database")
+
+from aiohttp import web
+from aiohttp.test_utils import TestServer
+from fastapi.testclient import TestClient
+
+import server
+from candidate_retrieval import CandidatePool, SwipeExclusions
+from chat_broker import InProcessBroker
+from checkout_status import CheckoutStatusCache
+from llm_gateway import CircuitBreaker, LlmLimiter
+from ml_models.inference_batcher import InferenceBatcher
+from payment_events import PaymentEventWorker
+from pitch_cache import PitchCache
+from emergentintegrations.payments.stripe.checkout import CheckoutStatusResponse
+from platform_stats import count_stats
+from session_cache import SessionCache
+
+
+class CountingCollection:
+    """Motor collection proxy that records every method call"""
+
+    def __init__(self, collection, name, calls):
+        self._collection = collection
+        self._name = name
+        self._calls = calls
+
+    def __getattr__(self, method):
+        attr = getattr(self._collection, method)
+        if not callable(attr):
+            return attr
+
+        def call(*args, **kwargs):
+            self._calls.append((self._name, method))
+            return attr(*args, **kwargs)
+
+        return call
+
+
+class CountingDatabase:
+    """Motor database proxy that records (collection, method) for every call"""
+
+    def __init__(self, db):
+        self._db = db
+        self.calls = []
+
+    def __getattr__(self, name):
+        return CountingCollection(getattr(self._db, name), name, self.calls)
+
+    def __getitem__(self, name):
+        return self.__getattr__(name)
+
+
+@pytest.fixture
+def app_client(monkeypatch):
+    db = CountingDatabase(mongomock_motor.AsyncMongoMockClient(tz_aware=True)["test_database"])
+    monkeypatch.setattr(server, "db", db)
+    monkeypatch.setattr(server, "session_cache", SessionCache())
+    monkeypatch.setattr(server, "swipe_exclusions", SwipeExclusions())
+    monkeypatch.setattr(server, "candidate_pool", CandidatePool())
+    monkeypatch.setattr(server, "chat_broker", InProcessBroker())
+    monkeypatch.setattr(server, "pitch_cache", PitchCache(db, server.limited_pitch_stream))
+    monkeypatch.setattr(server, "llm_limiter", LlmLimiter())
+    monkeypatch.setattr(server, "inference_batcher", InferenceBatcher(server.recommender))
+    monkeypatch.setattr(server, "payment_worker", PaymentEventWorker(db, server.apply_payment_event))
+    monkeypatch.setattr(server, "checkout_status_cache", CheckoutStatusCache(server.fetch_checkout_status))
+
+    with TestClient(server.app) as client:
+        yield client, db
+
+
+async def seed_user(db, user_id, role, with_profile=True, session_token=None):
+    now = datetime.now(timezone.utc)
+    await db.users.insert_one({
+        "user_id": user_id,
+        "email": f"{user_id}@example.com",
+        "name": user_id,
+        "role": role,
+        "profile_completed": True,
+        "subscription_tier": "free",
+        "swipes_today": 0,
+        "swipes_reset_at": now + timedelta(days=1),
+        "created_at": now
+    })
+    if with_profile:
+        await db.profiles.insert_one({"user_id": user_id, "bio": f"{user_id} bio", "topics": ["tech"]})
+    if session_token:
+        await db.user_sessions.insert_one({
+            "user_id": user_id,
+            "session_token": session_token,
+            "expires_at": now + timedelta(days=7),
+            "created_at": now
+        })
+
+
+def test_discover_fetches_profiles_in_one_query(app_client):
+    client, db = app_client
+    client.portal.call(seed_user, db, "host_1", "host", True, "token_1")
+    for g in range(12):
+        # guest_3 has no profile and must be skipped without breaking the order
+        client.portal.call(seed_user, db, f"guest_{g}", "guest", g != 3)
+
+    headers = {"Authorization": "Bearer token_1"}
+    assert client.get("/api/discover", headers=headers).status_code == 200  # Warm the session cache
+
+    db.calls.clear()
+    response = client.get("/api/discover", headers=headers)
+    assert response.status_code == 200
+
+    results = response.json()
+    expected_ids = [f"guest_{g}" for g in range(10) if g != 3]
+    assert [r["user"]["user_id"] for r in results] == expected_ids
+    assert [r["profile"]["user_id"] for r in results] == expected_ids
+
+    # One query per step, however many candidates are returned
+    assert db.calls == [
+        ("swipes", "find"),
+        ("users", "find"),
+        ("profiles", "find")
+    ]
+
+
+def test_swipe_quota_is_enforced_atomically(app_client):
+    client, db = app_client
+    client.portal.call(seed_user, db, "host_1", "host", True, "token_1")
+    client.portal.call(db.users.update_one, {"user_id": "host_1"}, {"$set": {"swipes_today": 18}})
+
+    async def swipe_concurrently(count):
+        return await asyncio.gather(*(server.consume_swipe("host_1") for _ in range(count)))
+
+    results = client.portal.call(swipe_concurrently, 5)
+    assert sum(results) == 2
+
+    headers = {"Authorization": "Bearer token_1"}
+    db.calls.clear()
+    response = client.post("/api/swipe", json={"target_id": "guest_0", "direction": "left"}, headers=headers)
+    assert response.status_code == 429
+    assert db.calls[-1] == ("users", "find_one_and_update")
+
+    # Once the daily window has passed the quota resets within the same update
+    yesterday = datetime.now(timezone.utc) - timedelta(days=1)
+    client.portal.call(db.users.update_one, {"user_id": "host_1"}, {"$set": {"swipes_reset_at": yesterday}})
+    response = client.post("/api/swipe", json={"target_id": "guest_0", "direction": "left"}, headers=headers)
+    assert response.status_code == 200
+
+    user_doc = client.portal.call(db.users.find_one, {"user_id": "host_1"})
+    assert user_doc["swipes_today"] == 1
+    assert user_doc["swipes_reset_at"] > datetime.now(timezone.utc)
+
+
+def test_matches_are_keyset_paginated_with_batched_lookups(app_client):
+    client, db = app_client
+    client.portal.call(seed_user, db, "host_1", "host", True, "token_1")
+
+    # Pairs of matches share a created_at, so the match_id tie-break matters
+    for g in range(7):
+        client.portal.call(seed_user, db, f"guest_{g}", "guest")
+        client.portal.call(db.matches.insert_one, {
+            "match_id": f"match_{g}",
+            "user1_id": f"guest_{g}",
+            "user2_id": "host_1",
+            "created_at": datetime(2026, 1, g // 2 + 1, tzinfo=timezone.utc),
+            "last_message_at": None
+        })
+
+    headers = {"Authorization": "Bearer token_1"}
+    client.get("/api/auth/me", headers=headers)  # Warm the session cache
+
+    pages = []
+    cursor = None
+    while True:
+        db.calls.clear()
+        params = {"limit": 3, **({"cursor": cursor} if cursor else {})}
+        page = client.get("/api/matches", params=params, headers=headers).json()
+
+        assert db.calls == [("matches", "find"), ("users", "find"), ("profiles", "find")]
+        pages.append([m["match"]["match_id"] for m in page["matches"]])
+
+        cursor = page["next_cursor"]
+        if cursor is None:
+            break
+
+    assert pages == [["match_6", "match_5", "match_4"], ["match_3", "match_2", "match_1"], ["match_0"]]
+
+    response = client.get("/api/matches", params={"cursor": "not-a-cursor"}, headers=headers)
+    assert response.status_code == 400
+
+
+def seed_match(client, db):
+    client.portal.call(seed_user, db, "host_1", "host", True, "token_1")
+    client.portal.call(seed_user, db, "guest_1", "guest", True, "token_2")
+    client.portal.call(seed_user, db, "guest_2", "guest", True, "token_3")
+    client.portal.call(db.matches.insert_one, {
+        "match_id": "match_1",
+        "user1_id": "guest_1",
+        "user2_id": "host_1",
+        "created_at": datetime(2026, 1, 1, tzinfo=timezone.utc),
+        "last_message_at": None
+    })
+
+
+def test_chat_history_pages_back_and_polls_only_new_messages(app_client):
+    client, db = app_client
+    seed_match(client, db)
+    # Pairs of messages share a created_at, so the message_id tie-break matters
+    for m in range(5):
+        client.portal.call(db.chat_messages.insert_one, {
+            "message_id": f"msg_{m}",
+            "match_id": "match_1",
+            "sender_id": "guest_1",
+            "content": f"message {m}",
+            "created_at": datetime(2026, 1, 2, 0, m // 2, tzinfo=timezone.utc)
+        })
+
+    headers = {"Authorization": "Bearer token_1"}
+    url = "/api/chat/match_1/messages"
+
+    latest = client.get(url, params={"limit": 2}, headers=headers).json()
+    assert [m["message_id"] for m in latest["messages"]] == ["msg_3", "msg_4"]
+
+    earlier = client.get(url, params={"limit": 2, "before": latest["before_cursor"]}, headers=headers).json()
+    assert [m["message_id"] for m in earlier["messages"]] == ["msg_1", "msg_2"]
+    oldest = client.get(url, params={"limit": 2, "before": earlier["before_cursor"]}, headers=headers).json()
+    assert [m["message_id"] for m in oldest["messages"]] == ["msg_0"]
+    assert oldest["before_cursor"] is None
+
+    # Nothing new yet: the poll returns nothing and keeps its cursor
+    poll = client.get(url, params={"after": latest["after_cursor"]}, headers=headers).json()
+    assert poll["messages"] == []
+    assert poll["after_cursor"] == latest["after_cursor"]
+
+    client.post(url, json={"content": "hello"}, headers=headers)
+    poll = client.get(url, params={"after": poll["after_cursor"]}, headers=headers).json()
+    assert [m["content"] for m in poll["messages"]] == ["hello"]
+    assert not poll["has_more_after"]
+
+    response = client.get(url, params={"before": "x", "after": "y"}, headers=headers)
+    assert response.status_code == 400
+
+
+def test_chat_socket_pushes_sent_messages(app_client):
+    client, db = app_client
+    seed_match(client, db)
+
+    with client.websocket_connect("/api/chat/match_1/ws", headers={"Authorization": "Bearer token_1"}) as socket:
+        sent = client.post(
+            "/api/chat/match_1/messages", json={"content": "hello"}, headers={"Authorization": "Bearer token_2"}
+        ).json()
+        event = socket.receive_json()
+
+    assert event["message"]["message_id"] == sent["message_id"]
+    assert event["message"]["content"] == "hello"
+
+    # The pushed cursor resumes history right after the message
+    response = client.get(
+        "/api/chat/match_1/messages", params={"after": event["cursor"]}, headers={"Authorization": "Bearer token_1"}
+    )
+    assert response.json()["messages"] == []
+
+    # Only the two participants may listen
+    with pytest.raises(Exception):
+        with client.websocket_connect("/api/chat/match_1/ws", headers={"Authorization": "Bearer token_3"}):
+            pass
+
+
+def test_admin_stats_are_read_from_maintained_counters(app_client):
+    client, db = app_client
+    seed_match(client, db)
+    headers = {"Authorization": "Bearer token_1"}
+
+    # The first read builds the counters from exact counts
+    stats = client.get("/api/admin/stats", headers=headers).json()
+    assert stats["total_users"] == 3
+    assert stats["total_guests"] == 2
+    assert stats["total_matches"] == 1
+
+    client.post("/api/swipe", json={"target_id": "guest_2", "direction": "left"}, headers=headers)
+    client.post("/api/chat/match_1/messages", json={"content": "hi"}, headers=headers)
+    client.post("/api/role", json={"role": "guest"}, headers=headers)
+    client.get("/api/auth/me", headers=headers)  # Re-warm the session cache
+
+    db.calls.clear()
+    stats = client.get("/api/admin/stats", headers=headers).json()
+    assert db.calls == [("counters", "find_one")]
+    assert stats == {
+        "total_users": 3,
+        "total_hosts": 0,
+        "total_guests": 3,
+        "total_matches": 1,
+        "total_messages": 1,
+        "total_swipes": 1,
+        "pro_users": 0
+    }
+    # and match what a reconciliation would compute
+    assert client.portal.call(count_stats, db) == stats
+
+
+def test_admin_users_stream_as_ndjson(app_client):
+    client, db = app_client
+    client.portal.call(seed_user, db, "host_1", "host", True, "token_1")
+    for g in range(5):
+        client.portal.call(seed_user, db, f"guest_{g}", "guest")
+    headers = {"Authorization": "Bearer token_1"}
+
+    with client.stream("GET", "/api/admin/users", params={"format": "ndjson", "role": "guest", "fields": "user_id,role"},
+                       headers=headers) as response:
+        assert response.headers["content-type"] == "application/x-ndjson"
+        lines = [json.loads(line) for line in response.iter_lines() if line]
+
+    assert lines == [{"user_id": f"guest_{g}", "role": "guest"} for g in range(5)]
+
+    users = client.get("/api/admin/users", params={"limit": 2, "profile_completed": "true"}, headers=headers).json()
+    assert len(users) == 2
+
+    swipes = client.get("/api/admin/export/swipes", headers=headers)
+    assert swipes.status_code == 200 and swipes.text == ""
+    assert client.get("/api/admin/export/user_sessions", headers=headers).status_code == 404
+    assert client.get("/api/admin/users", params={"email_verified": "x"}, headers=headers).status_code == 400
+
+
+class StubLlmChat:
+    """Stands in for LlmChat: counts requests and answers after a short delay"""
+
+    calls = []
+
+    def __init__(self, api_key=None, session_id=None, system_message=None):
+        pass
+
+    def with_model(self, provider, model):
+        return self
+
+    async def send_message(self, message):
+        StubLlmChat.calls.append(message.text)
+        await asyncio.sleep(0.05)
+        return f"pitch {len(StubLlmChat.calls)}"
+
+
+async def drain_background(pitch_cache):
+    """Wait for the pitch cache's background pre-generation and generation tasks"""
+    while pitch_cache._background:
+        await asyncio.gather(*pitch_cache._background)
+
+
+def test_pitches_are_cached_and_generated_once(app_client, monkeypatch):
+    client, db = app_client
+    monkeypatch.setattr(server, "LlmChat", StubLlmChat)
+    monkeypatch.setattr(StubLlmChat, "calls", [])
+    seed_match(client, db)
+    headers = {"Authorization": "Bearer token_1"}
+
+    async def request_concurrently(count):
+        return await asyncio.gather(*(
+            server.pitch_cache.get("match_1", "host", "same prompt") for _ in range(count)
+        ))
+
+    # A double-click shares one in-flight call
+    assert client.portal.call(request_concurrently, 3) == ["pitch 1"] * 3
+
+    first = client.post("/api/ai/generate-pitch", json={"match_id": "match_1"}, headers=headers).json()
+    again = client.post("/api/ai/generate-pitch", json={"match_id": "match_1"}, headers=headers).json()
+    assert first == again == {"pitch": "pitch 2"}
+
+    # Editing a profile changes the prompt, so the cached pitch is not reused
+    client.portal.call(db.profiles.update_one, {"user_id": "guest_1"}, {"$set": {"bio": "new bio"}})
+    updated = client.post("/api/ai/generate-pitch", json={"match_id": "match_1"}, headers=headers).json()
+    assert updated == {"pitch": "pitch 3"}
+    assert len(StubLlmChat.calls) == 3
+
+
+def test_new_matches_pregenerate_pitches(app_client, monkeypatch):
+    client, db = app_client
+    monkeypatch.setattr(server, "LlmChat", StubLlmChat)
+    monkeypatch.setattr(StubLlmChat, "calls", [])
+    monkeypatch.setattr(server, "PREGENERATE_PITCHES", True)
+    seed_match(client, db)
+    client.portal.call(db.swipes.insert_one, {
+        "swiper_id": "guest_2", "swiped_id": "host_1", "direction": "right", "created_at": datetime.now(timezone.utc)
+    })
+
+    swipe = client.post(
+        "/api/swipe", json={"target_id": "guest_2", "direction": "right"}, headers={"Authorization": "Bearer token_1"}
+    ).json()
+    assert swipe["matched"]
+
+    client.portal.call(drain_background, server.pitch_cache)
+    assert len(StubLlmChat.calls) == 2
+
+    pitch = client.post(
+        "/api/ai/generate-pitch", json={"match_id": swipe["match_id"]}, headers={"Authorization": "Bearer token_3"}
+    ).json()
+    assert pitch["pitch"] in ("pitch 1", "pitch 2")
+    assert len(StubLlmChat.calls) == 2
+
+
+def parse_sse(body):
+    events = []
+    for block in body.strip().split("\n\n"):
+        fields = dict(line.split(": ", 1) for line in block.split("\n"))
+        events.append((fields["event"], json.loads(fields["data"])))
+    return events
+
+
+def test_pitch_streams_as_server_sent_events(app_client, monkeypatch):
+    client, db = app_client
+    seed_match(client, db)
+    headers = {"Authorization": "Bearer token_1"}
+
+    async def slow_llm(prompt):
+        for word in ("Come ", "on ", "the ", "show"):
+            await asyncio.sleep(0.02)
+            yield word
+
+    monkeypatch.setattr(server, "stream_pitch_text", slow_llm)
+
+    with client.stream("POST", "/api/ai/generate-pitch/stream", json={"match_id": "match_1"}, headers=headers) as response:
+        assert response.status_code == 200
+        assert response.headers["content-type"].startswith("text/event-stream")
+        events = parse_sse(response.read().decode())
+
+    assert events == [
+        ("delta", {"text": "Come "}), ("delta", {"text": "on "}), ("delta", {"text": "the "}),
+        ("delta", {"text": "show"}), ("done", {"pitch": "Come on the show"})
+    ]
+
+    # Cached now, so served whole without the LLM
+    monkeypatch.setattr(server, "stream_pitch_text", None)
+    cached = client.post("/api/ai/generate-pitch/stream", json={"match_id": "match_1"}, headers=headers)
+    assert parse_sse(cached.text) == [("delta", {"text": "Come on the show"}), ("done", {"pitch": "Come on the show"})]
+
+
+def test_llm_failures_open_the_circuit_breaker(app_client, monkeypatch):
+    client, db = app_client
+    seed_match(client, db)
+    host, guest = {"Authorization": "Bearer token_1"}, {"Authorization": "Bearer token_2"}
+    monkeypatch.setattr(server, "llm_limiter", LlmLimiter(breaker=CircuitBreaker(failure_threshold=2)))
+    calls = []
+
+    async def working_llm(prompt):
+        yield "Cached pitch"
+
+    async def partial_llm(prompt):
+        calls.append(prompt)
+        yield "Hi"
+        raise ConnectionError("provider down")
+
+    async def failing_llm(prompt):
+        calls.append(prompt)
+        raise ConnectionError("provider down")
+        yield
+
+    monkeypatch.setattr(server, "stream_pitch_text", working_llm)
+    assert client.post("/api/ai/generate-pitch", json={"match_id": "match_1"}, headers=host).status_code == 200
+
+    # A failure after the first chunk ends the event stream with an error event
+    monkeypatch.setattr(server, "stream_pitch_text", partial_llm)
+    streamed = client.post("/api/ai/generate-pitch/stream", json={"match_id": "match_1"}, headers=guest)
+    assert parse_sse(streamed.text) == [("delta", {"text": "Hi"}), ("error", {"detail": "AI provider request failed"})]
+
+    # A failure before it is a 503
+    monkeypatch.setattr(server, "stream_pitch_text", failing_llm)
+    failed = client.post("/api/ai/generate-pitch/stream", json={"match_id": "match_1"}, headers=guest)
+    assert failed.status_code == 503 and failed.json()["detail"] == "AI provider request failed"
+
+    # Open: rejected without calling the provider
+    rejected = client.post("/api/ai/generate-pitch/stream", json={"match_id": "match_1"}, headers=guest)
+    assert rejected.status_code == 503
+    assert client.post("/api/ai/generate-pitch", json={"match_id": "match_1"}, headers=guest).status_code == 503
+    assert len(calls) == 2
+
+    # Cached pitches are still served on both endpoints
+    cached = client.post("/api/ai/generate-pitch/stream", json={"match_id": "match_1"}, headers=host)
+    assert cached.status_code == 200
+    assert parse_sse(cached.text) == [("delta", {"text": "Cached pitch"}), ("done", {"pitch": "Cached pitch"})]
+    plain = client.post("/api/ai/generate-pitch", json={"match_id": "match_1"}, headers=host)
+    assert plain.json() == {"pitch": "Cached pitch"}
+
+    stats = client.get("/api/admin/ai/stats", headers=host).json()
+    assert stats["llm"]["breaker"] == "open"
+    assert stats["llm"]["failures"] == 2
+
+
+def test_login_reuses_pooled_connection_to_auth_provider(app_client, monkeypatch):
+    client, db = app_client
+    connections = set()
+
+    async def session_data(request):
+        # Client port of the TCP connection this request arrived on
+        connections.add(request.transport.get_extra_info("peername")[1])
+        if request.headers["X-Session-ID"] == "bad":
+            return web.json_response({}, status=404)
+        email = request.headers["X-Session-ID"].split(":")[0]
+        return web.json_response({
+            "email": email, "name": "Ada", "picture": "pic.png",
+            "session_token": f"token_{request.headers['X-Session-ID']}"
+        })
+
+    fake_auth_app = web.Application()
+    fake_auth_app.router.add_get("/session-data", session_data)
+    fake_auth = TestServer(fake_auth_app)
+    client.portal.call(fake_auth.start_server)
+    monkeypatch.setattr(server, "AUTH_SESSION_URL", str(fake_auth.make_url("/session-data")))
+
+    try:
+        db.calls.clear()
+        first = client.post("/api/auth/session", headers={"X-Session-ID": "ada@example.com:1"}).json()
+        assert first["email"] == "ada@example.com" and first["subscription_tier"] == "free"
+        assert first["session_token"] == "token_ada@example.com:1"
+        # Upsert, then the session insert alongside the new-user counter
+        assert db.calls == [("users", "find_one_and_update"), ("user_sessions", "insert_one"), ("counters", "update_one")]
+
+        db.calls.clear()
+        again = client.post("/api/auth/session", headers={"X-Session-ID": "ada@example.com:2"}).json()
+        assert again["user_id"] == first["user_id"]
+        assert db.calls == [("users", "find_one_and_update"), ("user_sessions", "insert_one")]
+
+        assert client.post("/api/auth/session", headers={"X-Session-ID": "bad"}).status_code == 401
+        me = client.get("/api/auth/me", headers={"Authorization": f"Bearer {again['session_token']}"}).json()
+        assert me["user_id"] == first["user_id"]
+    finally:
+        client.portal.call(fake_auth.close)
+
+    # All three logins went over one keep-alive connection
+    assert len(connections) == 1
+    assert client.portal.call(count_stats, db)["total_users"] == 1
+
+
+class StubStripeCheckout:
+    """Stands in for StripeCheckout: webhook bodies are JSON WebhookResponse fields, and
+    checkout statuses are whatever the test sets, answered after a short delay"""
+
+    def __init__(self):
+        self.payment_status = "unpaid"
+        self.status = "open"
+        self.status_calls = 0
+
+    async def get_checkout_status(self, session_id):
+        self.status_calls += 1
+        await asyncio.sleep(0.05)
+        return CheckoutStatusResponse(status=self.status, payment_status=self.payment_status, amount_total=999)
+
+    async def handle_webhook(self, body, signature):
+        if signature != "valid":
+            raise ValueError("Invalid signature")
+        return SimpleNamespace(**json.loads(body))
+
+
+def test_stripe_webhook_is_recorded_once_and_applied_in_background(app_client, monkeypatch):
+    client, db = app_client
+    seed_match(client, db)
+    monkeypatch.setattr(server, "get_stripe_checkout", StubStripeCheckout)
+    client.portal.call(db.payment_transactions.insert_one, {
+        "payment_id": "payment_1", "user_id": "guest_1", "session_id": "cs_1",
+        "status": "pending", "payment_status": "pending"
+    })
+    event = json.dumps({"event_id": "evt_1", "session_id": "cs_1", "payment_status": "paid"})
+    headers = {"Stripe-Signature": "valid"}
+
+    worker = server.payment_worker
+    submitted, applied = [], asyncio.Event()
+
+    def submit(event_id):
+        submitted.append(event_id)
+        worker._queue.put_nowait(event_id)
+
+    async def apply(payment_event):
+        await server.apply_payment_event(payment_event)
+        applied.set()
+
+    monkeypatch.setattr(worker, "submit", submit)
+    monkeypatch.setattr(worker, "apply", apply)
+
+    assert client.post("/api/webhook/stripe", content=event, headers={"Stripe-Signature": "forged"}).status_code == 400
+
+    db.calls.clear()
+    assert client.post("/api/webhook/stripe", content=event, headers=headers).json() == {"status": "success"}
+    # Acknowledged after recording the event; the payment writes happen afterwards
+    assert db.calls[0] == ("stripe_events", "insert_one")
+
+    client.portal.call(asyncio.wait_for, applied.wait(), 5)
+    transaction = client.portal.call(db.payment_transactions.find_one, {"session_id": "cs_1"})
+    assert transaction["payment_status"] == "paid"
+    me = client.get("/api/auth/me", headers={"Authorization": "Bearer token_2"}).json()
+    assert me["subscription_tier"] == "pro"
+
+    # A retried delivery costs one failed insert and is not queued again
+    db.calls.clear()
+    assert client.post("/api/webhook/stripe", content=event, headers=headers).status_code == 200
+    assert db.calls == [("stripe_events", "insert_one")]
+    assert submitted == ["evt_1"]
+    assert client.portal.call(count_stats, db)["pro_users"] == 1
+
+
+def test_checkout_status_polls_share_stripe_calls_and_stop_once_paid(app_client, monkeypatch):
+    client, db = app_client
+    seed_match(client, db)
+    stripe = StubStripeCheckout()
+    monkeypatch.setattr(server, "get_stripe_checkout", lambda: stripe)
+    for session_id in ("cs_1", "cs_2"):
+        client.portal.call(db.payment_transactions.insert_one, {
+            "payment_id": f"payment_{session_id}", "user_id": "guest_1", "session_id": session_id,
+            "amount": 9.99, "currency": "usd", "status": "pending", "payment_status": "pending",
+            "metadata": {"package_id": "pro_monthly"}
+        })
+    headers = {"Authorization": "Bearer token_2"}
+
+    async def poll_concurrently(session_id, count):
+        transport = httpx.ASGITransport(app=server.app)
+        async with httpx.AsyncClient(transport=transport, base_url="http://test") as http:
+            responses = await asyncio.gather(*(
+                http.get(f"/api/subscription/checkout-status/{session_id}", headers=headers) for _ in range(count)
+            ))
+        return [response.json()["payment_status"] for response in responses]
+
+    # Concurrent polls coalesce, and polls within the TTL reuse the answer
+    assert client.portal.call(poll_concurrently, "cs_1", 5) == ["unpaid"] * 5
+    assert client.get("/api/subscription/checkout-status/cs_1", headers=headers).json()["status"] == "open"
+    assert stripe.status_calls == 1
+
+    # Once Stripe reports the payment it is recorded, and later polls never reach Stripe
+    server.checkout_status_cache.ttl = 0
+    stripe.payment_status, stripe.status = "paid", "complete"
+    assert client.get("/api/subscription/checkout-status/cs_1", headers=headers).json()["payment_status"] == "paid"
+    assert client.get("/api/auth/me", headers=headers).json()["subscription_tier"] == "pro"
+    recorded = client.get("/api/subscription/checkout-status/cs_1", headers=headers).json()
+    assert recorded == {
+        "status": "complete", "payment_status": "paid", "amount_total": 999, "currency": "usd",
+        "metadata": {"user_id": "guest_1", "package_id": "pro_monthly"}
+    }
+    assert stripe.status_calls == 2
+
+    stripe.payment_status, stripe.status = "unpaid", "expired"
+    assert client.get("/api/subscription/checkout-status/cs_2", headers=headers).json()["status"] == "expired"
+    assert client.get("/api/subscription/checkout-status/cs_2", headers=headers).json()["status"] == "expired"
+    assert stripe.status_calls == 3
+    assert client.get("/api/subscription/checkout-status/cs_1", headers={"Authorization": "Bearer token_1"}).status_code == 403
+
+
+def test_logout_through_another_worker_is_caught_by_the_session_recheck(app_client):
+    client, db = app_client
+    client.portal.call(seed_user, db, "host_1", "host", True, "token_1")
+    headers = {"Authorization": "Bearer token_1"}
+    assert client.get("/api/auth/me", headers=headers).status_code == 200  # Warm the session cache
+
+    # Another worker logs the session out: only the stored session goes away here
+    client.portal.call(db.user_sessions.delete_one, {"session_token": "token_1"})
+    db.calls.clear()
+    assert client.get("/api/auth/me", headers=headers).status_code == 200
+    assert db.calls == []
+
+    # Once the entry is due for a recheck the logout is noticed
+    server.session_cache.recheck_after = 0
+    assert client.get("/api/auth/me", headers=headers).status_code == 401
+    assert db.calls == [("user_sessions", "find_one")]
+    assert client.get("/api/auth/me", headers=headers).status_code == 401
+
+
+def test_startup_creates_indexes_without_migrating(app_client):
+    client, db = app_client
+    assert ("users", "create_indexes") in db.calls
+    # The timestamp migration is a one-off script, not part of every worker's startup
+    assert not [call for call in db.calls if call[0] == "migrations" or call[1] == "bulk_write"]
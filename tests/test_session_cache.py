@@ -0,0 +1,73 @@
+from datetime import datetime, timedelta, timezone
+from types import SimpleNamespace
+
+from session_cache import SessionCache
+
+
+def make_user(user_id="user_1"):
+    return SimpleNamespace(user_id=user_id)
+
+
+def in_days(days):
+    return datetime.now(timezone.utc) + timedelta(days=days)
+
+
+def test_hits_misses_and_invalidation():
+    cache = SessionCache()
+    assert cache.get("token_a") is None
+
+    cache.put("token_a", make_user(), in_days(7), cache.epoch, lookup_seconds=0.004)
+    cache.put("token_b", make_user(), in_days(7), cache.epoch)
+    assert cache.get("token_a").user_id == "user_1"
+
+    cache.invalidate_token("token_a")
+    assert cache.get("token_a") is None
+    assert cache.get("token_b") is not None
+
+    cache.invalidate_user("user_1")
+    assert cache.get("token_b") is None
+
+    stats = cache.stats()
+    assert (stats["hits"], stats["misses"], stats["size"]) == (2, 3, 0)
+    assert stats["avg_db_lookup_ms"] == 2.0
+
+
+def test_lookup_racing_an_invalidation_is_not_cached():
+    cache = SessionCache()
+    epoch = cache.epoch
+    cache.invalidate_user("user_1")  # e.g. a role change lands while the lookup runs
+
+    cache.put("token_a", make_user(), in_days(7), epoch)
+    assert cache.get("token_a") is None
+
+
+def test_expiry_and_lru_bound():
+    cache = SessionCache(max_size=2, ttl=60)
+    cache.put("expired", make_user(), in_days(-1), cache.epoch)
+    assert cache.get("expired") is None
+
+    cache = SessionCache(ttl=0)
+    cache.put("stale", make_user(), in_days(7), cache.epoch)
+    assert cache.get("stale") is None
+
+    cache = SessionCache(max_size=2)
+    for token in ("a", "b"):
+        cache.put(token, make_user(token), in_days(7), cache.epoch)
+    cache.get("a")  # b is now least recently used
+    cache.put("c", make_user("c"), in_days(7), cache.epoch)
+
+    assert cache.get("b") is None
+    assert cache.get("a") is not None and cache.get("c") is not None
+    assert cache.stats()["evictions"] == 1
+
+
+def test_entries_are_rechecked_after_recheck_after():
+    cache = SessionCache(ttl=60, recheck_after=0)
+    cache.put("token_a", make_user(), in_days(7), cache.epoch)
+    assert cache.needs_recheck("token_a")
+
+    cache.recheck_after = 60
+    cache.confirm("token_a")
+    assert not cache.needs_recheck("token_a")
+    assert not cache.needs_recheck("unknown")
+    assert cache.stats()["rechecks"] == 1